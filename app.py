@@ -1,12 +1,34 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, send_file, jsonify, Response, stream_with_context, make_response, session
 import os
+import hashlib
 import traceback
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from werkzeug.utils import secure_filename
-from models import db, init_db, User, AuthToken, Project, Milestone, File, FileVersion, Task, Report, Message, Notification
+from models import db, init_db, User, AuthToken, Project, Milestone, File, FileVersion, Task, Report, Message, Notification, NotificationArchive, ConversationReadState, InboxEntry
 from models.Communication.communication_facade import CommunicationFacade
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy.orm import load_only, selectinload
 from utils.notification_facade import NotificationFacade
+from models.Search import SearchDocument, SearchService
+from models.Forum import ForumPost, ForumReply
+from models.versioning import ensure_version_columns, project_version_stamp
+from utils.pagination import parse_limit, keyset_paginate
+from utils.api_serializer import parse_fields, parse_include, load_only_columns, serialize
+from utils.compression import compress_response
+from utils import task_transfer
+from utils.scheduler import BackgroundScheduler
+from utils.lru_cache import LRUCache
+from utils.fragment_cache import FragmentCache, FragmentCacheExtension, make_backend
+from utils.typeahead import typeahead_index
+from utils.message_waiters import message_waiters, WaitersFull
+from utils.uploads import UploadRequest
+from markupsafe import Markup
+from models.UserManagement.user_principal import principal_cache
+from models.UserManagement.token_service import configure_token_store, get_token_store, PURPOSE_VERIFY, PURPOSE_RESET
+from models.UserManagement.password_hasher import configure_password_hasher, get_password_hasher, PasswordHasherBusy
+from models.Communication.email_service import configure_email_service, get_email_service
+from models.Communication.email_outbox import OutboxEmail
+from models.Communication.message_attachment import MessageAttachment
 
 class CMTApp:
     """
@@ -30,6 +52,8 @@ class CMTApp:
             return
 
         self.app = Flask(__name__)
+        # lets the message views parse uploads straight into the attachment store
+        self.app.request_class = UploadRequest
 
         # configuration for different environments
         self.app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -48,6 +72,88 @@ class CMTApp:
         self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
         self.app.config['UPLOAD_FOLDER'] = 'uploads'
 
+        # gzip / brotli for responses bigger than this many bytes
+        self.app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+
+        # scrypt cost and the size of the password hashing pool
+        self.app.config['PASSWORD_SCRYPT_N'] = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+        self.app.config['PASSWORD_SCRYPT_R'] = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+        self.app.config['PASSWORD_SCRYPT_P'] = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+        self.app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+        self.app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+        # 'table' keeps tokens in auth_tokens, 'signed' uses stateless signed tokens
+        self.app.config['AUTH_TOKEN_MODE'] = os.environ.get('AUTH_TOKEN_MODE', 'table')
+        configure_token_store(self.app.config['AUTH_TOKEN_MODE'], self.app.config['SECRET_KEY'])
+
+        # template fragment cache, FRAGMENT_CACHE_URL=redis://... shares it between workers
+        self.app.config['FRAGMENT_CACHE_ENABLED'] = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.app.config['FRAGMENT_CACHE_URL'] = os.environ.get('FRAGMENT_CACHE_URL')
+        self.app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 1024))
+
+        # repeated task / project update notifications inside this many seconds merge into one
+        self.app.config['NOTIFICATION_COALESCE_SECONDS'] = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', 900))
+        # optional rollup of old unread notifications into one digest per user / type / project
+        self.app.config['NOTIFICATION_DIGEST_ENABLED'] = os.environ.get('NOTIFICATION_DIGEST_ENABLED', 'false').lower() == 'true'
+        self.app.config['NOTIFICATION_DIGEST_INTERVAL'] = int(os.environ.get('NOTIFICATION_DIGEST_INTERVAL', 3600))
+        self.app.config['NOTIFICATION_DIGEST_AGE_MINUTES'] = int(os.environ.get('NOTIFICATION_DIGEST_AGE_MINUTES', 60))
+        self.app.config['NOTIFICATION_DIGEST_MIN_ROWS'] = int(os.environ.get('NOTIFICATION_DIGEST_MIN_ROWS', 3))
+
+        # notification retention: read ones older than this many days move to the archive,
+        # users keep at most NOTIFICATION_USER_CAP in the hot table, the archive keeps history this long
+        self.app.config['NOTIFICATION_RETENTION_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+        self.app.config['NOTIFICATION_USER_CAP'] = int(os.environ.get('NOTIFICATION_USER_CAP', 500))
+        self.app.config['NOTIFICATION_ARCHIVE_DAYS'] = int(os.environ.get('NOTIFICATION_ARCHIVE_DAYS', 730))
+        self.app.config['NOTIFICATION_RETENTION_INTERVAL'] = int(os.environ.get('NOTIFICATION_RETENTION_INTERVAL', 6 * 3600))
+
+        # outgoing mail, without MAIL_SERVER emails are only printed
+        self.app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER')
+        self.app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+        self.app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
+        self.app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+        self.app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
+        self.app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@cmt.local')
+        # the outbox sender sends up to EMAIL_OUTBOX_BATCH emails per SMTP connection
+        self.app.config['EMAIL_OUTBOX_INTERVAL'] = int(os.environ.get('EMAIL_OUTBOX_INTERVAL', 10))
+        self.app.config['EMAIL_OUTBOX_BATCH'] = int(os.environ.get('EMAIL_OUTBOX_BATCH', 50))
+        self.app.config['EMAIL_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+        # sent and given up emails are deleted after this many days
+        self.app.config['EMAIL_OUTBOX_KEEP_DAYS'] = int(os.environ.get('EMAIL_OUTBOX_KEEP_DAYS', 30))
+
+        # long poll for new messages: longest wait, how often a waiter checks the
+        # database itself (other processes) and how many requests may wait at once
+        self.app.config['LONGPOLL_TIMEOUT'] = float(os.environ.get('LONGPOLL_TIMEOUT', 25))
+        self.app.config['LONGPOLL_RECHECK_SECONDS'] = float(os.environ.get('LONGPOLL_RECHECK_SECONDS', 5))
+        self.app.config['LONGPOLL_MAX_WAITERS'] = int(os.environ.get('LONGPOLL_MAX_WAITERS', 200))
+
+        # bigger request bodies are refused before they are read (File allows 100 MB)
+        self.app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 100)) * 1024 * 1024
+        # message attachments are streamed to disk, a bigger file stops the upload
+        self.app.config['MESSAGE_ATTACHMENT_MAX_BYTES'] = int(os.environ.get('MESSAGE_ATTACHMENT_MAX_MB', 25)) * 1024 * 1024
+
+        # background maintenance jobs, off with SCHEDULER_ENABLED=false
+        self.app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+        self.app.config['AUTH_TOKEN_SWEEP_INTERVAL'] = int(os.environ.get('AUTH_TOKEN_SWEEP_INTERVAL', 3600))
+        self.app.config['AUTH_TOKEN_SWEEP_BATCH'] = int(os.environ.get('AUTH_TOKEN_SWEEP_BATCH', 1000))
+        # deadline reminders for tasks due within DEADLINE_WINDOW_DAYS
+        self.app.config['DEADLINE_SCAN_INTERVAL'] = int(os.environ.get('DEADLINE_SCAN_INTERVAL', 3600))
+        self.app.config['DEADLINE_WINDOW_DAYS'] = int(os.environ.get('DEADLINE_WINDOW_DAYS', 2))
+        self.app.config['DEADLINE_SCAN_BATCH'] = int(os.environ.get('DEADLINE_SCAN_BATCH', 500))
+
+        configure_password_hasher(n=self.app.config['PASSWORD_SCRYPT_N'],
+                                  r=self.app.config['PASSWORD_SCRYPT_R'],
+                                  p=self.app.config['PASSWORD_SCRYPT_P'],
+                                  max_workers=self.app.config['PASSWORD_HASH_WORKERS'],
+                                  max_queue=self.app.config['PASSWORD_HASH_QUEUE'])
+
+        configure_email_service(server=self.app.config['MAIL_SERVER'],
+                                port=self.app.config['MAIL_PORT'],
+                                username=self.app.config['MAIL_USERNAME'],
+                                password=self.app.config['MAIL_PASSWORD'],
+                                use_tls=self.app.config['MAIL_USE_TLS'],
+                                default_sender=self.app.config['MAIL_DEFAULT_SENDER'],
+                                batch_size=self.app.config['EMAIL_OUTBOX_BATCH'],
+                                max_attempts=self.app.config['EMAIL_MAX_ATTEMPTS'])
+
 
 
 
@@ -57,7 +163,7 @@ class CMTApp:
         os.makedirs(self.app.config['UPLOAD_FOLDER'], exist_ok=True)
           # initialize facades - this the must importans desgin pattern we implemetation 
         self.communication_facade = CommunicationFacade()
-        self.notification_facade = NotificationFacade()
+        self.notification_facade = NotificationFacade(coalesce_seconds=self.app.config['NOTIFICATION_COALESCE_SECONDS'])
           # initialize login manager
         self.login_manager = LoginManager()
         self.login_manager.init_app(self.app)
@@ -67,18 +173,59 @@ class CMTApp:
         # set up Flask-Login user loader
         self.setup_login_manager()
 
+        # keep the search index in sync with the models
+        SearchService.register_listeners()
+        # and the messages sidebar with the messages
+        InboxEntry.register_listeners()
+        # wake long polls when messages are committed
+        message_waiters.max_waiters = self.app.config['LONGPOLL_MAX_WAITERS']
+        message_waiters.register_listeners()
+
+        # {% cache %} blocks in templates
+        self.setup_fragment_cache()
+
+        # people and project names for the typeahead
+        self.setup_typeahead()
+
         # set up context processors
         self.setup_context_processors()
 
+        # compress responses
+        self.setup_response_compression()
+
         # set up routes
         self.setup_routes()
 
+        # set up flask cli commands
+        self.setup_cli_commands()
+
 
 
           # create database tables
         with self.app.app_context():
             init_db(self.app)
+            # on postgres the archive is partitioned, create_all can not make that
+            NotificationArchive.create_partitioned_table()
             db.create_all()
+            Message.ensure_channel_support()
+            Message.create_missing_indexes()
+            ConversationReadState.ensure_peer_column()
+            ConversationReadState.ensure_migrated()
+            InboxEntry.ensure_built()
+            AuthToken.create_missing_indexes()
+            Task.ensure_milestone_column()
+            Task.create_missing_indexes()
+            Notification.ensure_coalesce_columns()
+            Notification.create_missing_indexes()
+            ForumPost.ensure_counter_columns()
+            ensure_version_columns(Project, Task, Milestone, File, Report)
+            File.ensure_message_only_column()
+
+        # periodic cleanup jobs
+        self.setup_scheduler()
+
+        # rendered forum reply pages, keyed by post and its last change
+        self.forum_fragment_cache = LRUCache(int(os.environ.get('FORUM_FRAGMENT_CACHE_SIZE', 256)))
 
         self.initialized = True
 
@@ -92,7 +239,8 @@ class CMTApp:
         def load_user(user_id):
             """Load user by ID for the  falsk login."""
             try:
-                return db.session.get(User, int(user_id))
+                # cached slim principal, most requests never touch the users table
+                return principal_cache.get(int(user_id))
             except:
                 return None
             
@@ -102,6 +250,16 @@ class CMTApp:
 
     def setup_context_processors(self):
         """set up template context processors."""
+        @self.app.template_filter('format_datetime')
+        def format_datetime(value, fmt='%Y-%m-%d %H:%M'):
+            """used by the forum templates."""
+            return value.strftime(fmt) if value else ''
+
+        @self.app.template_global()
+        def csrf_token_if_needed():
+            # the app has no CSRF protection set up yet, the forum templates already call this
+            return ''
+
         @self.app.context_processor
         def inject_user():
             """her inject user data and notifications into all templates."""
@@ -110,18 +268,11 @@ class CMTApp:
 
             try:
                 if hasattr(current_user, 'id') and current_user.is_authenticated:
-                    # get unread notification count using facade
-                    unread_notifications = self.notification_facade.get_unread_notifications(current_user.id)
-                    unread_notification_count = len(unread_notifications)
-
-                    # get unread message count using facade
-                    unread_messages = self.communication_facade.get_unread_messages(current_user.id)
-                    unread_message_count = len(unread_messages)
-
+                    # counts are COUNT queries, only the 5 newest rows are loaded
                     return {
-                        'unread_notification_count': unread_notification_count,
-                        'unread_message_count': unread_message_count,
-                        'recent_notifications': unread_notifications[:5]  # Show last 5
+                        'unread_notification_count': self.notification_facade.count_unread_notifications(current_user.id),
+                        'unread_message_count': self.communication_facade.count_unread_messages(current_user.id),
+                        'recent_notifications': self.notification_facade.get_recent_unread_notifications(current_user.id, 5)
                     }
                 else:
                     return {
@@ -141,6 +292,150 @@ class CMTApp:
 
 
 
+    def setup_response_compression(self):
+        """compress html and json responses with gzip or brotli."""
+        @self.app.after_request
+        def compress(response):
+            return compress_response(response,
+                                     request.headers.get('Accept-Encoding', ''),
+                                     self.app.config['COMPRESS_MIN_SIZE'])
+
+
+
+
+
+    def setup_fragment_cache(self):
+        """
+        set up the {% cache %} template tag and tell it which model changes
+        make which fragments stale.
+        """
+        backend = make_backend(self.app.config['FRAGMENT_CACHE_URL'], self.app.config['FRAGMENT_CACHE_SIZE'])
+        self.fragment_cache = FragmentCache(backend, enabled=self.app.config['FRAGMENT_CACHE_ENABLED'])
+
+        self.app.jinja_env.add_extension(FragmentCacheExtension)
+        self.app.jinja_env.fragment_cache = self.fragment_cache
+
+        self.fragment_cache.register_model(Project, lambda project: ['projects', f'project:{project.id}'])
+        self.fragment_cache.register_model(File, ['files'])
+        self.fragment_cache.register_model(Task, lambda task: ['tasks', f'project:{task.project_id}'])
+        self.fragment_cache.register_model(Milestone, lambda milestone: ['milestones', f'project:{milestone.project_id}'])
+        self.fragment_cache.register_model(User, ['users'])
+
+    def setup_typeahead(self):
+        """index user and project names, kept current as rows change."""
+        typeahead_index.register_model(
+            User, 'user',
+            lambda user: (user.get_full_name(), user.username,
+                          [user.username, user.first_name, user.last_name, user.get_full_name()]))
+        typeahead_index.register_model(
+            Project, 'project',
+            lambda project: (project.project_name, project.status, [project.project_name]))
+
+    def setup_scheduler(self):
+        """register the periodic maintenance jobs and start them."""
+        self.scheduler = BackgroundScheduler(self.app)
+
+        batch_size = self.app.config['AUTH_TOKEN_SWEEP_BATCH']
+        self.scheduler.add_job('sweep_auth_tokens',
+                               lambda: AuthToken.sweep_expired(batch_size=batch_size),
+                               interval=self.app.config['AUTH_TOKEN_SWEEP_INTERVAL'],
+                               initial_delay=60)
+
+        self.scheduler.add_job('deadline_notifications', self.scan_deadlines,
+                               interval=self.app.config['DEADLINE_SCAN_INTERVAL'],
+                               initial_delay=120)
+
+        self.scheduler.add_job('email_outbox', lambda: get_email_service().deliver_all(),
+                               interval=self.app.config['EMAIL_OUTBOX_INTERVAL'],
+                               initial_delay=5)
+
+        self.scheduler.add_job('email_outbox_purge',
+                               lambda: OutboxEmail.purge_finished(
+                                   older_than_days=self.app.config['EMAIL_OUTBOX_KEEP_DAYS']),
+                               interval=24 * 3600,
+                               initial_delay=900)
+
+        self.scheduler.add_job('notification_retention', self.run_notification_retention,
+                               interval=self.app.config['NOTIFICATION_RETENTION_INTERVAL'],
+                               initial_delay=600)
+
+        if self.app.config['NOTIFICATION_DIGEST_ENABLED']:
+            self.scheduler.add_job('notification_digests',
+                                   lambda: Notification.roll_up_digests(
+                                       older_than_minutes=self.app.config['NOTIFICATION_DIGEST_AGE_MINUTES'],
+                                       min_rows=self.app.config['NOTIFICATION_DIGEST_MIN_ROWS']),
+                                   interval=self.app.config['NOTIFICATION_DIGEST_INTERVAL'],
+                                   initial_delay=300)
+
+        if self.app.config['SCHEDULER_ENABLED']:
+            self.scheduler.start()
+
+    def scan_deadlines(self):
+        """notify assignees of tasks whose deadline is close."""
+        return Notification.create_deadline_notifications(window_days=self.app.config['DEADLINE_WINDOW_DAYS'],
+                                                          batch_size=self.app.config['DEADLINE_SCAN_BATCH'])
+
+    def run_notification_retention(self):
+        """archive old and excess notifications, purge old archive rows."""
+        return NotificationArchive.run_retention(older_than_days=self.app.config['NOTIFICATION_RETENTION_DAYS'],
+                                                 max_per_user=self.app.config['NOTIFICATION_USER_CAP'],
+                                                 purge_after_days=self.app.config['NOTIFICATION_ARCHIVE_DAYS'])
+
+    def setup_cli_commands(self):
+        """set up the flask cli commands for maintenance jobs."""
+        @self.app.cli.command('recount-forum-replies')
+        def recount_forum_replies():
+            """rebuild reply_count / last_reply_at of every forum post."""
+            print(f"recounted {ForumPost.recount_replies()} posts")
+
+        @self.app.cli.command('sweep-auth-tokens')
+        def sweep_auth_tokens():
+            """delete expired and used auth tokens now."""
+            result = AuthToken.sweep_expired(batch_size=self.app.config['AUTH_TOKEN_SWEEP_BATCH'])
+            print(f"deleted {result['deleted']} tokens in {result['batches']} batches, "
+                  f"{result['remaining']} left ({result['seconds']}s)")
+
+        @self.app.cli.command('scan-deadlines')
+        def scan_deadlines():
+            """send deadline approaching notifications now."""
+            result = self.scan_deadlines()
+            print(f"scanned {result['scanned']} due tasks in {result['batches']} batches, "
+                  f"created {result['created']} notifications")
+
+        @self.app.cli.command('send-emails')
+        def send_emails():
+            """deliver the queued emails now."""
+            result = get_email_service().deliver_all()
+            print(f"sent {result['sent']} emails, {result['failed']} failed, "
+                  f"{result['deferred']} waiting for the mail server")
+
+        @self.app.cli.command('archive-notifications')
+        def archive_notifications():
+            """run notification retention now."""
+            result = self.run_notification_retention()
+            print(f"archived {result['archived']} old and {result['capped']} over the cap, "
+                  f"purged {result['purged']}")
+
+        @self.app.cli.command('migrate-message-read-state')
+        def migrate_message_read_state():
+            """derive conversation read positions from the old isRead flags."""
+            print(f"created {ConversationReadState.migrate_from_is_read()} read positions")
+
+        @self.app.cli.command('rebuild-inbox')
+        def rebuild_inbox():
+            """rebuild the messages sidebar of every user from the messages table."""
+            print(f"rebuilt {InboxEntry.rebuild()} conversations")
+
+        @self.app.cli.command('rebuild-search-index')
+        def rebuild_search_index():
+            """index every task, milestone, file, forum post and message again."""
+            count = SearchService.rebuild()
+            print(f"indexed {count} documents")
+
+
+
+
+
     def setup_routes(self):
         """
         sets up all the URL routes for the app.
@@ -192,12 +487,32 @@ class CMTApp:
             self.app.add_url_rule('/project/<int:project_id>/create_task',
                                    'create_task', self.create_task,
                                      methods=['POST'])
+            self.app.add_url_rule('/project/<int:project_id>/tasks/import',
+                                  'import_tasks', self.import_tasks,
+                                  methods=['POST'])
+            self.app.add_url_rule('/project/<int:project_id>/tasks/export',
+                                  'export_tasks', self.export_tasks)
+            self.app.add_url_rule('/project/<int:project_id>/tasks/batch',
+                                  'batch_update_tasks', self.batch_update_tasks,
+                                  methods=['POST'])
             self.app.add_url_rule('/task/<int:task_id>/edit',
                                   'edit_task', self.edit_task,
                                     methods=['POST'])
             self.app.add_url_rule('/task/<int:task_id>/delete',
                                   'delete_task', self.delete_task)
 
+            # Forum routes
+            self.app.add_url_rule('/project/<int:project_id>/forum',
+                                  'view_project_forum', self.view_project_forum)
+            self.app.add_url_rule('/project/<int:project_id>/forum/new',
+                                  'create_forum_post', self.create_forum_post,
+                                  methods=['GET', 'POST'])
+            self.app.add_url_rule('/forum/post/<int:post_id>',
+                                  'view_forum_post', self.view_forum_post)
+            self.app.add_url_rule('/forum/post/<int:post_id>/reply',
+                                  'create_forum_reply', self.create_forum_reply,
+                                  methods=['POST'])
+
             # Milestone routes
             self.app.add_url_rule('/project/<int:project_id>/milestones',
                                   'view_milestones', self.view_milestones)
@@ -214,6 +529,40 @@ class CMTApp:
 
 
 
+            # JSON listing routes, same filters and cursors as the pages
+            self.app.add_url_rule('/api/projects',
+                                   'api_list_projects',
+                                   self.api_list_projects)
+            self.app.add_url_rule('/api/files',
+                                   'api_list_files',
+                                   self.api_list_files)
+            self.app.add_url_rule('/api/users',
+                                   'api_list_users',
+                                   self.api_list_users)
+            self.app.add_url_rule('/api/typeahead',
+                                   'api_typeahead',
+                                   self.api_typeahead)
+
+            # JSON API v1
+            self.app.add_url_rule('/api/v1/projects',
+                                   'api_v1_projects',
+                                   self.api_v1_projects)
+            self.app.add_url_rule('/api/v1/projects/<int:project_id>',
+                                   'api_v1_project',
+                                   self.api_v1_project)
+            self.app.add_url_rule('/api/v1/projects/<int:project_id>/tasks',
+                                   'api_v1_project_tasks',
+                                   self.api_v1_project_tasks)
+            self.app.add_url_rule('/api/v1/projects/<int:project_id>/milestones',
+                                   'api_v1_project_milestones',
+                                   self.api_v1_project_milestones)
+
+            # Search route
+            self.app.add_url_rule('/search',
+                                   'search',
+                                   self.search,
+                                   methods=['GET'])
+
             # Report routes
             self.app.add_url_rule('/project/<int:project_id>/reports',
                                    'view_reports', self.view_reports)
@@ -241,6 +590,25 @@ class CMTApp:
                                    'search_messages',
                                    self.search_messages,
                                    methods=['GET'])
+            self.app.add_url_rule('/messages/<int:user_id>/poll',
+                                   'poll_conversation',
+                                   self.poll_conversation)
+            self.app.add_url_rule('/project/<int:project_id>/channel/poll',
+                                   'poll_project_channel',
+                                   self.poll_project_channel)
+            self.app.add_url_rule('/messages/attachment/<int:file_id>',
+                                   'download_message_attachment',
+                                   self.download_message_attachment)
+            self.app.add_url_rule('/messages/attachment/<int:file_id>/preview',
+                                   'preview_message_attachment',
+                                   self.preview_message_attachment)
+            self.app.add_url_rule('/project/<int:project_id>/channel',
+                                   'view_project_channel',
+                                   self.view_project_channel)
+            self.app.add_url_rule('/project/<int:project_id>/channel/send',
+                                   'send_channel_message',
+                                   self.send_channel_message,
+                                   methods=['POST'])
 
             # Notification routes
             self.app.add_url_rule('/notifications',
@@ -344,7 +712,13 @@ class CMTApp:
             return jsonify({
                 'status': 'healthy',
                 'message': 'CMT application is running',
-                'database': 'connected'
+                'database': 'connected',
+                'password_hasher': get_password_hasher().stats(),
+                'scheduled_jobs': self.scheduler.stats(),
+                'fragment_cache': self.fragment_cache.stats(),
+                'typeahead': typeahead_index.stats(),
+                'long_poll': message_waiters.stats(),
+                'email': {**get_email_service().stats(), 'outbox': OutboxEmail.counts()}
             }), 200
         except Exception as e:
             return jsonify({
@@ -370,19 +744,89 @@ class CMTApp:
 
 
 
+    def _page_args(self):
+        """read the cursor, limit and sort query args used by every listing."""
+        return {
+            'cursor': request.args.get('cursor') or None,
+            'limit': parse_limit(request.args.get('limit')),
+            'sort': request.args.get('sort') or None
+        }
+
+    def _int_arg(self, name):
+        """read an optional integer query arg, None if missing or bad."""
+        value = request.args.get(name, '')
+        return int(value) if value.isdigit() else None
+
+    def _list_projects(self):
+        """one page of projects for the current query args."""
+        page_args = self._page_args()
+        status = request.args.get('status') or None
+        projects, next_cursor = Project.get_projects_page(cursor=page_args['cursor'],
+                                                          limit=page_args['limit'],
+                                                          sort=page_args['sort'] or '-id',
+                                                          status=status)
+        filters = {'status': status, 'sort': page_args['sort'], 'limit': page_args['limit']}
+        return projects, next_cursor, filters
+
+    def _list_files(self):
+        """one page of files for the current query args."""
+        page_args = self._page_args()
+        project_id = self._int_arg('project_id')
+        uploaded_by = self._int_arg('uploaded_by')
+        files, next_cursor = File.get_files_page(cursor=page_args['cursor'],
+                                                 limit=page_args['limit'],
+                                                 sort=page_args['sort'] or '-id',
+                                                 project_id=project_id,
+                                                 uploaded_by=uploaded_by)
+        filters = {'project_id': project_id, 'uploaded_by': uploaded_by,
+                   'sort': page_args['sort'], 'limit': page_args['limit']}
+        return files, next_cursor, filters
+
+    def _list_users(self):
+        """one page of users for the current query args."""
+        page_args = self._page_args()
+        role = request.args.get('role')
+        role = role if role in User.VALID_ROLES else None
+        users, next_cursor = User.get_users_page(cursor=page_args['cursor'],
+                                                 limit=page_args['limit'],
+                                                 sort=page_args['sort'] or 'username',
+                                                 role=role)
+        filters = {'role': role, 'sort': page_args['sort'], 'limit': page_args['limit']}
+        return users, next_cursor, filters
+
     @login_required
     def view_projects(self):
-        """shows all projects in the system."""
+        """shows the projects in the system, one page at a time."""
         try:
-            projects = Project.query.all()
+            projects, next_cursor, filters = self._list_projects()
             project_list = [p.to_dict() for p in projects]
 
             return render_template('projects.html',
-                                  projects=project_list)
+                                  projects=project_list,
+                                  next_cursor=next_cursor,
+                                  filters=filters,
+                                  status_options=Project.STATUS_OPTIONS)
         except Exception as e:
             flash(f'Error fetching projects: {str(e)}', 'danger')
             return render_template('errors/403.html')
 
+    @login_required
+    def api_list_projects(self):
+        """JSON version of the projects page."""
+        try:
+            projects, next_cursor, filters = self._list_projects()
+            return jsonify({
+                'success': True,
+                'items': [p.to_dict() for p in projects],
+                'next_cursor': next_cursor,
+                'filters': filters
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
 
 
 
@@ -404,8 +848,6 @@ class CMTApp:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else datetime.now(timezone.utc).date()
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
 
-                # get the current user
-                current_user = User.query.first()
 
                 # create new  project
                 new_project = Project(
@@ -436,6 +878,53 @@ class CMTApp:
             flash(f'Error creating project: {str(e)}', 'danger')
 
             return  redirect(url_for('view_projects'))
+    def _project_page_etag(self, page, project_id):
+        """
+        weak ETag for a page built from one project's data.
+        the layout also shows who is logged in and their unread counts,
+        so those go into the tag too. so does the date: a milestone or
+        task turns delayed / overdue when its due date passes, without any
+        row changing.
+        returns:
+            the tag, or None when the project does not exist
+        """
+        stamp = project_version_stamp(project_id)
+        if stamp is None:
+            return None
+
+        unread = db.session.execute(db.select(
+            # merged notifications only move event_count, so sum it too
+            db.select(db.func.count(Notification.id), db.func.max(Notification.id),
+                      db.func.sum(Notification.event_count))
+            .where(Notification.user_id == current_user.id, Notification.is_read == False)
+            .subquery(),
+            Message.unread_direct_query(current_user.id, db.func.count(Message.messageID),
+                                        db.func.max(Message.messageID)).subquery(),
+        )).one()
+
+        raw = repr((page, stamp, date.today().isoformat(), current_user.id, current_user.role, tuple(unread)))
+        return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+    def _not_modified(self, etag):
+        """a 304 when the browser already has this version, else None."""
+        # a pending flash message has to be rendered, so never 304 then
+        if not etag or session.get('_flashes'):
+            return None
+        if not request.if_none_match.contains_weak(etag):
+            return None
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _versioned_page(self, etag, template, **context):
+        """render a template and tag it so the next request can get a 304."""
+        response = make_response(render_template(template, **context))
+        if etag:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
     @login_required
     def project_details(self, project_id):
         """displays the details for the  specific project in the cmt ."""
@@ -445,6 +934,11 @@ class CMTApp:
                 flash('Project not found!', 'danger')
                 return redirect(url_for('view_projects'))
 
+            etag = self._project_page_etag('project', project_id)
+            not_modified = self._not_modified(etag)
+            if not_modified:
+                return not_modified
+
             # fetch files, tasks, and milestones
             files = project.get_files()
             tasks = project.get_tasks()
@@ -462,7 +956,7 @@ class CMTApp:
             milestone_list = [m.to_dict() for m in milestones]
 
 
-            return render_template('project.html',
+            return self._versioned_page(etag, 'project.html',
                                   project=project.to_dict(),
                                   files=file_list,
                                   tasks=task_list,
@@ -479,6 +973,98 @@ class CMTApp:
 
 
 
+    @login_required
+    def view_project_forum(self, project_id):
+        """one page of a project's forum posts, newest first."""
+        project = Project.query.get(project_id)
+        if not project:
+            flash('Project not found!', 'danger')
+            return redirect(url_for('view_projects'))
+
+        try:
+            # posts + authors in two queries, reply counts are columns on the post
+            posts, next_cursor = ForumPost.get_forum_posts_page(project_id,
+                                                                request.args.get('cursor'),
+                                                                parse_limit(request.args.get('limit'), default=20))
+        except Exception as e:
+            print(f"error loading forum posts: {e}")
+            posts, next_cursor = [], None
+
+        return render_template('project_forum.html',
+                               project=project,
+                               posts=posts,
+                               next_cursor=next_cursor)
+
+    @login_required
+    def create_forum_post(self, project_id):
+        """create a forum post in a project."""
+        project = Project.query.get(project_id)
+        if not project:
+            flash('Project not found!', 'danger')
+            return redirect(url_for('view_projects'))
+
+        if request.method == 'POST':
+            try:
+                post = ForumPost(user_id=current_user.id,
+                                 title=request.form.get('title'),
+                                 content=request.form.get('content'),
+                                 project_id=project_id)
+                db.session.add(post)
+                db.session.commit()
+                flash('Post created', 'success')
+                return redirect(url_for('view_forum_post', post_id=post.postID))
+            except ValueError as e:
+                flash(f'Error creating post: {str(e)}', 'danger')
+
+        return render_template('create_forum_post.html', project=project)
+
+    @login_required
+    def view_forum_post(self, post_id):
+        """show a forum post with its replies."""
+        post = db.session.get(ForumPost, post_id)
+        if not post:
+            flash('Post not found!', 'danger')
+            return redirect(url_for('view_projects'))
+
+        cursor = request.args.get('cursor') or ''
+        limit = parse_limit(request.args.get('limit'), default=50)
+
+        # the key has the post's reply count / last reply time in it, so a
+        # new or deleted reply makes a new key and the old page is never served
+        key = (post_id, post.cache_version(), cursor, limit)
+        cached = self.forum_fragment_cache.get(key)
+        if cached is None:
+            replies, next_cursor = post.get_replies_page(cursor or None, limit)
+            cached = (render_template('forum_replies.html', replies=replies), next_cursor)
+            self.forum_fragment_cache.set(key, cached)
+        replies_html, next_cursor = cached
+
+        return render_template('view_forum_post.html',
+                               post=post,
+                               replies_html=Markup(replies_html),
+                               next_cursor=next_cursor)
+
+    @login_required
+    def create_forum_reply(self, post_id):
+        """reply to a forum post, the post reply counter is updated by the model."""
+        post = db.session.get(ForumPost, post_id)
+        if not post:
+            flash('Post not found!', 'danger')
+            return redirect(url_for('view_projects'))
+
+        try:
+            db.session.add(ForumReply(post_id=post_id,
+                                      user_id=current_user.id,
+                                      content=request.form.get('content')))
+            db.session.commit()
+            # the new version key already skips old pages, this just frees the memory
+            self.forum_fragment_cache.delete_where(lambda key: key[0] == post_id)
+            flash('Reply posted', 'success')
+        except ValueError as e:
+            flash(f'Error posting reply: {str(e)}', 'danger')
+
+        return redirect(url_for('view_forum_post', post_id=post_id))
+
     @login_required
     def delete_project(self, project_id):
         """delete project route and unlinks its files"""
@@ -510,18 +1096,40 @@ class CMTApp:
 
     @login_required
     def file_management(self):
-        """shows the file management page with all files and projects."""
+        """shows the file management page, one page of files at a time."""
         try:
-            files = File.query.all()
-            projects = Project.query.all()
+            files, next_cursor, filters = self._list_files()
+
+            # only id + name for the project dropdown, not full project objects
+            project_choices = Project.get_project_choices()
+
             return render_template('files.html',
                                   files=[f.to_dict() for f in files],
-                                  projects=[p.to_dict() for p in projects])
+                                  projects=project_choices,
+                                  next_cursor=next_cursor,
+                                  filters=filters)
         except Exception as e:
 
             flash(f'error loading file management:  {str(e)}', 'danger')
             return redirect(url_for('view_projects'))
 
+    @login_required
+    def api_list_files(self):
+        """JSON version of the file management list."""
+        try:
+            files, next_cursor, filters = self._list_files()
+            return jsonify({
+                'success': True,
+                'items': [f.to_dict() for f in files],
+                'next_cursor': next_cursor,
+                'filters': filters
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
 
 
     @login_required
@@ -556,8 +1164,6 @@ class CMTApp:
             # get file size
             file_size = os.path.getsize(file_path)
 
-            # get current user 
-            current_user = User.query.first()
 
             try:
                 # create new file
@@ -607,7 +1213,7 @@ class CMTApp:
         try:
 
             file = File.query.get(file_id)
-            if not file or not os.path.exists(file.file_path):
+            if not file or not os.path.exists(file.file_path) or not self._can_open_file(file):
                 flash('File not found!', 'danger')
                 return redirect(url_for('file_management'))
 
@@ -623,21 +1229,26 @@ class CMTApp:
 
 
 
+    def _can_open_file(self, file):
+        """direct message attachments are only for the people in that conversation."""
+        return not file.message_only or MessageAttachment.user_can_access(current_user, file.id)
+
     @login_required
     def delete_file(self, file_id):
         """delete file route ,deletes a file and its versions from DB and filesystem."""
 
         file = File.query.get(file_id)
-        if not file:
+        if not file or not self._can_open_file(file):
             flash('File not found!', 'danger')
             return redirect(url_for('file_management'))
 
         project_id = file.project_id
 
-        # delete file from filesystem
+        # delete file from filesystem, attachment bytes may be shared with other projects
 
         try:
-            if os.path.exists(file.file_path):
+            shared = File.query.filter(File.file_path == file.file_path, File.id != file.id).first()
+            if os.path.exists(file.file_path) and not shared:
                 os.remove(file.file_path)
         except Exception as e:
             print(f"Error deleting file {file.file_path}: {e}")
@@ -674,6 +1285,12 @@ class CMTApp:
                 flash('Project not found!', 'danger')
                 return redirect(url_for('view_projects'))
 
+            # the assignee list shows users too
+            etag = self._project_page_etag(('tasks', self.fragment_cache.generation('users')), project_id)
+            not_modified = self._not_modified(etag)
+            if not_modified:
+                return not_modified
+
             # get project data
             tasks = project.get_tasks()
             milestones = project.get_milestones()
@@ -685,7 +1302,7 @@ class CMTApp:
             project_dict = project.to_dict()
             project_dict['milestones'] = [m.to_dict() for m in milestones]
 
-            return render_template('task.html',
+            return self._versioned_page(etag, 'task.html',
                                   project=project_dict,
                                   tasks=[t.to_dict() for t in tasks],
                                   users=users)
@@ -729,8 +1346,6 @@ class CMTApp:
         assigned_to_id = int(assigned_to_id) if assigned_to_id and assigned_to_id.isdigit() else None
         milestone_id = int(milestone_id) if milestone_id and milestone_id.isdigit() else None
 
-        # get current user
-        current_user = User.query.first()
 
         # create new task using model method
         try:
@@ -753,6 +1368,143 @@ class CMTApp:
             flash(f'Error creating task: {str(e)}', 'danger')
 
         return redirect(url_for('view_tasks', project_id=project_id))
+
+    @login_required
+    def import_tasks(self, project_id):
+        """
+        bulk import tasks from an uploaded CSV or JSON Lines file.
+        answers with JSON when the client asks for it, otherwise flashes
+        the result and goes back to the task list.
+        """
+        wants_json = request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+
+        def finish(message, category, status=200, **extra):
+            if wants_json:
+                return jsonify({'message': message, **extra}), status
+            flash(message, category)
+            return redirect(url_for('view_tasks', project_id=project_id))
+
+        project = Project.query.get(project_id)
+        if not project:
+            return finish('project not found', 'danger', 404)
+
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return finish('no file selected', 'danger', 400)
+
+        file_format = request.form.get('file_format') or task_transfer.guess_format(upload.filename)
+        if file_format not in task_transfer.FORMATS:
+            return finish(f'unknown format {file_format}', 'danger', 400)
+
+        # by default one bad row stops the whole import
+        skip_invalid = request.form.get('skip_invalid') in ('1', 'true', 'on')
+
+        try:
+            rows = task_transfer.read_task_rows(upload.stream, file_format)
+            imported, errors = Task.bulk_import(project_id, rows,
+                                                created_by_id=current_user.id,
+                                                skip_invalid=skip_invalid)
+        except Exception as e:
+            print(f"error importing tasks: {e}")
+            return finish(f'Error importing tasks: {str(e)}', 'danger', 500)
+
+        if imported:
+            self.fragment_cache.invalidate('tasks', f'project:{project_id}')
+
+        if errors and not imported:
+            summary = '; '.join(f"line {err['line']}: {err['error']}" for err in errors[:5])
+            return finish(f'Nothing imported, {len(errors)} bad row(s). {summary}', 'danger', 422,
+                          imported=0, errors=errors)
+
+        message = f'Imported {imported} task(s)'
+        if errors:
+            message += f', skipped {len(errors)} bad row(s)'
+        return finish(message, 'warning' if errors else 'success', imported=imported, errors=errors)
+
+    @login_required
+    def batch_update_tasks(self, project_id):
+        """
+        change status, assignee, milestone or due date of many tasks at once.
+
+        takes JSON {"task_ids": [...], "changes": {...}} or the batch form
+        on the task page. an empty value in changes clears that field.
+        """
+        project = Project.query.get(project_id)
+        is_json = request.is_json
+
+        def finish(message, category, status=200, **extra):
+            if is_json:
+                return jsonify({'success': status == 200, 'message': message, **extra}), status
+            flash(message, category)
+            return redirect(url_for('view_tasks', project_id=project_id))
+
+        if not project:
+            return finish('project not found', 'danger', 404)
+
+        if is_json:
+            payload = request.get_json(silent=True) or {}
+            task_ids = payload.get('task_ids') or []
+            raw_changes = payload.get('changes') or {}
+        else:
+            task_ids = request.form.getlist('task_ids')
+            # the form only sends the fields the user picked something for
+            raw_changes = {field: request.form.get(f'batch_{field}')
+                           for field in Task.BATCH_FIELDS
+                           if request.form.get(f'batch_{field}') not in (None, '')}
+            # "none" in a select means clear the field
+            raw_changes = {field: ('' if value == 'none' else value) for field, value in raw_changes.items()}
+
+        try:
+            task_ids = [int(task_id) for task_id in task_ids]
+            changes = {}
+            for field, value in raw_changes.items():
+                if value in (None, ''):
+                    if field == 'status':
+                        raise ValueError('status can not be empty')
+                    changes[field] = None
+                elif field in ('assigned_to_id', 'milestone_id'):
+                    changes[field] = int(value)
+                elif field == 'due_date':
+                    changes[field] = datetime.strptime(value, '%Y-%m-%d').date()
+                else:
+                    changes[field] = value
+
+            if not task_ids:
+                raise ValueError('no tasks selected')
+            if not changes:
+                raise ValueError('nothing to change')
+
+            updated = Task.bulk_update(task_ids, changes, project_id=project_id)
+            self.fragment_cache.invalidate('tasks', f'project:{project_id}')
+        except (TypeError, ValueError) as e:
+            return finish(f'Error updating tasks: {str(e)}', 'danger', 400)
+        except Exception as e:
+            print(f"error in batch task update: {e}")
+            return finish('Error updating tasks', 'danger', 500)
+
+        return finish(f'Updated {updated} task(s)', 'success', updated=updated)
+
+    @login_required
+    def export_tasks(self, project_id):
+        """
+        stream all tasks of a project as CSV or JSON Lines (?format=).
+        """
+        project = Project.query.get(project_id)
+        if not project:
+            flash('project not found', 'danger')
+            return redirect(url_for('view_projects'))
+
+        file_format = request.args.get('format', task_transfer.FORMAT_CSV)
+        if file_format not in task_transfer.FORMATS:
+            file_format = task_transfer.FORMAT_CSV
+
+        rows = Task.iter_export_rows(project_id)
+        body = task_transfer.write_rows(rows, Task.EXPORT_FIELDS, file_format)
+
+        filename = f'project_{project_id}_tasks.{file_format}'
+        return Response(stream_with_context(body),
+                        mimetype=task_transfer.MIMETYPES[file_format],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
     
 
 
@@ -816,6 +1568,7 @@ class CMTApp:
                 actual_start_datetime=actual_start_datetime,
                 actual_end_datetime=actual_end_datetime
             )
+            self.notification_facade.notify_task_updated(task, actor_id=current_user.id)
             flash('Task updated  ', 'success')
         except Exception as e:
             flash(f'Error updating task: {str(e)}', 'danger')
@@ -915,6 +1668,8 @@ class CMTApp:
         # parse date
         due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date() if due_date_str else None
 
+        was_completed = milestone.status == Milestone.STATUS_COMPLETED
+
         try:
             # update milestone fields
             milestone.title = title if title else milestone.title
@@ -930,6 +1685,15 @@ class CMTApp:
             # update completion percentage
             milestone.update_completion()
 
+            if milestone.status == Milestone.STATUS_COMPLETED and not was_completed:
+                project = Project.query.get(project_id)
+                self.notification_facade.notify_project_members(
+                    project,
+                    f"Milestone completed: {milestone.title}",
+                    Notification.TYPE_MILESTONE_COMPLETED,
+                    milestone_id=milestone.id,
+                    exclude_user_id=current_user.id)
+
             flash('Milestone updated  !', 'success')
         except Exception as e:
             flash(f'Error updating milestone: {str(e)}', 'danger')
@@ -973,6 +1737,11 @@ class CMTApp:
                 flash('Project not found!', 'danger')
                 return redirect(url_for('view_projects'))
 
+            etag = self._project_page_etag('progress', project_id)
+            not_modified = self._not_modified(etag)
+            if not_modified:
+                return not_modified
+
             # update milestone progress
             project.update_milestone_progress()
 
@@ -990,12 +1759,17 @@ class CMTApp:
             completed_tasks = sum(1 for task in tasks if task.status == Task.STATUS_FINISHED)
             project_completion = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
-            return render_template('progress_dashboard.html',
+            # the cached part of the page: bulk writes skip the ORM events that bump
+            # project:<id>, and milestones turn delayed with the date alone
+            fragment_version = (project_version_stamp(project_id), date.today().isoformat())
+
+            return self._versioned_page(etag, 'progress_dashboard.html',
                                   project=project.to_dict(),
                                   milestones=[m.to_dict() for m in milestones],
                                   active_milestone=active_milestone.to_dict() if active_milestone else None,
                                   tasks=[t.to_dict() for t in tasks],
-                                  project_completion=project_completion)
+                                  project_completion=project_completion,
+                                  fragment_version=fragment_version)
         except Exception as e:
             flash(f'Error loading progress dashboard: {str(e)}', 'danger')
             return redirect(url_for('view_projects'))
@@ -1003,6 +1777,216 @@ class CMTApp:
 
 
 
+    # JSON API v1 handlers
+    def _api_error(self, message, status):
+        """standard JSON error body for the API."""
+        return jsonify({
+            'success': False,
+            'error': message
+        }), status
+
+    def _api_visible_project(self, project_id):
+        """
+        get a project the current user may see.
+        returns (project, None) or (None, error response)
+        """
+        project = Project.query.get(project_id)
+        visible = current_user.get_accessible_project_ids()
+        if not project or (visible is not None and project.id not in visible):
+            return None, self._api_error('project not found', 404)
+        return project, None
+
+    def _api_attach_includes(self, items, include, relations):
+        """
+        add the ?include= relationships to a list of serialized rows.
+        one query per relationship for the whole page, not one per row.
+        """
+        parent_ids = [item['id'] for item in items]
+        for name in include:
+            model, foreign_key = relations[name]
+            fields = parse_fields(request.args, name, primary=False)
+            columns = load_only_columns(model, name, fields, extra=(foreign_key,))
+
+            children = {}
+            if parent_ids:
+                rows = model.query.options(load_only(*columns)) \
+                    .filter(getattr(model, foreign_key).in_(parent_ids)) \
+                    .order_by(model.id)
+                for row in rows:
+                    children.setdefault(getattr(row, foreign_key), []).append(serialize(row, name, fields))
+
+            for item in items:
+                item[name] = children.get(item['id'], [])
+
+    def _api_page(self, items, next_cursor):
+        """wrap one page of API data with the link to the next page."""
+        next_link = None
+        if next_cursor:
+            args = {key: value for key, value in request.args.items() if key != 'cursor'}
+            args.update(request.view_args or {})
+            next_link = url_for(request.endpoint, cursor=next_cursor, **args)
+
+        return jsonify({
+            'success': True,
+            'data': items,
+            'next_cursor': next_cursor,
+            'links': {'next': next_link}
+        })
+
+    @login_required
+    def api_v1_projects(self):
+        """GET /api/v1/projects - projects the user can see, paginated."""
+        try:
+            fields = parse_fields(request.args, 'projects')
+            include = parse_include(request.args, 'projects')
+            page_args = self._page_args()
+
+            query = Project.query.options(load_only(*load_only_columns(Project, 'projects', fields)))
+
+            visible = current_user.get_accessible_project_ids()
+            if visible is not None:
+                query = query.filter(Project.id.in_(visible))
+
+            status = request.args.get('status')
+            if status:
+                query = query.filter(Project.status == status)
+
+            projects, next_cursor = keyset_paginate(query, [Project.id],
+                                                    page_args['cursor'], page_args['limit'])
+
+            items = [serialize(p, 'projects', fields) for p in projects]
+            self._api_attach_includes(items, include, {
+                'tasks': (Task, 'project_id'),
+                'milestones': (Milestone, 'project_id')
+            })
+            return self._api_page(items, next_cursor)
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+    @login_required
+    def api_v1_project(self, project_id):
+        """GET /api/v1/projects/<id> - one project, ?include=tasks,milestones."""
+        try:
+            project, error = self._api_visible_project(project_id)
+            if error:
+                return error
+
+            fields = parse_fields(request.args, 'projects')
+            include = parse_include(request.args, 'projects')
+
+            items = [serialize(project, 'projects', fields)]
+            self._api_attach_includes(items, include, {
+                'tasks': (Task, 'project_id'),
+                'milestones': (Milestone, 'project_id')
+            })
+            return jsonify({
+                'success': True,
+                'data': items[0]
+            })
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+    @login_required
+    def api_v1_project_tasks(self, project_id):
+        """GET /api/v1/projects/<id>/tasks - tasks of a project, paginated."""
+        try:
+            project, error = self._api_visible_project(project_id)
+            if error:
+                return error
+
+            fields = parse_fields(request.args, 'tasks')
+            page_args = self._page_args()
+
+            query = Task.query.options(load_only(*load_only_columns(Task, 'tasks', fields))) \
+                .filter(Task.project_id == project.id)
+
+            status = request.args.get('status')
+            if status in Task.STATUS_OPTIONS:
+                query = query.filter(Task.status == status)
+
+            assigned_to_id = self._int_arg('assigned_to_id')
+            if assigned_to_id is not None:
+                query = query.filter(Task.assigned_to_id == assigned_to_id)
+
+            milestone_id = self._int_arg('milestone_id')
+            if milestone_id is not None:
+                query = query.filter(Task.milestone_id == milestone_id)
+
+            tasks, next_cursor = keyset_paginate(query, [Task.id],
+                                                 page_args['cursor'], page_args['limit'])
+            return self._api_page([serialize(t, 'tasks', fields) for t in tasks], next_cursor)
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+    @login_required
+    def api_v1_project_milestones(self, project_id):
+        """GET /api/v1/projects/<id>/milestones - milestones, ?include=tasks."""
+        try:
+            project, error = self._api_visible_project(project_id)
+            if error:
+                return error
+
+            fields = parse_fields(request.args, 'milestones')
+            include = parse_include(request.args, 'milestones')
+            page_args = self._page_args()
+
+            query = Milestone.query.options(load_only(*load_only_columns(Milestone, 'milestones', fields))) \
+                .filter(Milestone.project_id == project.id)
+
+            milestones, next_cursor = keyset_paginate(query, [Milestone.id],
+                                                      page_args['cursor'], page_args['limit'])
+
+            items = [serialize(m, 'milestones', fields) for m in milestones]
+            self._api_attach_includes(items, include, {'tasks': (Task, 'milestone_id')})
+            return self._api_page(items, next_cursor)
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+
+
+
+    @login_required
+    def search(self):
+        """search tasks, milestones, files, forum posts and messages in one place."""
+        wants_json = request.args.get('format') == 'json'
+        try:
+            query_text = request.args.get('q', '').strip()
+            entity_type = request.args.get('type')
+            entity_types = [entity_type] if entity_type in SearchDocument.ENTITY_TYPES else None
+
+            limit = request.args.get('limit', '20')
+            limit = min(int(limit), 100) if limit.isdigit() and int(limit) > 0 else 20
+
+            # the service only returns hits the current user is allowed to see
+            results = SearchService.search(query_text,
+                                           current_user,
+                                           entity_types=entity_types,
+                                           limit=limit) if query_text else []
+
+            if wants_json:
+                return jsonify({
+                    'success': True,
+                    'query': query_text,
+                    'results': results
+                })
+
+            return render_template('search_results.html',
+                                  query=query_text,
+                                  selected_type=entity_type,
+                                  entity_types=SearchDocument.ENTITY_TYPES,
+                                  results=results)
+        except Exception as e:
+            if wants_json:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+            flash(f'Error searching: {str(e)}', 'danger')
+            return redirect(url_for('view_projects'))
+
+
+
+
     @login_required
     def view_reports(self, project_id):
         """view reports for a project."""
@@ -1031,8 +2015,6 @@ class CMTApp:
             flash('project not found', 'danger')
             return redirect(url_for('view_projects'))
 
-        # get current user 
-        current_user = User.query.first()
 
         # get report filters 
         filters = {
@@ -1105,37 +2087,33 @@ class CMTApp:
 
 
     # message routes handlers
+    def _inbox_sidebar(self):
+        """the recent conversations list of the messages pages, ?inbox= pages it."""
+        inbox, inbox_cursor = self.communication_facade.get_inbox_page(
+            current_user.id, cursor=request.args.get('inbox'),
+            limit=parse_limit(request.args.get('inbox_limit'), default=20))
+        return {'inbox': inbox, 'inbox_cursor': inbox_cursor}
+
     @login_required
     def view_messages(self):
         """show the messages page with all conversations."""
         try:
-            # get current user 
-            current_user = User.query.first()
 
             if not current_user:
                 flash('No user found in the system!', 'danger')
                 return redirect(url_for('view_projects'))
 
-            # get all users except current user
-            users = User.query.filter(User.id != current_user.id).all()
-
-            # get all projects for the dropdown
-            projects = Project.query.all()
+            # team members matching ?who=, not the whole user table
+            users = self._typeahead(request.args.get('who'), kinds=('user',), limit=20)
 
             # get unread message counts for each user using CommunicationFacade
-            unread_counts = {}
-            for user in users:
-                # use facade to get unread messages instead of direct query
-                unread_messages = self.communication_facade.get_unread_messages(current_user.id)
-                # count messages from this specific user
-                unread_count = sum(1 for msg in unread_messages if msg.senderID == user.id)
-                unread_counts[user.id] = unread_count
+            unread_counts = self.communication_facade.get_unread_counts_by_sender(current_user.id)
 
             return render_template('messages.html',
                                   current_user=current_user,
                                   users=users,
-                                  projects=projects,
                                   unread_counts=unread_counts,
+                                  **self._inbox_sidebar(),
                                   selected_user=None,
                                   messages=[])
 
@@ -1147,12 +2125,22 @@ class CMTApp:
 
 
 
+    def _mark_received_read(self, peer_id, received):
+        """
+        move the read position of each (peer, project) conversation to the
+        newest of its messages in received, a list of (project_id, message_id).
+        """
+        newest = {}
+        for project_id, message_id in received:
+            newest[project_id] = max(newest.get(project_id, 0), message_id)
+        for project_id, message_id in newest.items():
+            self.communication_facade.mark_conversation_as_read(current_user.id, peer_id, message_id,
+                                                                project_id=project_id)
+
     @login_required
     def view_conversation(self, user_id):
         """show conversation with a specific user."""
         try:
-            # get current user 
-            current_user = User.query.first()
 
             if not current_user:
                 flash('No user found in the system!', 'danger')
@@ -1164,11 +2152,8 @@ class CMTApp:
                 flash('User not found!', 'danger')
                 return redirect(url_for('view_messages'))
 
-            # get all users except current user
-            users = User.query.filter(User.id != current_user.id).all()
-
-            # get all projects for the dropdown
-            projects = Project.query.all()
+            # team members matching ?who=, not the whole user table
+            users = self._typeahead(request.args.get('who'), kinds=('user',), limit=20)
 
             # get project_id from query parameter if provided
             project_id = request.args.get('project_id')
@@ -1188,25 +2173,19 @@ class CMTApp:
                     selected_user.id
                 )
 
-            # mark messages  read using facade
-            for message in messages:
-                if message.senderID == selected_user.id and message.receiverID == current_user.id and not message.isRead:
-                    self.communication_facade.mark_message_as_read(message.messageID)
+            # mark messages  read using facade, one move of the read position per project shown
+            self._mark_received_read(selected_user.id, [
+                (message.projectID, message.messageID) for message in messages
+                if message.senderID == selected_user.id and message.receiverID == current_user.id])
 
             # get unread message counts for each user using CommunicationFacade
-            unread_counts = {}
-            for user in users:
-                # use the  facade to get unread messages instead of direct query
-                unread_messages = self.communication_facade.get_unread_messages(current_user.id)
-                # count messages from this specific user
-                unread_count = sum(1 for msg in unread_messages if msg.senderID == user.id)
-                unread_counts[user.id] = unread_count
+            unread_counts = self.communication_facade.get_unread_counts_by_sender(current_user.id)
 
             return render_template('messages.html',
                                   current_user=current_user,
                                   users=users,
-                                  projects=projects,
                                   unread_counts=unread_counts,
+                                  **self._inbox_sidebar(),
                                   selected_user=selected_user,
                                   selected_user_id=selected_user.id,
                                   selected_project=selected_project,
@@ -1223,13 +2202,14 @@ class CMTApp:
     def send_message(self):
         """send a new message using CommunicationFacade"""
         try:
-            # get current user 
-            current_user = User.query.first()
 
             if not current_user:
                 flash('No user found in the system!', 'danger')
                 return redirect(url_for('view_projects'))
 
+            # attachments are written to the attachment store while the form is read
+            request.upload_stream_factory = MessageAttachment.spool_factory()
+
             # get form data
             receiver_id = request.form.get('receiver_id')
             content = request.form.get('content')
@@ -1253,7 +2233,8 @@ class CMTApp:
                 sender_id=current_user.id,
                 receiver_id=receiver_id,
                 content=content,
-                project_id=project_id
+                project_id=project_id,
+                attachments=[upload for upload in request.files.getlist('attachments') if upload.filename]
             )
 
             if new_message:
@@ -1270,12 +2251,185 @@ class CMTApp:
             return redirect(url_for('view_messages'))
 
 
+    def _channel_project(self, project_id):
+        """the project if the current user may use its channel, else None."""
+        project = Project.query.get(project_id)
+        visible = current_user.get_accessible_project_ids()
+        if not project or (visible is not None and project.id not in visible):
+            return None
+        return project
+
+    @login_required
+    def view_project_channel(self, project_id):
+        """show a page of the project's channel, newest page marks it read."""
+        try:
+            project = self._channel_project(project_id)
+            if not project:
+                flash('Project not found!', 'danger')
+                return redirect(url_for('view_projects'))
+
+            before_id = request.args.get('before', type=int)
+            limit = parse_limit(request.args.get('limit'), default=50)
+            messages, older = self.communication_facade.get_channel_page(
+                current_user.id, project.id, before_id=before_id, limit=limit)
+
+            return render_template('project_channel.html',
+                                   project=project,
+                                   messages=messages,
+                                   older=older)
+        except Exception as e:
+            flash(f'Error loading channel: {str(e)}', 'danger')
+            return redirect(url_for('view_projects'))
+
+    @login_required
+    def send_channel_message(self, project_id):
+        """post one message to the whole project."""
+        try:
+            if not self._channel_project(project_id):
+                flash('Project not found!', 'danger')
+                return redirect(url_for('view_projects'))
+
+            request.upload_stream_factory = MessageAttachment.spool_factory()
+            content = request.form.get('content')
+            if not content or not content.strip():
+                flash('Message cannot be empty!', 'danger')
+                return redirect(url_for('view_project_channel', project_id=project_id))
+
+            uploads = [upload for upload in request.files.getlist('attachments') if upload.filename]
+            if self.communication_facade.send_channel_message(current_user.id, project_id, content,
+                                                              attachments=uploads):
+                flash('Message sent  !', 'success')
+            else:
+                flash('Failed to send message. Please try again.', 'danger')
+            return redirect(url_for('view_project_channel', project_id=project_id))
+
+        except Exception as e:
+            flash(f'Error sending message: {str(e)}', 'danger')
+            return redirect(url_for('view_project_channel', project_id=project_id))
+
+    def _wait_for_messages(self, keys, load):
+        """
+        the messages load() returns, as dicts. when there are none yet, wait
+        up to ?timeout= seconds (at most LONGPOLL_TIMEOUT) for one to be
+        committed, see utils/message_waiters.
+        """
+        limit = self.app.config['LONGPOLL_TIMEOUT']
+        timeout = request.args.get('timeout', type=float)
+        timeout = limit if timeout is None else max(0.0, min(timeout, limit))
+
+        def check():
+            messages = [message.to_dict() for message in load()]
+            # end the transaction: the wait holds no database connection
+            # and the next check sees what was committed meanwhile
+            db.session.rollback()
+            return messages
+
+        messages = message_waiters.wait_for(keys, check, timeout, self.app.config['LONGPOLL_RECHECK_SECONDS'])
+        for message in messages:
+            for attachment in message['attachments']:
+                attachment['url'] = url_for('download_message_attachment', file_id=attachment['id'])
+        return messages
+
+    def _waiters_full(self):
+        """503 for a poll refused past LONGPOLL_MAX_WAITERS, the client backs off."""
+        response, status = self._api_error('too many requests are waiting, try again later', 503)
+        response.headers['Retry-After'] = str(max(1, round(self.app.config['LONGPOLL_RECHECK_SECONDS'])))
+        return response, status
+
+    def _poll_response(self, messages, after_id):
+        return jsonify({
+            'success': True,
+            'messages': messages,
+            'last_id': messages[-1]['id'] if messages else after_id
+        })
+
+    @login_required
+    def poll_conversation(self, user_id):
+        """GET /messages/<user_id>/poll?after=<messageID> - new messages of an open conversation."""
+        try:
+            if not User.query.get(user_id):
+                return self._api_error('user not found', 404)
+            after_id = request.args.get('after', 0, type=int)
+            project_id = request.args.get('project_id', type=int)
+
+            messages = self._wait_for_messages(
+                [f"user:{current_user.id}"],
+                lambda: self.communication_facade.get_messages_since(
+                    current_user.id, after_id, peer_id=user_id, project_id=project_id))
+
+            # the conversation is open, so what arrived is read
+            self._mark_received_read(user_id, [(message['project_id'], message['id'])
+                                               for message in messages if message['sender_id'] == user_id])
+            return self._poll_response(messages, after_id)
+        except WaitersFull:
+            return self._waiters_full()
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+    @login_required
+    def poll_project_channel(self, project_id):
+        """GET /project/<project_id>/channel/poll?after=<messageID> - new channel messages."""
+        try:
+            if not self._channel_project(project_id):
+                return self._api_error('project not found', 404)
+            after_id = request.args.get('after', 0, type=int)
+
+            messages = self._wait_for_messages(
+                [f"project:{project_id}"],
+                lambda: self.communication_facade.get_messages_since(
+                    current_user.id, after_id, project_id=project_id))
+
+            if messages:
+                ConversationReadState.mark_read(current_user.id, ConversationReadState.channel_key(project_id),
+                                                messages[-1]['id'], project_id=project_id)
+                db.session.commit()
+            return self._poll_response(messages, after_id)
+        except WaitersFull:
+            return self._waiters_full()
+        except Exception as e:
+            db.session.rollback()
+            return self._api_error(str(e), 500)
+
+    def _message_attachment(self, file_id):
+        """the attached File if the current user may open it, else None."""
+        file = File.query.get(file_id)
+        if not file or not MessageAttachment.user_can_access(current_user, file_id):
+            return None
+        return file
+
+    @login_required
+    def download_message_attachment(self, file_id):
+        """stream an attachment from disk."""
+        try:
+            file = self._message_attachment(file_id)
+            if not file or not os.path.exists(file.file_path):
+                flash('File not found!', 'danger')
+                return redirect(url_for('view_messages'))
+            return send_file(file.file_path, as_attachment=True, download_name=file.fileName)
+        except Exception as e:
+            flash(f'Error downloading file: {str(e)}', 'danger')
+            return redirect(url_for('view_messages'))
+
+    @login_required
+    def preview_message_attachment(self, file_id):
+        """small preview of an attachment, made the first time it is asked for."""
+        try:
+            file = self._message_attachment(file_id)
+            preview = MessageAttachment.preview_path(file) if file else None
+            if not preview:
+                return Response(status=404)
+            path, mimetype = preview
+            response = send_file(path, mimetype=mimetype, max_age=86400)
+            response.headers['Cache-Control'] = 'private, max-age=86400'
+            return response
+        except Exception as e:
+            print(f"error making attachment preview {file_id}: {e}")
+            return Response(status=404)
+
     @login_required
     def search_messages(self):
         """search messages by keyword, sender, and date range."""
         try:
-            # get current user
-            current_user = User.query.first()
 
             if not current_user:
                 flash('No user found in the system!', 'danger')
@@ -1317,18 +2471,11 @@ class CMTApp:
             
             messages = query.order_by(Message.timestamp.desc()).all()
 
-            # get all users except current user
-            users = User.query.filter(User.id != current_user.id).all()
+            # team members matching ?who=, not the whole user table
+            users = self._typeahead(request.args.get('who'), kinds=('user',), limit=20)
 
-            # Get all projects for the dropdown
-            projects = Project.query.all()            # Get unread message counts for each user using CommunicationFacade
-            unread_counts = {}
-            for user in users:
-                # Use facade to get unread messages instead of direct query
-                unread_messages = self.communication_facade.get_unread_messages(current_user.id)
-                # Count messages from this specific user
-                unread_count = sum(1 for msg in unread_messages if msg.senderID == user.id)
-                unread_counts[user.id] = unread_count
+            # Get unread message counts for each user using CommunicationFacade
+            unread_counts = self.communication_facade.get_unread_counts_by_sender(current_user.id)
 
             # Prepare search results message
             if messages:
@@ -1339,8 +2486,8 @@ class CMTApp:
             return render_template('messages.html',
                                   current_user=current_user,
                                   users=users,
-                                  projects=projects,
                                   unread_counts=unread_counts,
+                                  **self._inbox_sidebar(),
                                   selected_user=None,
                                   messages=messages,
                                   is_search_result=True,
@@ -1377,7 +2524,7 @@ class CMTApp:
                     # Log the user in
                     login_user(user, remember=remember_me)
 
-                    # Update last login timestamp
+                    # Update last login timestamp (also saves a rehashed password)
                     user.update_last_login()
                     db.session.commit()
 
@@ -1401,6 +2548,10 @@ class CMTApp:
             # GET request - show login form
             return render_template('login.html')
 
+        except PasswordHasherBusy:
+            # too many logins being checked right now, fail fast
+            flash('The server is busy, please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
         except Exception as e:
             flash(f'Error during login: {str(e)}', 'danger')
             return redirect(url_for('login'))
@@ -1410,8 +2561,10 @@ class CMTApp:
         try:
             # Clear remember me token if it exists
             if current_user.is_authenticated:
-                current_user.clear_remember_me_token()
-                db.session.commit()
+                user = current_user.get_user()
+                if user:
+                    user.clear_remember_me_token()
+                    db.session.commit()
 
             # Log the user out
             logout_user()
@@ -1471,13 +2624,14 @@ class CMTApp:
 
                     # Generate verification token
                     token = new_user.generate_verification_token()
-                    db.session.commit()
 
                     # Create verification URL
                     verification_url = url_for('verify_email', token=token, _external=True)
 
-                    # Send verification email using facade
+                    # queue the verification email, it commits together with the token
                     self.notification_facade.send_email_verification(new_user, verification_url)
+                    db.session.commit()
+                    self.scheduler.wake('email_outbox')
 
                     # For development, print the token
                     print(f"Verification URL for {email}: {verification_url}")
@@ -1490,6 +2644,10 @@ class CMTApp:
                 except ValueError as e:
                     flash(f'Error creating account: {str(e)}', 'danger')
                     return render_template('register.html')
+                except PasswordHasherBusy:
+                    db.session.rollback()
+                    flash('The server is busy, please try again in a moment.', 'warning')
+                    return render_template('register.html'), 503
 
             # GET request - show registration form
             return render_template('register.html')
@@ -1502,15 +2660,15 @@ class CMTApp:
     def verify_email(self, token):
         """handle email verification."""
         try:
-            # Find the token in the database
-            auth_token = AuthToken.query.filter_by(token_value=token, token_type=AuthToken.TOKEN_TYPE_VERIFY).first()
+            # who the token is for (a table lookup or just a signature check)
+            user_id = get_token_store().peek_user_id(token, PURPOSE_VERIFY)
 
-            if not auth_token:
-                flash('Invalid verification token.', 'danger')
+            if not user_id:
+                flash('Invalid or expired verification token.', 'danger')
                 return redirect(url_for('login'))
 
             # Get the user associated with this token
-            user = User.query.get(auth_token.user_id)
+            user = User.query.get(user_id)
 
             if not user:
                 flash('User not found.', 'danger')
@@ -1519,6 +2677,7 @@ class CMTApp:
             # Verify the email
             if user.verify_email(token):
                 db.session.commit()
+                principal_cache.invalidate(user.id)
                 # Show verification success page instead of redirecting to login
                 return render_template('verification_success.html')
             else:
@@ -1542,11 +2701,14 @@ class CMTApp:
                 if user:
                     # Generate password reset token
                     token = user.generate_password_reset_token()
-                    db.session.commit()
 
                     # Create reset URL
-                    reset_url = url_for('reset_password', token=token, _external=True)                    # Send password reset email using facade
+                    reset_url = url_for('reset_password', token=token, _external=True)
+
+                    # queue the reset email, it commits together with the token
                     self.notification_facade.send_password_reset(user, reset_url)
+                    db.session.commit()
+                    self.scheduler.wake('email_outbox')
 
                     # For development, print the token
                     print(f"Password reset URL for {email}: {reset_url}")
@@ -1578,15 +2740,15 @@ class CMTApp:
                     flash('Passwords do not match.', 'danger')
                     return redirect(url_for('reset_password', token=token))
 
-                # Find the token in the database
-                auth_token = AuthToken.query.filter_by(token_value=token, token_type=AuthToken.TOKEN_TYPE_RESET).first()
+                # who the token is for (a table lookup or just a signature check)
+                user_id = get_token_store().peek_user_id(token, PURPOSE_RESET)
 
-                if not auth_token:
-                    flash('Invalid reset token.', 'danger')
-                    return redirect(url_for('login'))
+                if not user_id:
+                    flash('Invalid or expired reset token. Please request a new one.', 'danger')
+                    return redirect(url_for('forgot_password'))
 
                 # Get the user associated with this token
-                user = User.query.get(auth_token.user_id)
+                user = User.query.get(user_id)
 
                 if not user:
                     flash('User not found.', 'danger')
@@ -1603,9 +2765,7 @@ class CMTApp:
 
             # GET request - show reset password form
             # Check if token is valid
-            auth_token = AuthToken.query.filter_by(token_value=token, token_type=AuthToken.TOKEN_TYPE_RESET).first()
-
-            if not auth_token or not auth_token.is_valid():
+            if not get_token_store().peek_user_id(token, PURPOSE_RESET):
                 flash('Invalid or expired reset token. Please request a new one.', 'danger')
                 return redirect(url_for('forgot_password'))
 
@@ -1623,13 +2783,16 @@ class CMTApp:
     def view_notifications(self):
         """view all notifications for the current user"""
         try:
-            # get notifications from NotificationFacade
-            all_notifications = self.notification_facade.get_user_notifications(current_user.id)
-            unread_notifications = self.notification_facade.get_unread_notifications(current_user.id)
+            # one page, recent ones first, the 'older' cursor reaches into the archive
+            notifications, next_cursor = self.notification_facade.get_notifications_page(
+                current_user.id,
+                request.args.get('cursor'),
+                parse_limit(request.args.get('limit'), default=25))
 
             return render_template('notifications.html',
-                                 notifications=all_notifications,
-                                 unread_count=len(unread_notifications))
+                                 notifications=notifications,
+                                 next_cursor=next_cursor,
+                                 unread_count=self.notification_facade.count_unread_notifications(current_user.id))
         except Exception as e:
             flash(f'Error loading notifications: {str(e)}', 'danger')
             return redirect(url_for('dashboard'))
@@ -1678,10 +2841,10 @@ class CMTApp:
     def get_unread_notifications(self):
         """JSON endpoint to get unread notification count."""
         try:
-            unread_notifications = self.notification_facade.get_unread_notifications(current_user.id)
+            unread_notifications = self.notification_facade.get_recent_unread_notifications(current_user.id, 20)
             return jsonify({
                 'success': True,
-                'unread_count': len(unread_notifications),
+                'unread_count': self.notification_facade.count_unread_notifications(current_user.id),
                 'notifications': [notif.to_dict() for notif in unread_notifications]
             })
         except Exception as e:
@@ -1724,14 +2887,83 @@ class CMTApp:
                 flash('you  are do not have permission to access this page.', 'danger')
                 return redirect(url_for('view_projects'))
 
-            # get all users
-            users = User.query.all()
+            # get one page of users
+            users, next_cursor, filters = self._list_users()
 
-            return render_template('user_management.html', users=users)
+            return render_template('user_management.html',
+                                   users=users,
+                                   next_cursor=next_cursor,
+                                   filters=filters,
+                                   roles=User.VALID_ROLES)
 
         except Exception as e:
             flash(f'Error loading user management: {str(e)}', 'danger')
             return redirect(url_for('view_projects'))
+
+    def _typeahead(self, prefix, kinds=('user', 'project'), limit=10):
+        """
+        people and projects whose names start with prefix, for the current
+        user. projects they can not see are left out, people they wrote
+        with most recently come first.
+        """
+        visible = current_user.get_accessible_project_ids()
+
+        def accept(kind, id):
+            if kind == 'user':
+                return id != current_user.id
+            return visible is None or id in visible
+
+        # look a little further than limit so recent contacts can move up
+        matches = typeahead_index.search(prefix, kinds=kinds, limit=limit * 3, accept=accept)
+
+        user_ids = [match['id'] for match in matches if match['kind'] == 'user']
+        recent = {}
+        if user_ids:
+            recent = dict(db.session.query(InboxEntry.peer_id, db.func.max(InboxEntry.last_message_at))
+                          .filter(InboxEntry.user_id == current_user.id, InboxEntry.peer_id.in_(user_ids))
+                          .group_by(InboxEntry.peer_id).all())
+        # stable sort: contacts by last message, newest first, then the rest in name order
+        matches.sort(key=lambda match: recent.get(match['id']).timestamp()
+                     if match['kind'] == 'user' and recent.get(match['id']) else float('-inf'),
+                     reverse=True)
+        return matches[:limit]
+
+    @login_required
+    def api_typeahead(self):
+        """GET /api/typeahead?q=<prefix>&types=user,project - name completions."""
+        try:
+            kinds = tuple(kind for kind in (request.args.get('types') or 'user,project').split(',')
+                          if kind in ('user', 'project'))
+            limit = parse_limit(request.args.get('limit'), default=10, maximum=50)
+            return jsonify({
+                'success': True,
+                'items': self._typeahead(request.args.get('q'), kinds=kinds or ('user', 'project'), limit=limit)
+            })
+        except Exception as e:
+            return self._api_error(str(e), 500)
+
+    @login_required
+    def api_list_users(self):
+        """JSON version of the user management list."""
+        try:
+            if not current_user.can_manage_users():
+                return jsonify({
+                    'success': False,
+                    'error': 'you do not have permission to list users'
+                }), 403
+
+            users, next_cursor, filters = self._list_users()
+            return jsonify({
+                'success': True,
+                'items': [u.to_dict() for u in users],
+                'next_cursor': next_cursor,
+                'filters': filters
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
         
 
 
@@ -1764,6 +2996,7 @@ class CMTApp:
                     user.set_password(new_password)
 
                 db.session.commit()
+                principal_cache.invalidate(user.id)
 
                 flash('User updated  .', 'success')
                 return redirect(url_for('user_management'))
@@ -1837,6 +3070,7 @@ class CMTApp:
             # update the role
             user.role = new_role
             db.session.commit()
+            principal_cache.invalidate(user.id)
 
             flash(f'Role updated   for {user.get_full_name()}.', 'success')
             return redirect(url_for('user_management'))
@@ -1872,22 +3106,13 @@ class CMTApp:
                 flash('No users selected.', 'warning')
                 return redirect(url_for('user_management'))
 
-            # check if this would remove all admins
-            if new_role != User.ROLE_ADMIN:
-                admin_ids = [str(user.id) for user in User.query.filter_by(role=User.ROLE_ADMIN).all()]
-                if all(admin_id in selected_users for admin_id in admin_ids):
-                    flash('cannot change roles: This would remove all administrators.', 'danger')
-                    return redirect(url_for('user_management'))
-
-            # update roles
-            updated_count = 0
-            for user_id in selected_users:
-                user = User.query.get(int(user_id))
-                if user:
-                    user.role = new_role
-                    updated_count += 1
-
-            db.session.commit()
+            # one COUNT for the last admin check and one UPDATE for everybody
+            try:
+                updated_count = User.bulk_set_role(selected_users, new_role)
+                self.fragment_cache.invalidate('users')
+            except ValueError as e:
+                flash(f'cannot change roles: {str(e)}', 'danger')
+                return redirect(url_for('user_management'))
 
             flash(f'Updated roles for {updated_count} users.', 'success')
             return redirect(url_for('user_management'))
@@ -1930,6 +3155,7 @@ class CMTApp:
             # delete the user
             db.session.delete(user)
             db.session.commit()
+            principal_cache.invalidate(user_id)
 
             flash('User deleted  .', 'success')
             return redirect(url_for('user_management'))
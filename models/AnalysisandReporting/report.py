@@ -2,8 +2,9 @@ from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 import json
 from models.database import db
+from models.versioning import VersionedMixin
 
-class Report(db.Model):
+class Report(VersionedMixin, db.Model):
     """
     Report class representing a performance report in the system.
     """
@@ -1,6 +1,11 @@
 # Communication models
 from models.Communication.message  import Message
 from models.Communication.notification   import Notification
+from models.Communication.notification_archive import NotificationArchive
+from models.Communication.email_outbox import OutboxEmail
+from models.Communication.conversation_read_state import ConversationReadState
+from models.Communication.inbox_entry import InboxEntry
+from models.Communication.message_attachment import MessageAttachment
 from models.Communication.communication_facade import CommunicationFacade
 
-__all__  = [ 'Message',  'Notification', 'CommunicationFacade']
\ No newline at end of file
+__all__  = [ 'Message',  'Notification', 'NotificationArchive', 'OutboxEmail', 'ConversationReadState', 'InboxEntry', 'MessageAttachment', 'CommunicationFacade']
\ No newline at end of file
@@ -1,10 +1,13 @@
+from sqlalchemy.orm import selectinload
+
 from models.database import db
 from models.Communication.message import Message
+from models.Communication.message_attachment import AttachmentError, MessageAttachment
 from models.Communication.notification import Notification
 from models.UserManagement.user import User
 from models.Communication.message_service import MessageService
 from models.Communication.notification_service import NotificationService
-from models.Communication.email_service import EmailService
+from models.Communication.email_service import get_email_service
 
 # we can import other  models like Project,  for linking later
 
@@ -16,7 +19,11 @@ class CommunicationFacade:
     def __init__(self):
         self.message_service = MessageService()
         self.notification_service = NotificationService()
-        self.email_service = EmailService()
+
+    @property
+    def email_service(self):
+        # the shared service, set up from the app's MAIL_* config
+        return get_email_service()
 
     def send_message(self, sender_id, recipient_id, content, attachments=None):
         # Simplified interface hiding complex subsystem interactions
@@ -30,18 +37,25 @@ class CommunicationFacade:
                             sender_id:    int,
                             receiver_id:   int,
                             content:  str, 
-                            project_id: int = None)  -> Message   | None:
+                            project_id: int = None,
+                            attachments=None)  -> Message   | None:
         """
         creates and saves a direct  message.
+        attachments are uploaded files, put in the attachment store before
+        the message is saved and linked to it in the same commit. if the
+        send fails the files it stored are removed again.
 
 
         returns:
             the created Message object or None 
         """
+        stored = []
         try:
             # basic valid
             if not all([sender_id,  receiver_id,  content]):
                 raise ValueError("Sender id, Receiver id you need to give them to me.")
+            if attachments and project_id is None:
+                raise AttachmentError("attachments need a project, pick one for the conversation")
             
             # Ensure users exist (optional, DB foreign keys should handle this)
             # sender = User.query.get(sender_id)
@@ -49,6 +63,9 @@ class CommunicationFacade:
             # if not sender or not receiver:
             #     raise ValueError("Invalid sender or receiver ID.")
 
+            for upload in attachments or []:
+                stored.append(MessageAttachment.store_upload(upload))
+
             message =    Message(
                 sender_id =sender_id,
                 receiver_id =receiver_id,
@@ -58,20 +75,78 @@ class CommunicationFacade:
 
 
             db.session.add(message)
+            if stored:
+                db.session.flush()
+                MessageAttachment.attach(message, stored, sender_id)
 
             db.session.commit()
             return message
         
         except ValueError as ve:
             print(f"valueError in send_direct_message  :   {ve}")
-            # db.session.rollback() # not import  if commit fails 
+            db.session.rollback()
+            MessageAttachment.discard(stored)
             return None
         except Exception as e:
             print(f"error sending direct   message: {e}")
             db.session.rollback()
+            MessageAttachment.discard(stored)
+            return None
+
+    def send_channel_message(self, sender_id: int, project_id: int, content: str,
+                             attachments=None) -> Message | None:
+        """
+        posts a message to a project channel, stored once for all members.
+
+        returns:
+            the created Message object or None
+        """
+        stored = []
+        try:
+            if not all([sender_id, project_id, content]):
+                raise ValueError("sender id, project id and content are needed")
+            for upload in attachments or []:
+                stored.append(MessageAttachment.store_upload(upload))
+            return Message.post_to_channel(sender_id, project_id, content, attachments=stored)
+        except ValueError as ve:
+            print(f"valueError in send_channel_message  :   {ve}")
+            MessageAttachment.discard(stored)
+            return None
+        except Exception as e:
+            print(f"error sending channel message: {e}")
+            MessageAttachment.discard(stored)
             return None
 
-    def create_system_notification(self, 
+    def get_channel_page(self, user_id: int, project_id: int, before_id: int = None, limit: int = 50):
+        """
+        one page of a project channel. opening the newest page moves the
+        user's read position to its last message.
+
+        returns:
+            (list of messages, before_id of the older page or None)
+        """
+        from models.Communication.conversation_read_state import ConversationReadState
+        try:
+            messages, older = Message.get_channel_page(project_id, before_id=before_id, limit=limit)
+            if messages and not before_id:
+                ConversationReadState.mark_read(user_id, ConversationReadState.channel_key(project_id),
+                                                messages[-1].messageID, project_id=project_id)
+                db.session.commit()
+            return messages, older
+        except Exception as e:
+            print(f"error loading project channel: {e}")
+            db.session.rollback()
+            return [], None
+
+    def count_channel_unread(self, user_id: int, project_id: int) -> int:
+        """unread channel messages for one member, 0 on errors."""
+        try:
+            return Message.channel_unread_count(user_id, project_id)
+        except Exception as e:
+            print(f"error  {e}")
+            return 0
+
+    def create_system_notification(self,
                                    user_id: int,
                                     title: str,
                                     notification_type: str,
@@ -122,7 +197,7 @@ class CommunicationFacade:
             # if not user:
             #     raise ValueError("invalid user id.")
 
-            unread_messages =   Message.query.filter_by(receiverID   =user_id  , isRead=False).order_by(Message.timestamp.desc()).all()
+            unread_messages =   Message.unread_direct_query(user_id).order_by(Message.timestamp.desc()).all()
             return unread_messages
         
 
@@ -134,6 +209,46 @@ class CommunicationFacade:
             print(f"error  {e}")
             return []
 
+    def count_unread_messages(self, user_id: int) -> int:
+        """
+        number of unread messages for a user, one COUNT query.
+
+        returns:
+            the unread count, 0 on errors.
+        """
+        try:
+            return Message.unread_direct_query(user_id, db.func.count(Message.messageID)).scalar() or 0
+        except Exception as e:
+            print(f"error  {e}")
+            return 0
+
+    def get_unread_counts_by_sender(self, user_id: int) -> dict:
+        """
+        unread direct messages per sender.
+
+        returns:
+            dict of sender id to unread count, empty on errors.
+        """
+        try:
+            return Message.unread_counts_by_sender(user_id)
+        except Exception as e:
+            print(f"error  {e}")
+            return {}
+
+    def get_inbox_page(self, user_id: int, cursor: str = None, limit: int = 20):
+        """
+        the user's conversations, most recent first, one page at a time.
+
+        returns:
+            (list of InboxEntry, next cursor or None)
+        """
+        from models.Communication.inbox_entry import InboxEntry
+        try:
+            return InboxEntry.get_page(user_id, cursor=cursor, limit=limit)
+        except Exception as e:
+            print(f"error loading inbox: {e}")
+            return [], None
+
     def get_unread_notifications(self, user_id: int) -> list[Notification]:
         """
         Retrieves all unread notifications for a specific user.
@@ -194,7 +309,8 @@ class CommunicationFacade:
 
                 query =   query.filter(Message.projectID == project_id)
             
-            messages =  query.order_by(Message.timestamp.asc()).all()
+            # only the File rows of the attachments, never their bytes
+            messages =  query.options(selectinload(Message.attachments)).order_by(Message.timestamp.asc()).all()
             return messages
         
 
@@ -203,6 +319,39 @@ class CommunicationFacade:
             print(f"error  {e}")
             return []
 
+    def get_messages_since(self,
+                           user_id: int,
+                           after_id: int,
+                           peer_id: int = None,
+                           project_id: int = None,
+                           limit: int = 100) -> list[Message]:
+        """
+        messages newer than after_id, oldest first: of the conversation
+        with peer_id, or of the project channel when peer_id is None.
+        an index seek past after_id, not the whole history.
+
+        returns:
+            a list of Message objects with their senders and attachments
+        """
+        try:
+            if peer_id is None:
+                query = Message.channel_query(project_id)
+            else:
+                query = Message.query.filter(
+                    ((Message.senderID == user_id) & (Message.receiverID == peer_id)) |
+                    ((Message.senderID == peer_id) & (Message.receiverID == user_id))
+                )
+                if project_id is not None:
+                    query = query.filter(Message.projectID == project_id)
+            return (query.filter(Message.messageID > after_id)
+                    .options(selectinload(Message.sender_user), selectinload(Message.attachments))
+                    .order_by(Message.messageID.asc())
+                    .limit(limit)
+                    .all())
+        except Exception as e:
+            print(f"error  {e}")
+            return []
+
     def mark_message_as_read(self,
                              message_id: int) -> bool:
         """
@@ -225,6 +374,25 @@ class CommunicationFacade:
             db.session.rollback()
             return False
 
+    def mark_conversation_as_read(self, user_id: int, peer_id: int, message_id: int,
+                                  project_id: int = None) -> bool:
+        """
+        marks everything peer_id sent user_id about project_id (None: outside
+        any project) up to message_id as read, one upsert of the read position.
+
+        returns:
+            True if good, False else.
+        """
+        from models.Communication.conversation_read_state import ConversationReadState
+        try:
+            ConversationReadState.mark_direct_read(user_id, peer_id, message_id, project_id=project_id)
+            db.session.commit()
+            return True
+        except Exception as e:
+            print(f"Error marking conversation as read: {e}")
+            db.session.rollback()
+            return False
+
     def mark_notification_as_read(self, notification_id: int) -> bool:
         """
         marks a specific notification as read.
@@ -0,0 +1,179 @@
+"""
+per user read position in a conversation.
+
+instead of a read flag on every message each user keeps one row per
+conversation with the id of the newest message they have seen. everything
+after it is unread, so counting unread messages is an index seek past that
+id and opening a conversation is one upsert, not an UPDATE of every row.
+a project channel is read by many people, but each message is still
+stored once. direct messages with one person are a conversation per
+project (and one outside any project).
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import case
+
+from models.database import db
+
+
+class ConversationReadState(db.Model):
+    """the newest message a user has read in one conversation."""
+
+    __tablename__ = 'conversation_read_state'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'conversation_key', name='uq_conversation_read_state_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # 'project:<id>' for a project channel, 'user:<peer id>:<project id or 0>' for direct messages
+    conversation_key = db.Column(db.String(64), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True)
+    # the other person of a direct conversation, so unread counts can join on it
+    peer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    last_read_message_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    @staticmethod
+    def channel_key(project_id):
+        return f"project:{project_id}"
+
+    @staticmethod
+    def direct_key(peer_id, project_id=None):
+        return f"user:{peer_id}:{project_id or 0}"
+
+    @classmethod
+    def matches_project(cls, project_column):
+        """join condition: the read state's project is the message's (both may be none)."""
+        return db.func.coalesce(cls.project_id, 0) == db.func.coalesce(project_column, 0)
+
+    @classmethod
+    def watermark(cls, user_id, conversation_key):
+        """id of the last message the user read here, 0 when never opened."""
+        value = (db.session.query(cls.last_read_message_id)
+                 .filter(cls.user_id == user_id, cls.conversation_key == conversation_key)
+                 .scalar())
+        return value or 0
+
+    @classmethod
+    def mark_read(cls, user_id, conversation_key, message_id, project_id=None, peer_id=None):
+        """
+        move the user's read position up to message_id with one upsert.
+        it never moves backwards. the caller commits.
+        """
+        values = {
+            'user_id': user_id,
+            'conversation_key': conversation_key,
+            'project_id': project_id,
+            'peer_id': peer_id,
+            'last_read_message_id': message_id,
+            'updated_at': datetime.now(timezone.utc),
+        }
+        table = cls.__table__
+        dialect = db.session.get_bind(mapper=cls).dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            statement = insert(table).values(**values)
+            newer = statement.excluded.last_read_message_id > table.c.last_read_message_id
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'conversation_key'],
+                set_={
+                    'last_read_message_id': case((newer, statement.excluded.last_read_message_id),
+                                                 else_=table.c.last_read_message_id),
+                    'updated_at': statement.excluded.updated_at,
+                })
+            db.session.execute(statement)
+            return
+
+        # other databases: update, insert if there was nothing to update
+        updated = cls.query.filter(cls.user_id == user_id,
+                                   cls.conversation_key == conversation_key).update(
+            {cls.last_read_message_id: case((cls.last_read_message_id < message_id, message_id),
+                                            else_=cls.last_read_message_id),
+             cls.updated_at: values['updated_at']},
+            synchronize_session=False)
+        if not updated:
+            db.session.add(cls(**values))
+
+    @classmethod
+    def mark_direct_read(cls, user_id, peer_id, message_id, project_id=None):
+        """
+        user has read the direct messages from peer_id up to message_id, in
+        the conversation about project_id (None: outside any project). the
+        other conversations with peer_id keep their own position.
+        """
+        from models.Communication.inbox_entry import InboxEntry
+        cls.mark_read(user_id, cls.direct_key(peer_id, project_id), message_id,
+                      project_id=project_id, peer_id=peer_id)
+        InboxEntry.refresh_unread(user_id, peer_id, project_id)
+
+    @classmethod
+    def ensure_peer_column(cls):
+        """add peer_id to a read state table made before it existed."""
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(cls.__tablename__)}
+            if 'peer_id' in columns:
+                return False
+            with db.engine.begin() as connection:
+                connection.execute(db.text(f"ALTER TABLE {cls.__tablename__} ADD COLUMN peer_id INTEGER"))
+            return True
+        except Exception as e:
+            print(f"error adding conversation_read_state.peer_id: {e}")
+            return False
+
+    @staticmethod
+    def _direct_key_expression(peer_column, project_column):
+        """direct_key in SQL, for INSERT ... SELECT."""
+        return (db.literal('user:').concat(db.cast(peer_column, db.String)).concat(':')
+                .concat(db.cast(db.func.coalesce(project_column, 0), db.String)))
+
+    @classmethod
+    def migrate_from_is_read(cls):
+        """
+        derive direct message watermarks from the old per message isRead flags.
+
+        one INSERT ... SELECT over every (receiver, sender, project)
+        conversation that has no read state yet. the watermark stops just
+        before the oldest unread message, so nothing that was unread becomes
+        read (or the newest message when everything was read). safe to run
+        more than once.
+
+        returns:
+            number of read state rows created
+        """
+        from models.Communication.message import Message
+
+        try:
+            first_unread = db.func.min(case((Message.isRead == False, Message.messageID)))
+            existing = (db.select(cls.id)
+                        .where(cls.user_id == Message.receiverID, cls.peer_id == Message.senderID,
+                               cls.matches_project(Message.projectID))
+                        .exists())
+            conversations = (db.select(Message.receiverID,
+                                       cls._direct_key_expression(Message.senderID, Message.projectID),
+                                       Message.projectID,
+                                       Message.senderID,
+                                       db.func.coalesce(first_unread - 1, db.func.max(Message.messageID)),
+                                       db.literal(datetime.now(timezone.utc)))
+                             .where(Message.receiverID.isnot(None), ~existing)
+                             .group_by(Message.receiverID, Message.senderID, Message.projectID))
+            result = db.session.execute(cls.__table__.insert().from_select(
+                ['user_id', 'conversation_key', 'project_id', 'peer_id', 'last_read_message_id', 'updated_at'],
+                conversations))
+            db.session.commit()
+            return result.rowcount or 0
+        except Exception as e:
+            print(f"error migrating message read flags: {e}")
+            db.session.rollback()
+            return 0
+
+    @classmethod
+    def ensure_migrated(cls):
+        """run migrate_from_is_read once, when no direct read state exists yet."""
+        if cls.query.filter(cls.peer_id.isnot(None)).first() is None:
+            return cls.migrate_from_is_read()
+        return 0
@@ -0,0 +1,171 @@
+"""
+transactional email outbox.
+
+requests never talk to the mail server. they add an OutboxEmail row in the
+same transaction as the change it is about (a new user, a reset token), so
+the email goes out if and only if that change is committed. EmailService
+delivers the rows in the background, see email_service.py.
+
+bodies carry live verification and reset links, so a row's body is cleared
+once it is sent or given up, and purge_finished deletes those rows later.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from models.database import db
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class OutboxEmail(db.Model):
+    """one email waiting to be (or already) delivered."""
+
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # the sender looks for pending rows that are due
+        db.Index('ix_email_outbox_status_due', 'status', 'next_attempt_at'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'  # gave up after max attempts
+    STATUS_OPTIONS = [STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_FAILED]
+
+    # first retry after this many seconds, doubling each time up to the max
+    RETRY_BASE_SECONDS = 30
+    RETRY_MAX_SECONDS = 3600
+    # a claimed row whose worker died becomes claimable again after this
+    CLAIM_SECONDS = 300
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), default=STATUS_PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=_utcnow, nullable=False)
+    claim_token = db.Column(db.String(36))
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=_utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<OutboxEmail {self.id} to {self.recipient} ({self.status})>"
+
+    @classmethod
+    def enqueue(cls, recipient, subject, body):
+        """
+        add an email to the current transaction. nothing is sent until the
+        caller commits.
+        raises:
+            ValueError: when there is no recipient
+        """
+        if not recipient:
+            raise ValueError("an email needs a recipient")
+        email = cls(recipient=recipient, subject=subject, body=body,
+                    status=cls.STATUS_PENDING, attempts=0, next_attempt_at=_utcnow())
+        db.session.add(email)
+        return email
+
+    @classmethod
+    def claim_batch(cls, limit=50):
+        """
+        take up to limit due emails for this worker and commit the claim,
+        so two workers never send the same email.
+        returns:
+            list of claimed OutboxEmail rows
+        """
+        now = _utcnow()
+        due = db.or_(
+            db.and_(cls.status == cls.STATUS_PENDING, cls.next_attempt_at <= now),
+            # claimed by a worker that never finished
+            db.and_(cls.status == cls.STATUS_SENDING, cls.next_attempt_at <= now),
+        )
+        ids = [row[0] for row in
+               db.session.query(cls.id).filter(due).order_by(cls.next_attempt_at, cls.id).limit(limit).all()]
+        if not ids:
+            return []
+
+        token = str(uuid.uuid4())
+        try:
+            cls.query.filter(cls.id.in_(ids), due).update(
+                {cls.status: cls.STATUS_SENDING,
+                 cls.claim_token: token,
+                 cls.next_attempt_at: now + timedelta(seconds=cls.CLAIM_SECONDS)},
+                synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            print(f"error claiming outbox emails: {e}")
+            db.session.rollback()
+            return []
+        return cls.query.filter(cls.claim_token == token).order_by(cls.id).all()
+
+    def mark_sent(self):
+        """delivered, the caller commits."""
+        self.status = self.STATUS_SENT
+        self.sent_at = _utcnow()
+        self.claim_token = None
+        self.last_error = None
+        self.body = ''
+
+    def mark_failed(self, error, max_attempts=5):
+        """
+        delivery failed, try again later with exponential backoff, or give
+        up after max_attempts. the caller commits.
+        """
+        self.attempts = (self.attempts or 0) + 1
+        self.last_error = str(error)[:1000]
+        self.claim_token = None
+        if self.attempts >= max_attempts:
+            self.status = self.STATUS_FAILED
+            self.body = ''
+            return
+        delay = min(self.RETRY_BASE_SECONDS * 2 ** (self.attempts - 1), self.RETRY_MAX_SECONDS)
+        self.status = self.STATUS_PENDING
+        self.next_attempt_at = _utcnow() + timedelta(seconds=delay)
+
+    def release(self, error):
+        """
+        the mail server could not be reached: pending again after the first
+        retry delay, without using one of the attempts. the caller commits.
+        """
+        self.last_error = str(error)[:1000]
+        self.claim_token = None
+        self.status = self.STATUS_PENDING
+        self.next_attempt_at = _utcnow() + timedelta(seconds=self.RETRY_BASE_SECONDS)
+
+    @classmethod
+    def purge_finished(cls, older_than_days=30, batch_size=1000):
+        """
+        delete sent and given up emails created more than older_than_days
+        ago, one commit per batch.
+        returns:
+            number of rows deleted
+        """
+        cutoff = _utcnow() - timedelta(days=older_than_days)
+        finished = db.and_(cls.status.in_([cls.STATUS_SENT, cls.STATUS_FAILED]), cls.created_at < cutoff)
+        deleted = 0
+        try:
+            while True:
+                ids = [row[0] for row in db.session.query(cls.id).filter(finished).limit(batch_size).all()]
+                if not ids:
+                    break
+                deleted += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                if len(ids) < batch_size:
+                    break
+        except Exception as e:
+            print(f"error purging outbox emails: {e}")
+            db.session.rollback()
+        return deleted
+
+    @classmethod
+    def counts(cls):
+        """number of emails in each status, for /health."""
+        rows = db.session.query(cls.status, db.func.count(cls.id)).group_by(cls.status).all()
+        return {status: count for status, count in rows}
@@ -1,5 +1,217 @@
+"""
+email delivery through the outbox.
+
+send_email / queue_email only add an OutboxEmail row. deliver_pending runs
+in the background scheduler: it claims a batch, opens ONE SMTP connection
+for the whole batch, sends every email over it and records the result of
+each one (failures are retried with backoff by the outbox). when the mail
+server cannot be reached the batch stops and goes back to the outbox
+without using up the emails' attempts.
+
+without MAIL_SERVER configured emails are printed instead of sent, which
+is what development and the tests want.
+"""
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from models.database import db
+from models.Communication.email_outbox import OutboxEmail
+
+
+class MailServerUnavailable(Exception):
+    """the mail server could not be reached, no email is to blame."""
+
+
 class EmailService:
+    def __init__(self, server=None, port=587, username=None, password=None, use_tls=True,
+                 default_sender='noreply@cmt.local', batch_size=50, max_attempts=5,
+                 timeout=10, smtp_factory=smtplib.SMTP):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.default_sender = default_sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        # swapped out in tests for a fake or a local SMTP sink
+        self.smtp_factory = smtp_factory
+
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.connections = 0
+        self.last_batch_seconds = None
+
     def send_email(self, recipient_id, subject, body):
-        # Placeholder for email sending logic
-        # Implement as needed
-        pass
+        """queue an email to a user, the caller commits."""
+        from models.UserManagement.user import User
+        user = db.session.get(User, recipient_id)
+        if not user:
+            raise ValueError(f"user {recipient_id} does not exist")
+        return self.queue_email(user.email, subject, body)
+
+    def queue_email(self, recipient, subject, body):
+        """queue an email to an address, the caller commits."""
+        return OutboxEmail.enqueue(recipient, subject, body)
+
+    def _build_message(self, email):
+        message = EmailMessage()
+        message['From'] = self.default_sender
+        message['To'] = email.recipient
+        message['Subject'] = email.subject
+        message.set_content(email.body)
+        return message
+
+    def _connect(self):
+        connection = self.smtp_factory(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password)
+        except Exception:
+            self._close(connection)
+            raise
+        self.connections += 1
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _connection_lost(error):
+        dropped = isinstance(error, smtplib.SMTPServerDisconnected)
+        network = isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+        return dropped or network
+
+    def _send(self, connection, email):
+        """
+        send one email, connecting first when there is no connection. a
+        connection the server dropped mid batch is reopened once.
+        returns:
+            (connection for the next email, the error that refused this
+            email or None when it was sent)
+        raises:
+            MailServerUnavailable: no connection could be opened or kept
+        """
+        try:
+            message = self._build_message(email)
+        except Exception as e:
+            return connection, e
+        lost = None
+        for _ in range(2):
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except Exception as e:
+                    raise MailServerUnavailable(e) from e
+            try:
+                connection.send_message(message)
+                return connection, None
+            except Exception as e:
+                if not self._connection_lost(e):
+                    return connection, e
+                self._close(connection)
+                connection = None
+                lost = e
+        raise MailServerUnavailable(lost) from lost
+
+    def deliver_pending(self):
+        """
+        send one batch of due emails over a single SMTP connection.
+
+        only an error about the email itself (a refused recipient, a
+        rejected message) counts as one of its attempts. when the server
+        cannot be reached, the emails not sent yet go back to the outbox
+        unchanged and the batch stops.
+        returns:
+            dict with sent / failed / deferred counts of this batch
+        """
+        emails = OutboxEmail.claim_batch(self.batch_size)
+        if not emails:
+            return {'sent': 0, 'failed': 0, 'deferred': 0}
+
+        started = time.perf_counter()
+        sent = failed = deferred = 0
+        connection = None
+        try:
+            for position, email in enumerate(emails):
+                error = None
+                if self.server is None:
+                    print(f"email to {email.recipient}: {email.subject}\n{email.body}")
+                else:
+                    try:
+                        connection, error = self._send(connection, email)
+                    except MailServerUnavailable as e:
+                        print(f"mail server unavailable, {len(emails) - position} emails wait: {e}")
+                        for waiting in emails[position:]:
+                            waiting.release(e)
+                        deferred = len(emails) - position
+                        connection = None
+                        break
+                if error is None:
+                    email.mark_sent()
+                    sent += 1
+                else:
+                    print(f"error sending email {email.id}: {error}")
+                    email.mark_failed(error, self.max_attempts)
+                    failed += 1
+            db.session.commit()
+        except Exception as e:
+            print(f"error recording email results: {e}")
+            db.session.rollback()
+            raise
+        finally:
+            if connection is not None:
+                self._close(connection)
+
+        self.sent += sent
+        self.failed += failed
+        self.deferred += deferred
+        self.last_batch_seconds = round(time.perf_counter() - started, 4)
+        return {'sent': sent, 'failed': failed, 'deferred': deferred}
+
+    def deliver_all(self, max_batches=20):
+        """deliver batches until nothing is due, the server is down (or max_batches)."""
+        totals = {'sent': 0, 'failed': 0, 'deferred': 0}
+        for _ in range(max_batches):
+            result = self.deliver_pending()
+            for key in totals:
+                totals[key] += result[key]
+            if result['deferred'] or result['sent'] + result['failed'] < self.batch_size:
+                break
+        return totals
+
+    def stats(self):
+        return {
+            'smtp_server': self.server or 'console',
+            'sent': self.sent,
+            'failed': self.failed,
+            'deferred': self.deferred,
+            'connections': self.connections,
+            'last_batch_seconds': self.last_batch_seconds,
+        }
+
+
+_service = EmailService()
+_service_lock = threading.Lock()
+
+
+def get_email_service():
+    return _service
+
+
+def configure_email_service(**settings):
+    """replace the shared EmailService, e.g. with the app's MAIL_* settings."""
+    global _service
+    with _service_lock:
+        _service = EmailService(**settings)
+    return _service
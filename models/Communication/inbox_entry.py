@@ -0,0 +1,224 @@
+"""
+materialised inbox for the messages sidebar.
+
+one row per (user, peer, project) conversation with the newest message,
+its time, a short preview and how many messages are unread. the rows are
+kept up to date when a message is inserted (a mapper event, like the
+search index) and when the reader's position moves, so the sidebar is a
+recency ordered index scan instead of a GROUP BY over every message.
+
+channel messages are not in here, they have their own page per project.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from models.database import db
+
+PREVIEW_LENGTH = 140
+
+
+class InboxEntry(db.Model):
+    """the latest state of one direct conversation, as seen by user_id."""
+
+    __tablename__ = 'inbox_entries'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'peer_id', 'project_id', name='uq_inbox_entries_conversation'),
+        # the sidebar: newest conversations of one user first
+        db.Index('ix_inbox_entries_user_recent', 'user_id', 'last_message_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    peer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # 0 for messages outside a project, so the unique key has no NULL in it
+    project_id = db.Column(db.Integer, nullable=False, default=0)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    last_sender_id = db.Column(db.Integer, nullable=False)
+    preview = db.Column(db.String(PREVIEW_LENGTH), nullable=False, default='')
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+    peer = db.relationship('User', foreign_keys=[peer_id])
+
+    _listeners_registered = False
+
+    @staticmethod
+    def _preview(content):
+        text = ' '.join((content or '').split())
+        if len(text) > PREVIEW_LENGTH:
+            text = text[:PREVIEW_LENGTH - 3] + '...'
+        return text
+
+    @classmethod
+    def _upsert(cls, connection, values, unread_step):
+        """insert the conversation row or move it to the new message."""
+        table = cls.__table__
+        dialect = connection.dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            statement = insert(table).values(unread_count=unread_step, **values)
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'peer_id', 'project_id'],
+                set_={
+                    'last_message_id': statement.excluded.last_message_id,
+                    'last_message_at': statement.excluded.last_message_at,
+                    'last_sender_id': statement.excluded.last_sender_id,
+                    'preview': statement.excluded.preview,
+                    'unread_count': table.c.unread_count + unread_step,
+                })
+            connection.execute(statement)
+            return
+
+        key = (table.c.user_id == values['user_id']) & (table.c.peer_id == values['peer_id']) \
+            & (table.c.project_id == values['project_id'])
+        moved = connection.execute(table.update().where(key).values(
+            last_message_id=values['last_message_id'],
+            last_message_at=values['last_message_at'],
+            last_sender_id=values['last_sender_id'],
+            preview=values['preview'],
+            unread_count=table.c.unread_count + unread_step))
+        if not moved.rowcount:
+            connection.execute(table.insert().values(unread_count=unread_step, **values))
+
+    @classmethod
+    def record_message(cls, connection, message):
+        """update both sides of a direct conversation for a new message."""
+        if message.receiverID is None:
+            return
+        shared = {
+            'project_id': message.projectID or 0,
+            'last_message_id': message.messageID,
+            'last_message_at': message.timestamp or datetime.now(timezone.utc),
+            'last_sender_id': message.senderID,
+            'preview': cls._preview(message.content),
+        }
+        cls._upsert(connection, dict(shared, user_id=message.senderID, peer_id=message.receiverID), 0)
+        if message.receiverID != message.senderID:
+            cls._upsert(connection, dict(shared, user_id=message.receiverID, peer_id=message.senderID), 1)
+
+    @classmethod
+    def refresh_unread(cls, user_id, peer_id, project_id=None):
+        """
+        recount unread for user_id's conversation with peer_id about
+        project_id after their read position moved, one UPDATE. the caller
+        commits.
+        """
+        from models.Communication.message import Message
+        from models.Communication.conversation_read_state import ConversationReadState as State
+
+        project_id = project_id or 0
+        watermark = (db.select(db.func.coalesce(db.func.max(State.last_read_message_id), 0))
+                     .where(State.user_id == user_id, State.peer_id == peer_id,
+                            db.func.coalesce(State.project_id, 0) == project_id)
+                     .scalar_subquery())
+        unread = (db.select(db.func.count(Message.messageID))
+                  .where(Message.receiverID == user_id, Message.senderID == peer_id,
+                         db.func.coalesce(Message.projectID, 0) == project_id,
+                         Message.messageID > watermark)
+                  .scalar_subquery())
+        db.session.execute(cls.__table__.update()
+                           .where(cls.user_id == user_id, cls.peer_id == peer_id, cls.project_id == project_id)
+                           .values(unread_count=unread))
+
+    @classmethod
+    def get_page(cls, user_id, cursor=None, limit=20):
+        """
+        one page of a user's conversations, most recent first.
+
+        returns:
+            (list of InboxEntry, next cursor or None)
+        """
+        from sqlalchemy.orm import selectinload
+        from utils.pagination import keyset_paginate
+
+        query = cls.query.options(selectinload(cls.peer)).filter(cls.user_id == user_id)
+        return keyset_paginate(query, [cls.last_message_at, cls.id], cursor, limit, descending=True)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """
+        fill the inbox from the messages table, for databases that had
+        messages before the inbox existed. replaces every row.
+
+        returns:
+            number of conversations written
+        """
+        from models.Communication.message import Message
+        from models.Communication.conversation_read_state import ConversationReadState as State
+
+        try:
+            project = db.func.coalesce(Message.projectID, 0)
+            direct = Message.receiverID.isnot(None)
+            both = db.union_all(
+                db.select(Message.receiverID.label('user_id'), Message.senderID.label('peer_id'),
+                          project.label('project_id'), Message.messageID.label('message_id')).where(direct),
+                db.select(Message.senderID, Message.receiverID, project, Message.messageID).where(direct),
+            ).subquery()
+            latest = (db.select(both.c.user_id, both.c.peer_id, both.c.project_id,
+                                db.func.max(both.c.message_id).label('message_id'))
+                      .group_by(both.c.user_id, both.c.peer_id, both.c.project_id)
+                      .subquery())
+            rows = db.session.execute(
+                db.select(latest.c.user_id, latest.c.peer_id, latest.c.project_id, Message.messageID,
+                          Message.timestamp, Message.senderID, Message.content)
+                .join(Message, Message.messageID == latest.c.message_id)).all()
+
+            unread_rows = db.session.execute(
+                db.select(Message.receiverID, Message.senderID, project, db.func.count(Message.messageID))
+                .outerjoin(State, db.and_(State.user_id == Message.receiverID, State.peer_id == Message.senderID,
+                                          State.matches_project(Message.projectID)))
+                .where(direct, Message.messageID > db.func.coalesce(State.last_read_message_id, 0))
+                .group_by(Message.receiverID, Message.senderID, project)).all()
+            unread = {(user, peer, project_id): count for user, peer, project_id, count in unread_rows}
+
+            db.session.execute(cls.__table__.delete())
+            entries = [{
+                'user_id': user_id,
+                'peer_id': peer_id,
+                'project_id': project_id,
+                'last_message_id': message_id,
+                'last_message_at': timestamp,
+                'last_sender_id': sender_id,
+                'preview': cls._preview(content),
+                'unread_count': unread.get((user_id, peer_id, project_id), 0),
+            } for user_id, peer_id, project_id, message_id, timestamp, sender_id, content in rows]
+            for start in range(0, len(entries), batch_size):
+                db.session.execute(cls.__table__.insert().values(entries[start:start + batch_size]))
+            db.session.commit()
+            return len(entries)
+        except Exception as e:
+            print(f"error rebuilding the inbox: {e}")
+            db.session.rollback()
+            return 0
+
+    @classmethod
+    def ensure_built(cls):
+        """build the inbox once when messages exist but the inbox is empty."""
+        from models.Communication.message import Message
+
+        if cls.query.first() is None and Message.query.filter(Message.receiverID.isnot(None)).first():
+            return cls.rebuild()
+        return 0
+
+    # SQLAlchemy mapper event
+    @classmethod
+    def _after_insert(cls, mapper, connection, target):
+        try:
+            cls.record_message(connection, target)
+        except Exception as e:
+            print(f"error updating the inbox for {target}: {e}")
+
+    @classmethod
+    def register_listeners(cls):
+        """keep the inbox in step with every inserted Message. safe to call more than once."""
+        if cls._listeners_registered:
+            return
+        from models.Communication.message import Message
+
+        event.listen(Message, 'after_insert', cls._after_insert)
+        cls._listeners_registered = True
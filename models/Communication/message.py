@@ -12,18 +12,25 @@ class Message ( db.Model) :
     Each message is link to sender and  receiver and a project.
     """
     __tablename__ = 'messages' #  naming the table of the database
+    __table_args__ = (
+        # one page of a project channel is a seek on this index
+        db.Index('ix_messages_channel', 'projectID', 'receiverID', 'messageID'),
+        # unread direct messages: seek receiver and sender, then past the read position
+        db.Index('ix_messages_receiver_sender', 'receiverID', 'senderID', 'messageID'),
+    )
 
     messageID = db.Column(db.Integer,
                            primary_key=True, autoincrement=True) 
     senderID = db.Column(db.Integer,
                           db.ForeignKey('users.id'), nullable=False) 
     receiverID = db.Column(db.Integer,
-                            db.ForeignKey('users.id'), nullable=False)
+                            db.ForeignKey('users.id'), nullable=True)  # None for a project channel message
     projectID = db.Column(db.Integer,
                            db.ForeignKey('projects.id'), nullable=True) 
 
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False) 
+    # legacy flag, unread state now lives in ConversationReadState
     isRead = db.Column(db.Boolean, default=False, nullable=False) 
 
     # Relationships SQLAlchemy understand the links
@@ -34,6 +41,8 @@ class Message ( db.Model) :
                                       foreign_keys=[receiverID],   backref='received_messages')
     associated_project = db.relationship('Project',
                                            foreign_keys=[projectID],  backref='project_messages')
+    # File rows only, written through MessageAttachment
+    attachments = db.relationship('File', secondary='message_attachments', viewonly=True)
 
     def __init__(self, sender_id: int, 
                  receiver_id: int,  message_content: str
@@ -50,6 +59,8 @@ class Message ( db.Model) :
             if not message_content:
 
                 raise ValueError("message content cannot be empty")
+            if receiver_id is None and project_id is None:
+                raise ValueError("a message needs a receiver or a project channel")
 
             self.senderID = sender_id
             self.receiverID = receiver_id
@@ -95,7 +106,8 @@ class Message ( db.Model) :
     def mark_as_read(self) ->  None :
         """
         marks the  message as read.
-        sets the isRead flag  to True.
+        sets the isRead flag  to True and moves the receiver's read
+        position in this conversation up to it (the caller commits).
         """
         try:
             # print(f"DEBUG: Marking message {self.messageID} as read.") 
@@ -107,6 +119,10 @@ class Message ( db.Model) :
                 self.isRead = True
                 # db.session.add(self)
                 # db.session.commit() 
+            if self.messageID and self.receiverID:
+                from models.Communication.conversation_read_state import ConversationReadState
+                ConversationReadState.mark_direct_read(self.receiverID, self.senderID, self.messageID,
+                                                       project_id=self.projectID)
                                  
             # print(f"DEBUG: Message {self.messageID} isRead status: {self.isRead}")
         except Exception as e:
@@ -114,6 +130,175 @@ class Message ( db.Model) :
             print(f"an error occurred while marking message as read: {e}")
             
 
+    def to_dict(self) -> dict:
+        """the message as JSON friendly dict, attachments as names and ids only."""
+        return {
+            'id': self.messageID,
+            'sender_id': self.senderID,
+            'sender_name': self.sender_user.get_full_name() if self.sender_user else None,
+            'receiver_id': self.receiverID,
+            'project_id': self.projectID,
+            'content': self.content,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'attachments': [{'id': file.id, 'name': file.fileName, 'size': file.fileSize}
+                            for file in self.attachments],
+        }
+
+    @property
+    def is_channel_message(self) -> bool:
+        """posted to the whole project instead of one person."""
+        return self.receiverID is None and self.projectID is not None
+
+    @classmethod
+    def post_to_channel(cls, sender_id: int, project_id: int, content: str, attachments=None):
+        """
+        post a message to a project's channel. it is stored once no matter
+        how many members the project has, the sender has read it.
+        attachments are uploads already stored by MessageAttachment.store_upload.
+
+        returns:
+            the new Message
+        """
+        from models.Communication.conversation_read_state import ConversationReadState
+        try:
+            message = cls(sender_id=sender_id, receiver_id=None, message_content=content, project_id=project_id)
+            db.session.add(message)
+            db.session.flush()
+            if attachments:
+                from models.Communication.message_attachment import MessageAttachment
+                MessageAttachment.attach(message, attachments, sender_id)
+            ConversationReadState.mark_read(sender_id, ConversationReadState.channel_key(project_id),
+                                            message.messageID, project_id=project_id)
+            db.session.commit()
+            return message
+        except Exception as e:
+            print(f"error posting to project channel: {e}")
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def unread_direct_query(cls, user_id: int, *columns):
+        """
+        direct messages to user_id after their read position in each
+        (sender, project) conversation. one outer join on the read state,
+        no per message flag.
+        """
+        from models.Communication.conversation_read_state import ConversationReadState as State
+        return (db.session.query(*(columns or (cls,)))
+                .select_from(cls)
+                .outerjoin(State, db.and_(State.user_id == cls.receiverID, State.peer_id == cls.senderID,
+                                          State.matches_project(cls.projectID)))
+                .filter(cls.receiverID == user_id,
+                        cls.messageID > db.func.coalesce(State.last_read_message_id, 0)))
+
+    @classmethod
+    def unread_counts_by_sender(cls, user_id: int) -> dict:
+        """{sender id: unread count} for everyone who wrote to user_id, one query."""
+        rows = cls.unread_direct_query(user_id, cls.senderID, db.func.count(cls.messageID)) \
+            .group_by(cls.senderID).all()
+        return {sender_id: count for sender_id, count in rows}
+
+    @classmethod
+    def channel_query(cls, project_id: int):
+        return cls.query.filter(cls.projectID == project_id, cls.receiverID.is_(None))
+
+    @classmethod
+    def get_channel_page(cls, project_id: int, before_id: int = None, limit: int = 50):
+        """
+        the newest limit channel messages older than before_id, in reading
+        order (oldest first), with their senders.
+
+        returns:
+            (list of messages, id to pass as before_id for the older page or None)
+        """
+        from sqlalchemy.orm import selectinload
+
+        query = cls.channel_query(project_id).options(selectinload(cls.sender_user),
+                                                      selectinload(cls.attachments))
+        if before_id:
+            query = query.filter(cls.messageID < before_id)
+        rows = query.order_by(cls.messageID.desc()).limit(limit + 1).all()
+
+        older = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            older = rows[-1].messageID
+        rows.reverse()
+        return rows, older
+
+    @classmethod
+    def channel_unread_count(cls, user_id: int, project_id: int) -> int:
+        """channel messages after the user's read position, other people's only."""
+        from models.Communication.conversation_read_state import ConversationReadState
+        watermark = ConversationReadState.watermark(user_id, ConversationReadState.channel_key(project_id))
+        return (db.session.query(db.func.count(cls.messageID))
+                .filter(cls.projectID == project_id, cls.receiverID.is_(None),
+                        cls.messageID > watermark, cls.senderID != user_id)
+                .scalar()) or 0
+
+    @classmethod
+    def ensure_channel_support(cls):
+        """
+        older databases made receiverID NOT NULL, channel messages need it
+        nullable. postgres can just drop the constraint, sqlite can not, so
+        there the table is rebuilt once the way the sqlite docs describe:
+        copy into messages_new, drop messages, rename messages_new. with
+        legacy_alter_table on, the rename leaves the foreign keys of other
+        tables (message_attachments) pointing at "messages".
+        """
+        from sqlalchemy.schema import CreateTable
+
+        try:
+            inspector = db.inspect(db.engine)
+            columns = {column['name']: column for column in inspector.get_columns(cls.__tablename__)}
+            if columns['receiverID']['nullable']:
+                return False
+
+            table = cls.__tablename__
+            if db.engine.dialect.name != 'sqlite':
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(f'ALTER TABLE {table} ALTER COLUMN "receiverID" DROP NOT NULL'))
+                return True
+
+            with db.engine.connect() as connection:
+                # both pragmas are ignored inside a transaction, so set them first
+                foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+                connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+                connection.exec_driver_sql('PRAGMA legacy_alter_table=ON')
+                connection.commit()
+                try:
+                    # the driver does not wrap DDL in a transaction by itself
+                    connection.exec_driver_sql('BEGIN')
+                    create = str(CreateTable(cls.__table__).compile(connection))
+                    connection.exec_driver_sql(create.replace(f'TABLE {table} (', f'TABLE {table}_new (', 1))
+                    names = ', '.join(f'"{name}"' for name in cls.__table__.columns.keys() if name in columns)
+                    connection.exec_driver_sql(f'INSERT INTO {table}_new ({names}) SELECT {names} FROM {table}')
+                    connection.exec_driver_sql(f'DROP TABLE {table}')  # its indexes go with it
+                    connection.exec_driver_sql(f'ALTER TABLE {table}_new RENAME TO {table}')
+                    for index in cls.__table__.indexes:
+                        index.create(bind=connection)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                finally:
+                    connection.exec_driver_sql('PRAGMA legacy_alter_table=OFF')
+                    connection.exec_driver_sql(f'PRAGMA foreign_keys={"ON" if foreign_keys else "OFF"}')
+                    connection.commit()
+            return True
+        except Exception as e:
+            print(f"error making messages.receiverID nullable: {e}")
+            return False
+
+    @classmethod
+    def create_missing_indexes(cls):
+        """add the indexes to a messages table made before they were declared."""
+        try:
+            for index in cls.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"error creating message indexes: {e}")
+
     # Maybe add a __repr__ for easy  debugging later?
     def __repr__(self):
         return f"<Message messageID={self.messageID} from={self.senderID} to={self.receiverID} read={self.isRead}>"
@@ -0,0 +1,286 @@
+"""
+files attached to messages.
+
+an attachment is a File (with its FileVersion 1) in the message's
+project, so it lives in the same upload folder. channel attachments show
+up with the project's files, direct message attachments are marked
+message_only: they stay out of the file lists and only the people in the
+conversation can download them.
+
+the message forms parse their uploads into an AttachmentSpool (see
+utils/uploads.py), which writes into the attachment store and hashes
+while the request body comes in. the file is then renamed to its sha256,
+so the same bytes are stored once; attaching them again in the project
+reuses the File, and many messages can point at it through
+message_attachments. files a failed send put on disk are removed again.
+
+message pages only load the File rows, never the bytes. downloads are
+streamed from disk and previews are made the first time one is asked
+for.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from models.database import db
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+PREVIEW_SIZE = (320, 320)
+TEXT_PREVIEW_BYTES = 2000
+IMAGE_TYPES = ('png', 'jpg', 'jpeg')
+
+
+class AttachmentError(ValueError):
+    """an upload that can not be attached (type, size, no project)."""
+
+
+class AttachmentSpool:
+    """
+    where one uploaded file is written while the form is parsed: a temp
+    file in the attachment store, hashed and size checked as it grows.
+    closed without keep() the temp file is removed.
+    """
+
+    def __init__(self, root, filename, max_bytes):
+        os.makedirs(root, exist_ok=True)
+        handle, self.path = tempfile.mkstemp(dir=root, suffix='.part')
+        self._file = os.fdopen(handle, 'w+b')
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.kept = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            # not a ValueError, werkzeug's form parser would quietly drop the file
+            raise RequestEntityTooLarge(f"{secure_filename(self.filename or '')} is larger than "
+                                        f"{round(self.max_bytes / (1024 * 1024), 1)} MB")
+        self.digest.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read / seek / tell / flush for werkzeug's FileStorage
+        return getattr(self._file, name)
+
+    def keep(self, path):
+        """
+        move the upload to path, unless the same bytes are there already.
+
+        returns:
+            True if this call created path
+        """
+        self._file.close()
+        self.kept = True
+        if os.path.exists(path):
+            os.remove(self.path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path, path)
+        return True
+
+    def close(self):
+        self._file.close()
+        if not self.kept and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class MessageAttachment(db.Model):
+    """one file attached to one message."""
+
+    __tablename__ = 'message_attachments'
+    __table_args__ = (
+        # find the File already holding these bytes
+        db.Index('ix_message_attachments_hash', 'content_hash'),
+    )
+
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.messageID', ondelete='CASCADE'), primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+
+    file = db.relationship('File', backref=db.backref('message_links', cascade='all, delete-orphan'))
+
+    @staticmethod
+    def storage_root():
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'attachments')
+
+    @staticmethod
+    def max_bytes():
+        return current_app.config.get('MESSAGE_ATTACHMENT_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    @classmethod
+    def spool_factory(cls):
+        """stream factory for UploadRequest.upload_stream_factory, one spool per file."""
+        root, max_bytes = cls.storage_root(), cls.max_bytes()
+        return lambda filename: AttachmentSpool(root, filename, max_bytes)
+
+    @classmethod
+    def store_upload(cls, upload, max_bytes=None):
+        """
+        put an uploaded file (werkzeug FileStorage) in the attachment store
+        under its hash. an upload parsed into an AttachmentSpool is only
+        renamed, anything else is copied CHUNK_SIZE bytes at a time.
+        nothing is written to the database.
+
+        returns:
+            dict with name, type, size, hash and path of the stored file,
+            and created when this call put the file on disk
+        """
+        from models.DocumentFileManagement.file import File
+
+        name = secure_filename(upload.filename or '')
+        file_type = os.path.splitext(name)[1][1:].lower()
+        if not name or file_type not in File.SUPPORTED_TYPES:
+            raise AttachmentError(f"can not attach {upload.filename or 'a file without a name'}")
+
+        spool = upload.stream
+        if not isinstance(spool, AttachmentSpool):
+            spool = AttachmentSpool(cls.storage_root(), name, max_bytes or cls.max_bytes())
+            try:
+                while True:
+                    chunk = upload.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    spool.write(chunk)
+            except RequestEntityTooLarge as e:
+                raise AttachmentError(e.description) from e
+            except Exception:
+                spool.close()
+                raise
+
+        content_hash = spool.digest.hexdigest()
+        path = os.path.join(cls.storage_root(), content_hash[:2], f"{content_hash}.{file_type}")
+        created = spool.keep(path)
+        return {'name': name, 'type': file_type, 'size': spool.size, 'hash': content_hash, 'path': path,
+                'created': created}
+
+    @classmethod
+    def discard(cls, stored):
+        """
+        remove the files store_upload created for a send that was rolled
+        back, unless a File row uses the bytes by now.
+        """
+        from models.DocumentFileManagement.file import File
+
+        for item in stored:
+            try:
+                if item.get('created') and os.path.exists(item['path']) \
+                        and not File.query.filter(File.file_path == item['path']).first():
+                    os.remove(item['path'])
+            except Exception as e:
+                print(f"error removing unused attachment {item['path']}: {e}")
+
+    @classmethod
+    def attach(cls, message, stored, user_id):
+        """
+        link stored uploads to a saved (flushed) message, the caller commits.
+        a File with the same bytes and visibility in the project is reused.
+
+        returns:
+            list of the attached File rows
+        """
+        from models.DocumentFileManagement.file import File
+        from models.DocumentFileManagement.file_version import FileVersion
+
+        if not stored:
+            return []
+        if message.projectID is None:
+            raise AttachmentError("attachments need a project, pick one for the conversation")
+
+        # direct message files are not shown to the rest of the project
+        private = message.receiverID is not None
+        files = []
+        for item in stored:
+            file = (File.query.join(cls, cls.file_id == File.id)
+                    .filter(cls.content_hash == item['hash'], File.projectId == message.projectID,
+                            File.message_only == private)
+                    .first())
+            if file is None:
+                file = File(message.projectID, item['name'], item['path'], item['size'], item['type'],
+                            user_id, description="message attachment")
+                file.file_path = item['path']  # __init__ only sets filePath
+                file.message_only = private
+                # the search index takes the name, reading the text would put the bytes in this request
+                file.index_file_text = False
+                db.session.add(file)
+                db.session.flush()
+                db.session.add(FileVersion(file.id, 1, user_id, item['path']))
+
+            if file.id not in {f.id for f in files}:
+                db.session.add(cls(message_id=message.messageID, file_id=file.id, content_hash=item['hash']))
+                files.append(file)
+        return files
+
+    @classmethod
+    def user_can_access(cls, user, file_id):
+        """the user sent or got a message with this file, or it is in a channel they can see."""
+        from models.Communication.message import Message
+
+        visible = user.get_accessible_project_ids()
+        channel = Message.receiverID.is_(None)
+        if visible is not None:
+            channel = db.and_(channel, Message.projectID.in_(visible))
+        query = (db.session.query(cls.message_id)
+                 .join(Message, Message.messageID == cls.message_id)
+                 .filter(cls.file_id == file_id,
+                         db.or_(Message.senderID == user.id, Message.receiverID == user.id, channel)))
+        return db.session.query(query.exists()).scalar()
+
+    @classmethod
+    def preview_path(cls, file):
+        """
+        path and mimetype of a small preview of the file, made on first use
+        and kept next to the attachments. None when there is no preview.
+        images need Pillow for a thumbnail, without it the image itself is
+        the preview.
+        """
+        file_type = (file.file_type or '').lower()
+        if not file.file_path or not os.path.exists(file.file_path):
+            return None
+
+        previews = os.path.join(cls.storage_root(), 'previews')
+        base = os.path.splitext(os.path.basename(file.file_path))[0]
+
+        if file_type in IMAGE_TYPES:
+            try:
+                from PIL import Image  # Pillow, optional
+            except ImportError:
+                return file.file_path, f"image/{'jpeg' if file_type == 'jpg' else file_type}"
+            path = os.path.join(previews, f"{base}.png")
+            if not os.path.exists(path):
+                os.makedirs(previews, exist_ok=True)
+                with Image.open(file.file_path) as image:
+                    image.thumbnail(PREVIEW_SIZE)
+                    cls._write_atomically(path, lambda out: image.save(out, format='PNG'))
+            return path, 'image/png'
+
+        if file_type == 'txt':
+            path = os.path.join(previews, f"{base}.txt")
+            if not os.path.exists(path):
+                os.makedirs(previews, exist_ok=True)
+                with open(file.file_path, 'rb') as source:
+                    head = source.read(TEXT_PREVIEW_BYTES)
+                cls._write_atomically(path, lambda out: out.write(head))
+            return path, 'text/plain'
+
+        return None
+
+    @staticmethod
+    def _write_atomically(path, write):
+        """two requests may make the same preview, the second one just wins."""
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as out:
+                write(out)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
@@ -9,5 +9,17 @@ class MessageService:
         return message
 
     def attach_files(self, message, attachments):
-        
-        pass
+        """stream uploads to the attachment store and link them to a saved message."""
+        from models.Communication.message_attachment import MessageAttachment
+        from models.database import db
+        stored = []
+        try:
+            for upload in attachments:
+                stored.append(MessageAttachment.store_upload(upload))
+            files = MessageAttachment.attach(message, stored, message.senderID)
+            db.session.commit()
+            return files
+        except Exception:
+            db.session.rollback()
+            MessageAttachment.discard(stored)
+            raise
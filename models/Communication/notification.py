@@ -1,6 +1,6 @@
 # models /Communication / notification.py
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from models.database import db
 from models.UserManagement.user import User
 from models.ProjectManagement.project import Project
@@ -17,6 +17,14 @@ class Notification(db.Model):
     project, task  or milestone
     """
     __tablename__ =  'notifications'  # db  table name
+    __table_args__ = (
+        # the deadline scanner checks which tasks were already notified
+        db.Index('ix_notifications_task_type', 'task_id', 'notification_type'),
+        # unread counts, the bell dropdown and coalescing all start here
+        db.Index('ix_notifications_user_unread', 'user_id', 'is_read', 'timestamp'),
+        # the notifications page and the per user retention cap
+        db.Index('ix_notifications_user_time', 'user_id', 'timestamp', 'id'),
+    )
     
     # types 
     TYPE_TASK_ASSIGNED   = "task_assigned" # this when new task assigned to user he get notfication
@@ -74,6 +82,10 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, 
                         default=False,
                           nullable=False)  # read status
+
+    event_count = db.Column(db.Integer,
+                            default=1,
+                            nullable=False)  # how many events were merged into this row
     
     # this are for the relationships
     user = db.relationship('User', 
@@ -201,3 +213,241 @@ class Notification(db.Model):
             print(f"error creating notification:  {e}")
             db.session.rollback()
             return None
+
+    # rows per INSERT, keeps sqlite under its bound parameter limit
+    INSERT_CHUNK_SIZE = 500
+
+    # types where repeated events for the same task / project merge into one row
+    COALESCE_TYPES = [TYPE_TASK_UPDATED, TYPE_PROJECT_UPDATED]
+
+    def to_dict(self):
+        """notification as a dict for the JSON endpoints."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'notification_type': self.notification_type,
+            'project_id': self.project_id,
+            'task_id': self.task_id,
+            'milestone_id': self.milestone_id,
+            'event_count': self.event_count or 1,
+            'is_read': self.is_read,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'link': self.get_link(),
+        }
+
+    @classmethod
+    def count_unread(cls, user_id):
+        """number of unread notifications, a COUNT on the user/unread index."""
+        return db.session.query(db.func.count(cls.id)).filter(cls.user_id == user_id,
+                                                               cls.is_read == False).scalar() or 0
+
+    @classmethod
+    def get_recent_unread(cls, user_id, limit=5):
+        """newest unread notifications, for the bell dropdown."""
+        return (cls.query.filter(cls.user_id == user_id, cls.is_read == False)
+                .order_by(cls.timestamp.desc()).limit(limit).all())
+
+    @classmethod
+    def _coalesce_query(cls, user_ids, notification_type, project_id, task_id, since):
+        """unread rows with the same key, new enough to merge into."""
+        return cls.query.filter(cls.user_id.in_(list(user_ids)),
+                                cls.is_read == False,
+                                cls.notification_type == notification_type,
+                                cls.project_id.is_(None) if project_id is None else cls.project_id == project_id,
+                                cls.task_id.is_(None) if task_id is None else cls.task_id == task_id,
+                                cls.timestamp >= since)
+
+    @classmethod
+    def bulk_create(cls, user_ids, title, notification_type=TYPE_CUSTOM, content=None,
+                    project_id=None, task_id=None, milestone_id=None, coalesce_seconds=None):
+        """
+        add the same notification for many users with multi-row INSERTs
+        (one per INSERT_CHUNK_SIZE users). does not commit, the caller
+        owns the transaction.
+
+        with coalesce_seconds, for COALESCE_TYPES, users that already have
+        an unread row for the same type / project / task from inside that
+        window get that row bumped (event_count + 1, new title and time)
+        with one UPDATE instead of a new row.
+
+        returns:
+            number of notifications added or merged
+        """
+        if not title:
+            raise ValueError("notification title must have value")
+        if notification_type not in cls.NOTIFICATION_TYPES:
+            notification_type = cls.TYPE_CUSTOM
+
+        now = datetime.now(timezone.utc)
+        user_ids = set(user_ids)
+
+        merged = 0
+        if coalesce_seconds and notification_type in cls.COALESCE_TYPES and user_ids:
+            since = now - timedelta(seconds=coalesce_seconds)
+            # newest matching row of each user
+            targets = dict(
+                cls._coalesce_query(user_ids, notification_type, project_id, task_id, since)
+                .with_entities(cls.user_id, db.func.max(cls.id))
+                .group_by(cls.user_id)
+                .all()
+            )
+            if targets:
+                merged = cls.query.filter(cls.id.in_(list(targets.values()))).update(
+                    {cls.event_count: cls.event_count + 1,
+                     cls.timestamp: now,
+                     cls.title: title,
+                     cls.content: content},
+                    synchronize_session=False)
+                user_ids -= set(targets)
+
+        rows = [
+            {
+                'user_id': user_id,
+                'title': title,
+                'content': content,
+                'notification_type': notification_type,
+                'project_id': project_id,
+                'task_id': task_id,
+                'milestone_id': milestone_id,
+                'is_read': False,
+                'timestamp': now,
+            }
+            for user_id in sorted(set(user_ids))
+        ]
+        for start in range(0, len(rows), cls.INSERT_CHUNK_SIZE):
+            db.session.execute(cls.__table__.insert().values(rows[start:start + cls.INSERT_CHUNK_SIZE]))
+        return len(rows) + merged
+
+    @classmethod
+    def roll_up_digests(cls, older_than_minutes=60, min_rows=3, max_groups=500):
+        """
+        replace piles of old unread notifications with one digest row each.
+
+        unread rows of the COALESCE_TYPES older than older_than_minutes are
+        grouped by user, type and project. a group with at least min_rows
+        rows becomes a single row whose event_count is the sum of the group.
+        one commit per run. other types keep their rows: deadline reminders
+        are looked up by task to not send them twice.
+
+        returns:
+            dict with the digests made and the rows they replaced
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=older_than_minutes)
+        base = cls.query.filter(cls.is_read == False, cls.timestamp < cutoff,
+                                cls.notification_type.in_(cls.COALESCE_TYPES))
+
+        groups = (
+            base.with_entities(cls.user_id, cls.notification_type, cls.project_id,
+                               db.func.count(cls.id), db.func.sum(cls.event_count),
+                               db.func.max(cls.timestamp))
+            .group_by(cls.user_id, cls.notification_type, cls.project_id)
+            .having(db.func.count(cls.id) >= min_rows)
+            .limit(max_groups)
+            .all()
+        )
+
+        digests = replaced = 0
+        try:
+            for user_id, notification_type, project_id, rows, events, latest in groups:
+                project_match = cls.project_id.is_(None) if project_id is None else cls.project_id == project_id
+                replaced += base.filter(cls.user_id == user_id,
+                                        cls.notification_type == notification_type,
+                                        project_match).delete(synchronize_session=False)
+                label = notification_type.replace('_', ' ')
+                digest = cls(user_id=user_id,
+                             title=f"{events} {label} notifications",
+                             notification_type=notification_type,
+                             content=f"digest of {rows} notifications",
+                             project_id=project_id)
+                digest.event_count = events
+                digest.timestamp = latest  # the newest event, so ordering stays right
+                db.session.add(digest)
+                digests += 1
+            db.session.commit()
+        except Exception as e:
+            print(f"error rolling up notification digests: {e}")
+            db.session.rollback()
+            raise
+
+        return {'digests': digests, 'replaced': replaced}
+
+    @classmethod
+    def ensure_coalesce_columns(cls):
+        """add event_count to a notifications table made before it existed."""
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(cls.__tablename__)}
+            if 'event_count' in columns:
+                return False
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f"ALTER TABLE {cls.__tablename__} ADD COLUMN event_count INTEGER NOT NULL DEFAULT 1"))
+            return True
+        except Exception as e:
+            print(f"error adding notification event_count: {e}")
+            return False
+
+    @classmethod
+    def create_deadline_notifications(cls, window_days=2, batch_size=500, today=None):
+        """
+        tell assignees about unfinished tasks due within window_days.
+
+        due tasks are read in batches from the due_date index. a task and
+        assignee that already got a deadline notification inside the
+        window are skipped, so running this every hour sends one reminder,
+        not one per run. each batch is one insert and one commit.
+
+        returns:
+            dict with scanned tasks, created notifications and batches
+        """
+        from datetime import date
+
+        today = today or date.today()
+        end = today + timedelta(days=window_days)
+        # reminders newer than this count as already sent
+        since = datetime.combine(today - timedelta(days=window_days), datetime.min.time())
+
+        scanned = created = batches = 0
+        for rows in Task.iter_due_batches(today, end, batch_size):
+            batches += 1
+            scanned += len(rows)
+            try:
+                sent = set(
+                    db.session.query(cls.task_id, cls.user_id)
+                    .filter(cls.task_id.in_([row.id for row in rows]),
+                            cls.notification_type == cls.TYPE_DEADLINE_APPROACHING,
+                            cls.timestamp >= since)
+                    .all()
+                )
+                new = [
+                    {
+                        'user_id': row.assigned_to_id,
+                        'title': f"Deadline approaching: {row.title}",
+                        'content': f"due on {row.due_date.strftime('%Y-%m-%d')}",
+                        'notification_type': cls.TYPE_DEADLINE_APPROACHING,
+                        'project_id': row.project_id,
+                        'task_id': row.id,
+                        'is_read': False,
+                        'timestamp': datetime.now(timezone.utc),
+                    }
+                    for row in rows if (row.id, row.assigned_to_id) not in sent
+                ]
+                if new:
+                    db.session.bulk_insert_mappings(cls, new)
+                db.session.commit()
+                created += len(new)
+            except Exception as e:
+                print(f"error creating deadline notifications: {e}")
+                db.session.rollback()
+                raise
+
+        return {'scanned': scanned, 'created': created, 'batches': batches}
+
+    @classmethod
+    def create_missing_indexes(cls):
+        """add the indexes to a notifications table made before they were declared."""
+        try:
+            for index in cls.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"error creating notification indexes: {e}")
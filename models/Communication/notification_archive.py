@@ -0,0 +1,236 @@
+"""
+retention for notifications.
+
+the notifications table only keeps recent ("hot") rows. read notifications
+older than the retention period, and the oldest rows past a per user cap
+(read ones first), are moved in batches to notifications_archive, which
+the notifications page can still page through.
+
+on Postgres the archive is range partitioned by month, so throwing away
+old history is a DROP TABLE of a partition instead of a huge DELETE. on
+SQLite it is a normal table and purging deletes in batches.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+from models.database import db
+from models.Communication.notification import Notification
+
+# columns copied from notifications, in the same order on both sides
+_COPIED = ['id', 'user_id', 'project_id', 'task_id', 'milestone_id', 'title', 'content',
+           'notification_type', 'event_count', 'is_read', 'timestamp']
+
+
+class NotificationArchive(db.Model):
+    """
+    a notification moved out of the hot table. no foreign keys, so deleting
+    a project or task never has to touch the archive.
+    """
+    __tablename__ = 'notifications_archive'
+    __table_args__ = (
+        db.Index('ix_notifications_archive_user_time', 'user_id', 'timestamp', 'id'),
+    )
+
+    # the timestamp is part of the key because Postgres partitions on it
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    timestamp = db.Column(db.DateTime, primary_key=True)
+
+    user_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer)
+    task_id = db.Column(db.Integer)
+    milestone_id = db.Column(db.Integer)
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text)
+    notification_type = db.Column(db.String(50), nullable=False)
+    event_count = db.Column(db.Integer, default=1, nullable=False)
+    is_read = db.Column(db.Boolean, default=True, nullable=False)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    archived = True  # lets templates tell archived rows apart
+
+    def get_link(self):
+        """same links as a live notification."""
+        return Notification.get_link(self)
+
+    def to_dict(self):
+        data = Notification.to_dict(self)
+        data['archived'] = True
+        return data
+
+    @staticmethod
+    def _is_postgres():
+        return db.engine.dialect.name == 'postgresql'
+
+    @classmethod
+    def create_partitioned_table(cls):
+        """
+        on Postgres, create the archive as a table partitioned by month.
+        must run before create_all, which would make a plain table.
+        returns:
+            True when the partitioned table was created
+        """
+        if not cls._is_postgres():
+            return False
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(db.text(f"""
+                    CREATE TABLE IF NOT EXISTS {cls.__tablename__} (
+                        id INTEGER NOT NULL,
+                        timestamp TIMESTAMP NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        project_id INTEGER,
+                        task_id INTEGER,
+                        milestone_id INTEGER,
+                        title VARCHAR(200) NOT NULL,
+                        content TEXT,
+                        notification_type VARCHAR(50) NOT NULL,
+                        event_count INTEGER NOT NULL DEFAULT 1,
+                        is_read BOOLEAN NOT NULL DEFAULT TRUE,
+                        archived_at TIMESTAMP,
+                        PRIMARY KEY (id, timestamp)
+                    ) PARTITION BY RANGE (timestamp)"""))
+            return True
+        except Exception as e:
+            print(f"error creating partitioned notification archive: {e}")
+            return False
+
+    @classmethod
+    def _partition_name(cls, month_start):
+        return f"{cls.__tablename__}_{month_start:%Y_%m}"
+
+    @classmethod
+    def ensure_partitions(cls, oldest, newest):
+        """make sure a monthly partition exists for every month in the range (Postgres only)."""
+        if not cls._is_postgres() or oldest is None:
+            return
+        month = datetime(oldest.year, oldest.month, 1)
+        while month <= newest.replace(tzinfo=None):
+            following = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+            db.session.execute(db.text(
+                f"CREATE TABLE IF NOT EXISTS {cls._partition_name(month)} "
+                f"PARTITION OF {cls.__tablename__} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"))
+            month = following
+
+    @classmethod
+    def _move(cls, ids):
+        """copy notifications into the archive and delete them, caller commits."""
+        if not ids:
+            return 0
+        oldest, newest = (db.session.query(func.min(Notification.timestamp), func.max(Notification.timestamp))
+                          .filter(Notification.id.in_(ids)).one())
+        cls.ensure_partitions(oldest, newest)
+
+        source = select(*[getattr(Notification, name) for name in _COPIED]).where(Notification.id.in_(ids))
+        db.session.execute(insert(cls).from_select(_COPIED, source))
+        return Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+
+    @classmethod
+    def archive_read(cls, older_than_days=90, batch_size=1000, max_batches=None):
+        """
+        move read notifications older than older_than_days, batch_size at a
+        time, committing after each batch.
+        returns:
+            number of notifications archived
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        moved = batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = [row[0] for row in
+                   db.session.query(Notification.id)
+                   .filter(Notification.is_read == True, Notification.timestamp < cutoff)
+                   .order_by(Notification.id).limit(batch_size).all()]
+            if not ids:
+                break
+            try:
+                moved += cls._move(ids)
+                db.session.commit()
+            except Exception as e:
+                print(f"error archiving notifications: {e}")
+                db.session.rollback()
+                raise
+            batches += 1
+        return moved
+
+    @classmethod
+    def enforce_user_cap(cls, max_per_user=500, batch_size=1000):
+        """
+        keep at most max_per_user notifications per user in the hot table.
+        the oldest read rows go to the archive first, unread ones only when
+        the user is still over the cap after that: they would drop out of
+        the bell, and deadline reminders are de-duplicated against them.
+        returns:
+            number of notifications archived
+        """
+        over = (db.session.query(Notification.user_id, func.count(Notification.id))
+                .group_by(Notification.user_id)
+                .having(func.count(Notification.id) > max_per_user)
+                .all())
+        moved = 0
+        for user_id, count in over:
+            excess = count - max_per_user
+            for is_read in (True, False):
+                while excess > 0:
+                    ids = [row[0] for row in
+                           db.session.query(Notification.id)
+                           .filter(Notification.user_id == user_id, Notification.is_read == is_read)
+                           .order_by(Notification.timestamp, Notification.id)
+                           .limit(min(batch_size, excess)).all()]
+                    if not ids:
+                        break
+                    try:
+                        archived = cls._move(ids)
+                        db.session.commit()
+                    except Exception as e:
+                        print(f"error capping notifications of user {user_id}: {e}")
+                        db.session.rollback()
+                        raise
+                    moved += archived
+                    excess -= archived
+        return moved
+
+    @classmethod
+    def purge(cls, older_than_days=730, batch_size=1000):
+        """
+        throw away archived notifications older than older_than_days.
+        on Postgres whole months go with DROP TABLE, elsewhere it is a
+        batched DELETE.
+        returns:
+            number of rows deleted, or of partitions dropped on Postgres
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+        if cls._is_postgres():
+            # a month partition ends before the cutoff month starts, so all of it is older
+            names = db.session.execute(db.text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :parent"), {'parent': cls.__tablename__}).scalars().all()
+            last_month = datetime(cutoff.year, cutoff.month, 1)
+            dropped = 0
+            for name in names:
+                if name < cls._partition_name(last_month):
+                    db.session.execute(db.text(f"DROP TABLE IF EXISTS {name}"))
+                    dropped += 1
+            db.session.commit()
+            return dropped
+
+        deleted = 0
+        while True:
+            ids = [row[0] for row in
+                   db.session.query(cls.id).filter(cls.timestamp < cutoff).limit(batch_size).all()]
+            if not ids:
+                return deleted
+            deleted += cls.query.filter(cls.id.in_(ids), cls.timestamp < cutoff).delete(synchronize_session=False)
+            db.session.commit()
+
+    @classmethod
+    def run_retention(cls, older_than_days=90, max_per_user=500, purge_after_days=730, batch_size=1000):
+        """the periodic job: archive old read rows, apply the cap, purge old history."""
+        return {
+            'archived': cls.archive_read(older_than_days, batch_size),
+            'capped': cls.enforce_user_cap(max_per_user, batch_size),
+            'purged': cls.purge(purge_after_days, batch_size),
+        }
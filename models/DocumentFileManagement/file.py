@@ -1,9 +1,10 @@
 from datetime import datetime,timezone
 from typing import Optional
 import  models.database as db
+from models.versioning import VersionedMixin
 
 
-class File(db.Model):
+class File(VersionedMixin, db.Model):
     """
     File class representing files in the CMT system
     
@@ -59,6 +60,10 @@ class File(db.Model):
                            default =lambda: datetime. now(timezone. utc))
     currentVersion = db.Column(db.Integer,
                                 default=1)
+    # attached to a direct message, only the conversation sees it
+    message_only = db.Column(db.Boolean,
+                             nullable=False,
+                             default=False)
 
     versions = db.relationship(
         'FileVersion' ,
@@ -108,6 +113,52 @@ class File(db.Model):
         
     
 
+    """
+    ?sort= names we allow and the column they sort on
+    """
+    SORT_FIELDS = {'id' : 'id',
+                   'name' : 'fileName',
+                   'uploaded' : 'uploadDate',
+                   'size' : 'fileSize'}
+
+    @classmethod
+    def get_files_page(cls, cursor=None, limit=25, sort='-id',
+                       project_id: Optional[int] = None,
+                       uploaded_by: Optional[int] = None):
+        """
+        get one page of files with keyset pagination
+        return: (list of files, next cursor or None)
+        """
+        from utils.pagination import keyset_paginate, parse_sort
+
+        field, descending = parse_sort(sort, cls.SORT_FIELDS, '-id')
+
+        query = cls.query.filter(cls.message_only.is_(False))
+        if project_id is not None:
+            query = query.filter(cls.projectId == project_id)
+        if uploaded_by is not None:
+            query = query.filter(cls.uploadedBy == uploaded_by)
+
+        column = getattr(cls, cls.SORT_FIELDS[field])
+        columns = [cls.id] if field == 'id' else [column, cls.id]
+
+        return keyset_paginate(query, columns, cursor, limit, descending)
+
+    @classmethod
+    def ensure_message_only_column(cls):
+        """add message_only to a files table made before it existed."""
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(cls.__tablename__)}
+            if 'message_only' in columns:
+                return False
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f"ALTER TABLE {cls.__tablename__} ADD COLUMN message_only BOOLEAN NOT NULL DEFAULT FALSE"))
+            return True
+        except Exception as e:
+            print(f"error adding files.message_only: {e}")
+            return False
+
     def _fileTypeTolowerNodot(self ,file_type: str ) -> str:
         """
         clean file type
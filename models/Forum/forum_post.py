@@ -6,6 +6,10 @@ from models.ProjectManagement.project import Project
 
 class ForumPost(db.Model):
     __tablename__ = 'forum_posts'
+    __table_args__ = (
+        # the forum index pages through a project's posts newest first
+        db.Index('ix_forum_posts_project_time', 'projectID', 'postTime', 'postID'),
+    )
 
     postID = db.Column(db.Integer, primary_key=True, autoincrement=True)
     userID = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -15,6 +19,11 @@ class ForumPost(db.Model):
     content = db.Column(db.Text, nullable=False)
     postTime = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
 
+    # kept up to date by the ForumReply insert / delete events, so listing
+    # posts never has to count replies
+    reply_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_reply_at = db.Column(db.DateTime, nullable=True)
+
 
     # Relationships
     author = db.relationship('User', foreign_keys=[userID], backref=db.backref('forum_posts', lazy=True))
@@ -37,8 +46,90 @@ class ForumPost(db.Model):
         return f"<ForumPost postID={self.postID} title='{self.title}' authorID={self.userID}>"
 
     def get_reply_count(self) -> int:
+        return self.reply_count or 0
+
+    @classmethod
+    def get_forum_posts_page(cls, project_id, cursor=None, limit=20):
+        """
+        one page of a project's posts, newest first, with keyset pagination.
+        authors come in one extra query, so a page is two queries in total.
+
+        returns:
+            (list of posts, next cursor or None on the last page)
+        """
+        from sqlalchemy.orm import selectinload
+        from utils.pagination import keyset_paginate
+
+        query = cls.query.filter(cls.projectID == project_id).options(selectinload(cls.author))
+        return keyset_paginate(query, [cls.postTime, cls.postID], cursor, limit, descending=True)
+
+    def get_replies_page(self, cursor=None, limit=50):
+        """
+        one page of this post's replies, oldest first, keyset paged on
+        (replyTime, replyID) so deep pages of long threads stay cheap.
+
+        returns:
+            (list of replies, next cursor or None on the last page)
+        """
+        from sqlalchemy.orm import selectinload
+        from models.Forum.forum_reply import ForumReply
+        from utils.pagination import keyset_paginate
+
+        query = ForumReply.query.filter(ForumReply.postID == self.postID).options(selectinload(ForumReply.author))
+        return keyset_paginate(query, [ForumReply.replyTime, ForumReply.replyID], cursor, limit)
+
+    def cache_version(self):
+        """
+        changes whenever a reply is added or removed, used in cache keys.
+        """
+        last = self.last_reply_at.isoformat() if self.last_reply_at else '-'
+        return f"{self.reply_count or 0}:{last}"
+
+    @classmethod
+    def ensure_counter_columns(cls):
+        """
+        add reply_count / last_reply_at to a forum_posts table made before
+        they existed, then fill them in.
+        """
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(cls.__tablename__)}
+            missing = [name for name in ('reply_count', 'last_reply_at') if name not in columns]
+            if not missing:
+                return False
+
+            with db.engine.begin() as connection:
+                if 'reply_count' in missing:
+                    connection.execute(db.text(
+                        f"ALTER TABLE {cls.__tablename__} ADD COLUMN reply_count INTEGER NOT NULL DEFAULT 0"))
+                if 'last_reply_at' in missing:
+                    connection.execute(db.text(
+                        f"ALTER TABLE {cls.__tablename__} ADD COLUMN last_reply_at TIMESTAMP"))
+            for index in cls.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+
+            cls.recount_replies()
+            return True
+        except Exception as e:
+            print(f"error adding forum counter columns: {e}")
+            return False
+
+    @classmethod
+    def recount_replies(cls):
+        """
+        set reply_count and last_reply_at of every post from the replies
+        table, in one UPDATE. for repairing the counters.
+        """
+        from models.Forum.forum_reply import ForumReply
+
         try:
-            return self.replies.count()
+            count = (db.select(db.func.count(ForumReply.replyID))
+                     .where(ForumReply.postID == cls.postID).scalar_subquery())
+            latest = (db.select(db.func.max(ForumReply.replyTime))
+                      .where(ForumReply.postID == cls.postID).scalar_subquery())
+            result = db.session.execute(db.update(cls).values(reply_count=count, last_reply_at=latest))
+            db.session.commit()
+            return result.rowcount
         except Exception as e:
-            print(f"Error counting replies for post {self.postID}: {e}") 
+            print(f"error recounting forum replies: {e}")
+            db.session.rollback()
             return 0
\ No newline at end of file
@@ -1,5 +1,6 @@
 # forum reply for forum posting model
 from datetime import datetime, timezone
+from sqlalchemy import event
 from models.database import db
 from models.UserManagement.user import User
 
@@ -27,4 +28,38 @@ class ForumReply(db.Model):
         self.content = content
 
     def __repr__(self):
-        return f"<ForumReply replyID={self.replyID} postID={self.postID} authorID={self.userID}>"
\ No newline at end of file
+        return f"<ForumReply replyID={self.replyID} postID={self.postID} authorID={self.userID}>"
+
+
+# keep ForumPost.reply_count / last_reply_at in step with the replies.
+# these run inside the flush on the same connection, so the counter
+# changes commit or roll back together with the reply itself.
+
+def _after_reply_insert(mapper, connection, target):
+    posts = db.metadata.tables['forum_posts']
+    connection.execute(
+        posts.update()
+        .where(posts.c.postID == target.postID)
+        .values(reply_count=posts.c.reply_count + 1,
+                last_reply_at=db.case(
+                    (posts.c.last_reply_at.is_(None), target.replyTime),
+                    (posts.c.last_reply_at < target.replyTime, target.replyTime),
+                    else_=posts.c.last_reply_at))
+    )
+
+
+def _after_reply_delete(mapper, connection, target):
+    posts = db.metadata.tables['forum_posts']
+    replies = ForumReply.__table__
+    latest = (db.select(db.func.max(replies.c.replyTime))
+              .where(replies.c.postID == target.postID).scalar_subquery())
+    connection.execute(
+        posts.update()
+        .where(posts.c.postID == target.postID)
+        .values(reply_count=db.case((posts.c.reply_count > 0, posts.c.reply_count - 1), else_=0),
+                last_reply_at=latest)
+    )
+
+
+event.listen(ForumReply, 'after_insert', _after_reply_insert)
+event.listen(ForumReply, 'after_delete', _after_reply_delete)
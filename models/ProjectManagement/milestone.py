@@ -2,8 +2,9 @@ from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 import traceback  
 from models.database import db
+from models.versioning import VersionedMixin
 
-class Milestone(db.Model):
+class Milestone(VersionedMixin, db.Model):
     
     __tablename__ = 'milestones' 
     
@@ -157,15 +158,19 @@ class Milestone(db.Model):
             # Re-raise the exception
             raise ValueError(f"Could not get milestone tasks: {str(e)}")
     
-    def to_dict(self):
+    def to_dict(self, include_tasks=True):
         """
         Convert milestone object to dictionary for API/JSON responses.
         
+        Args:
+            include_tasks: set to False to skip loading the task list,
+                           the task ids need an extra query per milestone
+        
         Returns:
             dict: Milestone data as dictionary
         """
         try:
-            return {
+            data = {
                 'id': self.id,
                 'title': self.title,
                 'description': self.description,
@@ -173,9 +178,11 @@ class Milestone(db.Model):
                 'status': self.status,
                 'completion_percentage': self.completion_percentage,
                 'project_id': self.project_id,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'tasks': [task.id for task in self.tasks] if self.tasks else []
+                'created_at': self.created_at.isoformat() if self.created_at else None
             }
+            if include_tasks:
+                data['tasks'] = [task.id for task in self.tasks] if self.tasks else []
+            return data
         except Exception as e:
             print(f"Error converting milestone to dict: {str(e)}")
             return {'error': 'Could not convert milestone to dictionary'}
@@ -2,11 +2,12 @@ from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 import traceback  # for better error tracking
 from models.database import db
+from models.versioning import VersionedMixin
 from models.Forum.forum_post import ForumPost
 
 
 
-class project(db.model):
+class project(VersionedMixin, db.model):
     """ 
     This representing project class in the cmt system.
     """
@@ -149,9 +150,66 @@ class project(db.model):
         except Exception as e  :
             print( "her may  get___ all __project just faild not work like good ", e)
             return [] #fallback empty list
+
+    # ?sort= names we allow and the column they sort on
+    SORT_FIELDS = {
+        'id': 'id',
+        'name': 'project_name',
+        'start_date': 'start_date',
+    }
+
+    @classmethod
+    def get_projects_page(cls, cursor=None, limit=25, sort='-id', status=None):
+        """
+        get one page of projects, keyset paginated so big tables stay fast
+        return :
+        (list of project objects, next cursor or None on the last page)
+        """
+        from utils.pagination import keyset_paginate, parse_sort
+
+        field, descending = parse_sort(sort, cls.SORT_FIELDS, '-id')
+
+        query = cls.query
+        if status:
+            query = query.filter(cls.status == status)
+
+        # always end the order with the id so the cursor is unique
+        column = getattr(cls, cls.SORT_FIELDS[field])
+        columns = [cls.id] if field == 'id' else [column, cls.id]
+
+        return keyset_paginate(query, columns, cursor, limit, descending)
+
+    @classmethod
+    def get_project_choices(cls):
+        """
+        only id and name of every project, for dropdowns
+        we do not need the full objects there
+        """
+        try:
+            return db.session.query(cls.id, cls.project_name).order_by(cls.project_name).all()
+        except Exception as e:
+            print("get_project_choices() error ", e)
+            return []
         
 
 
+    def get_member_ids(self):
+        """
+        ids of everyone working on this project: the creator and anyone
+        who created or is assigned a task in it. one UNION query.
+        """
+        from models.TaskManagement.task import Task
+        try:
+            assignees = db.session.query(Task.assigned_to_id).filter(Task.project_id == self.id)
+            task_creators = db.session.query(Task.created_by_id).filter(Task.project_id == self.id)
+            member_ids = {row[0] for row in assignees.union(task_creators).all()}
+            member_ids.add(self.created_by_id)
+            member_ids.discard(None)
+            return member_ids
+        except Exception as e:
+            print(f"error getting project members: {e}")
+            return set()
+
     def get_files(self ) :
         """
         get all files for this project 
@@ -162,7 +220,8 @@ class project(db.model):
         try:
             from models.DocumentFileManagement import File
 
-            fileList = File.query.filter_by( project_id = self.id).all()
+            # files attached to direct messages belong to the conversation
+            fileList = File.query.filter_by( project_id = self.id, message_only=False).all()
 
             allFiles =  fileList
 
@@ -0,0 +1,5 @@
+# Search
+from models.Search.search_index import SearchDocument, SearchPosting
+from models.Search.search_service import SearchService
+
+__all__ = ['SearchDocument', 'SearchPosting', 'SearchService']
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from models.database import db
+
+
+class SearchDocument(db.Model):
+    """
+    one row per searchable entity (task, milestone, file, forum post, message).
+
+    holds the data we need to show a hit and to filter it by permission,
+    the actual words live in SearchPosting.
+    """
+    __tablename__ = 'search_documents'
+
+    # entity types we index
+    TYPE_TASK = 'task'
+    TYPE_MILESTONE = 'milestone'
+    TYPE_FILE = 'file'
+    TYPE_FORUM_POST = 'forum_post'
+    TYPE_MESSAGE = 'message'
+
+    ENTITY_TYPES = [TYPE_TASK, TYPE_MILESTONE, TYPE_FILE, TYPE_FORUM_POST, TYPE_MESSAGE]
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+
+    # permission data, project_id NULL means not linked to a project
+    project_id = db.Column(db.Integer, nullable=True, index=True)
+    # only set for direct messages, the two people that can see it
+    user_id = db.Column(db.Integer, nullable=True)
+    peer_id = db.Column(db.Integer, nullable=True)
+
+    title = db.Column(db.String(200), nullable=False)
+    snippet = db.Column(db.String(300))
+    length = db.Column(db.Integer, default=0, nullable=False)  # number of terms, for BM25
+    indexed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', name='uq_search_documents_entity'),
+    )
+
+    def get_link(self):
+        """
+        get the link to the indexed item, same idea as Notification.get_link.
+        """
+        if self.entity_type == self.TYPE_TASK and self.project_id:
+            return f"/project/{self.project_id}/tasks"
+        elif self.entity_type == self.TYPE_MILESTONE and self.project_id:
+            return f"/project/{self.project_id}/milestones"
+        elif self.entity_type == self.TYPE_FILE:
+            return f"/file/{self.entity_id}/download"
+        elif self.entity_type == self.TYPE_FORUM_POST:
+            return f"/forum/post/{self.entity_id}"
+        elif self.entity_type == self.TYPE_MESSAGE and self.peer_id is None and self.project_id:
+            # posted to the project channel
+            return f"/project/{self.project_id}/channel"
+        elif self.entity_type == self.TYPE_MESSAGE and self.user_id:
+            return f"/messages/{self.user_id}"
+        return "#"
+
+    def to_dict(self):
+        return {
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'project_id': self.project_id,
+            'title': self.title,
+            'snippet': self.snippet,
+            'link': self.get_link()
+        }
+
+    def __repr__(self):
+        return f"<SearchDocument {self.entity_type}:{self.entity_id}>"
+
+
+class SearchPosting(db.Model):
+    """
+    inverted index entry: a term and how many times it shows up in a document.
+    """
+    __tablename__ = 'search_postings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), nullable=False)
+    document_id = db.Column(db.Integer,
+                            db.ForeignKey('search_documents.id', ondelete='CASCADE'),
+                            nullable=False)
+    frequency = db.Column(db.Integer, default=1, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_search_postings_term_document', 'term', 'document_id'),
+        db.Index('ix_search_postings_document', 'document_id'),
+    )
@@ -0,0 +1,413 @@
+import heapq
+import math
+import os
+import re
+import traceback
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import event, func, or_, and_, true
+from models.database import db
+from models.Search.search_index import SearchDocument, SearchPosting
+
+
+class SearchService:
+    """
+    keeps the search index up to date and answers search queries.
+
+    the index is a plain inverted index stored in our own database
+    (search_documents + search_postings) so it works on SQLite and
+    PostgreSQL the same way. hits are ranked with BM25.
+    """
+
+    # BM25 tuning, the usual defaults
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+
+    MAX_EXTRACT_BYTES = 1024 * 1024  # do not read more than 1 MB out of a file
+    MAX_TERM_LENGTH = 64  # same as SearchPosting.term
+    SNIPPET_LENGTH = 300
+
+    TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+    STOP_WORDS = {
+        'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+        'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with'
+    }
+
+    # columns that change what we index, per model, if none of them changed
+    # on an update we skip re indexing the row
+    WATCHED_FIELDS = {
+        'Task': ('title', 'description', 'project_id'),
+        'Milestone': ('title', 'description', 'project_id'),
+        'File': ('fileName', 'description', 'projectId', 'file_path'),
+        'ForumPost': ('title', 'content', 'projectID'),
+        'Message': ('content', 'projectID'),
+    }
+
+    _listeners_registered = False
+
+    @classmethod
+    def tokenize(cls, text):
+        """
+        split text into lower case terms, drops stop words and 1 char tokens.
+
+        returns:
+            list of terms, duplicates kept (we need them for term frequency)
+        """
+        if not text:
+            return []
+        terms = []
+        for token in cls.TOKEN_PATTERN.findall(text.lower()):
+            if len(token) < 2 or token in cls.STOP_WORDS:
+                continue
+            terms.append(token[:cls.MAX_TERM_LENGTH])
+        return terms
+
+    @classmethod
+    def _indexed_models(cls):
+        # import here to avoid circular imports
+        from models.TaskManagement.task import Task
+        from models.ProjectManagement.milestone import Milestone
+        from models.DocumentFileManagement.file import File
+        from models.Forum.forum_post import ForumPost
+        from models.Communication.message import Message
+
+        return [Task, Milestone, File, ForumPost, Message]
+
+    @classmethod
+    def _extract_file_text(cls, file_path, file_type):
+        """
+        read the text out of an uploaded file, only txt and docx for now.
+        """
+        try:
+            if not file_path or not os.path.exists(file_path):
+                return ''
+
+            if file_type == 'txt':
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as handle:
+                    return handle.read(cls.MAX_EXTRACT_BYTES)
+
+            if file_type == 'docx':
+                try:
+                    import docx  # python-docx, optional
+                except ImportError:
+                    return ''
+                document = docx.Document(file_path)
+                text = '\n'.join(paragraph.text for paragraph in document.paragraphs)
+                return text[:cls.MAX_EXTRACT_BYTES]
+
+        except Exception as e:
+            print(f"error extracting text from {file_path}: {e}")
+        return ''
+
+    @classmethod
+    def _describe(cls, target):
+        """
+        turn a model row into the data we store in the index.
+
+        returns:
+            dict or None if the row type is not indexed
+        """
+        model_name = type(target).__name__
+
+        if model_name in ('Task', 'Milestone'):
+            return {
+                'entity_type': SearchDocument.TYPE_TASK if model_name == 'Task' else SearchDocument.TYPE_MILESTONE,
+                'entity_id': target.id,
+                'project_id': target.project_id,
+                'user_id': None,
+                'peer_id': None,
+                'title': target.title or '',
+                'text': target.description or ''
+            }
+
+        if model_name == 'File':
+            if getattr(target, 'message_only', False):
+                return None  # a direct message attachment, not for the whole project
+            extracted = ''
+            if getattr(target, 'index_file_text', True):
+                extracted = cls._extract_file_text(target.file_path, target.file_type)
+            return {
+                'entity_type': SearchDocument.TYPE_FILE,
+                'entity_id': target.id,
+                'project_id': target.projectId,
+                'user_id': None,
+                'peer_id': None,
+                'title': target.fileName or '',
+                'text': f"{target.description or ''}\n{extracted}"
+            }
+
+        if model_name == 'ForumPost':
+            return {
+                'entity_type': SearchDocument.TYPE_FORUM_POST,
+                'entity_id': target.postID,
+                'project_id': target.projectID,
+                'user_id': None,
+                'peer_id': None,
+                'title': target.title or '',
+                'text': target.content or ''
+            }
+
+        if model_name == 'Message':
+            content = target.content or ''
+            return {
+                'entity_type': SearchDocument.TYPE_MESSAGE,
+                'entity_id': target.messageID,
+                'project_id': target.projectID,
+                'user_id': target.senderID,
+                'peer_id': target.receiverID,
+                'title': content[:60],
+                'text': content
+            }
+
+        return None
+
+    @classmethod
+    def _remove_document(cls, connection, entity_type, entity_id):
+        documents = SearchDocument.__table__
+        postings = SearchPosting.__table__
+
+        document_id = connection.execute(
+            db.select(documents.c.id).where(documents.c.entity_type == entity_type,
+                                            documents.c.entity_id == entity_id)
+        ).scalar()
+        if document_id is not None:
+            connection.execute(postings.delete().where(postings.c.document_id == document_id))
+            connection.execute(documents.delete().where(documents.c.id == document_id))
+        return document_id
+
+    @classmethod
+    def _index(cls, connection, target):
+        """
+        write (or re write) the index rows for one model row.
+        uses the flush connection so it runs inside the same transaction.
+        """
+        data = cls._describe(target)
+        if not data:
+            return False
+
+        documents = SearchDocument.__table__
+        postings = SearchPosting.__table__
+
+        title_terms = cls.tokenize(data['title'])
+        body_terms = cls.tokenize(data['text'])
+        frequencies = Counter(title_terms + body_terms)
+
+        snippet = (data['text'] or data['title']).strip()[:cls.SNIPPET_LENGTH]
+
+        cls._remove_document(connection, data['entity_type'], data['entity_id'])
+
+        result = connection.execute(documents.insert().values(
+            entity_type=data['entity_type'],
+            entity_id=data['entity_id'],
+            project_id=data['project_id'],
+            user_id=data['user_id'],
+            peer_id=data['peer_id'],
+            title=(data['title'] or '(untitled)')[:200],
+            snippet=snippet,
+            length=sum(frequencies.values()),
+            indexed_at=datetime.now(timezone.utc)
+        ))
+        document_id = result.inserted_primary_key[0]
+
+        if frequencies:
+            connection.execute(postings.insert(), [
+                {'term': term, 'document_id': document_id, 'frequency': count}
+                for term, count in frequencies.items()
+            ])
+        return True
+
+    # SQLAlchemy mapper events
+    @classmethod
+    def _after_insert(cls, mapper, connection, target):
+        try:
+            cls._index(connection, target)
+        except Exception as e:
+            print(f"error indexing {target}: {e}")
+            traceback.print_exc()
+
+    @classmethod
+    def _after_update(cls, mapper, connection, target):
+        try:
+            watched = cls.WATCHED_FIELDS.get(type(target).__name__, ())
+            state = db.inspect(target)
+            if not any(state.attrs[field].history.has_changes() for field in watched):
+                return  # nothing we index has changed
+            cls._index(connection, target)
+        except Exception as e:
+            print(f"error re indexing {target}: {e}")
+            traceback.print_exc()
+
+    @classmethod
+    def _after_delete(cls, mapper, connection, target):
+        try:
+            data = cls._describe_key(target)
+            if data:
+                cls._remove_document(connection, *data)
+        except Exception as e:
+            print(f"error removing {target} from the index: {e}")
+
+    @classmethod
+    def _describe_key(cls, target):
+        """(entity_type, entity_id) without reading any file from disk."""
+        model_name = type(target).__name__
+        keys = {
+            'Task': (SearchDocument.TYPE_TASK, 'id'),
+            'Milestone': (SearchDocument.TYPE_MILESTONE, 'id'),
+            'File': (SearchDocument.TYPE_FILE, 'id'),
+            'ForumPost': (SearchDocument.TYPE_FORUM_POST, 'postID'),
+            'Message': (SearchDocument.TYPE_MESSAGE, 'messageID'),
+        }
+        if model_name not in keys:
+            return None
+        entity_type, id_field = keys[model_name]
+        return entity_type, getattr(target, id_field)
+
+    @classmethod
+    def register_listeners(cls):
+        """
+        hook the index into the after_insert / after_update / after_delete
+        events of every indexed model. safe to call more than once.
+        """
+        if cls._listeners_registered:
+            return
+
+        for model in cls._indexed_models():
+            event.listen(model, 'after_insert', cls._after_insert)
+            event.listen(model, 'after_update', cls._after_update)
+            event.listen(model, 'after_delete', cls._after_delete)
+
+        cls._listeners_registered = True
+
+    @classmethod
+    def index_rows(cls, rows):
+        """
+        index rows written without mapper events (bulk inserts / updates).
+        runs on the session connection, the caller commits.
+        """
+        connection = db.session.connection()
+        count = 0
+        for target in rows:
+            if cls._index(connection, target):
+                count += 1
+        return count
+
+    @classmethod
+    def rebuild(cls):
+        """
+        throw away the whole index and index every row again.
+
+        returns:
+            int number of indexed documents
+        """
+        try:
+            connection = db.session.connection()
+            connection.execute(SearchPosting.__table__.delete())
+            connection.execute(SearchDocument.__table__.delete())
+
+            count = 0
+            for model in cls._indexed_models():
+                for target in model.query.yield_per(500):
+                    if cls._index(connection, target):
+                        count += 1
+
+            db.session.commit()
+            return count
+        except Exception as e:
+            print(f"error rebuilding search index: {e}")
+            traceback.print_exc()
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _visibility_filter(user):
+        """
+        only documents the user is allowed to see:
+        direct messages they sent or got, and everything else in their projects.
+        """
+        project_ids = user.get_accessible_project_ids()
+        if project_ids is None:
+            project_clause = true()
+        else:
+            project_clause = or_(SearchDocument.project_id.is_(None),
+                                 SearchDocument.project_id.in_(project_ids))
+
+        return or_(
+            and_(SearchDocument.peer_id.isnot(None),
+                 or_(SearchDocument.user_id == user.id, SearchDocument.peer_id == user.id)),
+            and_(SearchDocument.peer_id.is_(None), project_clause)
+        )
+
+    @classmethod
+    def search(cls, query_text, user, entity_types=None, limit=20, offset=0):
+        """
+        search everything the user can see and rank the hits with BM25.
+
+        returns:
+            list of dicts (SearchDocument.to_dict plus a score), best first
+        """
+        try:
+            terms = list(dict.fromkeys(cls.tokenize(query_text)))
+            if not terms or user is None:
+                return []
+
+            # corpus stats for BM25
+            total_documents, average_length = db.session.query(
+                func.count(SearchDocument.id), func.avg(SearchDocument.length)
+            ).one()
+            if not total_documents:
+                return []
+            average_length = float(average_length or 1) or 1.0
+
+            document_frequency = dict(
+                db.session.query(SearchPosting.term, func.count(SearchPosting.id))
+                .filter(SearchPosting.term.in_(terms))
+                .group_by(SearchPosting.term)
+                .all()
+            )
+
+            postings = db.session.query(SearchPosting.document_id,
+                                        SearchPosting.term,
+                                        SearchPosting.frequency,
+                                        SearchDocument.length) \
+                .join(SearchDocument, SearchDocument.id == SearchPosting.document_id) \
+                .filter(SearchPosting.term.in_(terms)) \
+                .filter(cls._visibility_filter(user))
+
+            if entity_types:
+                postings = postings.filter(SearchDocument.entity_type.in_(entity_types))
+
+            scores = Counter()
+            for document_id, term, frequency, length in postings:
+                df = document_frequency.get(term, 0)
+                idf = math.log(1 + (total_documents - df + 0.5) / (df + 0.5))
+                norm = cls.BM25_K1 * (1 - cls.BM25_B + cls.BM25_B * (length or 0) / average_length)
+                scores[document_id] += idf * (frequency * (cls.BM25_K1 + 1)) / (frequency + norm)
+
+            best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))
+            best = best[offset:]
+            if not best:
+                return []
+
+            documents = {
+                document.id: document
+                for document in SearchDocument.query.filter(SearchDocument.id.in_([doc_id for doc_id, _ in best]))
+            }
+
+            results = []
+            for document_id, score in best:
+                document = documents.get(document_id)
+                if document:
+                    result = document.to_dict()
+                    if (document.entity_type == SearchDocument.TYPE_MESSAGE and document.user_id == user.id
+                            and document.peer_id is not None):
+                        # our own message, open the chat with the other person
+                        result['link'] = f"/messages/{document.peer_id}"
+                    result['score'] = round(score, 4)
+                    results.append(result)
+            return results
+
+        except Exception as e:
+            print(f"error searching for '{query_text}': {e}")
+            traceback.print_exc()
+            return []
@@ -1,14 +1,20 @@
 from datetime import datetime, timezone
 from typing import Optional, Dict
 from models.database import db
+from models.versioning import VersionedMixin, version_bump_values
+from sqlalchemy import or_
 import json
 
-class Task(db.Model):
+class Task(VersionedMixin, db.Model):
     """
     Task class for project tasks. Tracks status, importance, and timing info.
     """
 
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # the deadline scanner reads a due_date range, skipping finished tasks
+        db.Index('ix_tasks_due_date_status', 'due_date', 'status'),
+    )
 
     # Status constants
     STATUS_NOT_BEGUN = "not begun"
@@ -30,6 +36,7 @@ class Task(db.Model):
 
     due_date = db.Column(db.Date)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    milestone_id = db.Column(db.Integer, db.ForeignKey('milestones.id'))
 
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -45,6 +52,7 @@ class Task(db.Model):
                  importance: str = IMPORTANCE_NORMAL,
                  status: str = STATUS_NOT_BEGUN,
                  due_date: Optional[datetime] = None,
+                 milestone_id: Optional[int] = None,
                  assigned_to_id: Optional[int] = None,
                  created_by_id: Optional[int] = None,
                  estimated_duration: Optional[int] = None,
@@ -64,6 +72,7 @@ class Task(db.Model):
         self.importance = importance
         self.status = status
         self.due_date = due_date
+        self.milestone_id = milestone_id
         self.assigned_to_id = assigned_to_id
         self.created_by_id = created_by_id
         self.estimated_duration = estimated_duration
@@ -84,6 +93,7 @@ class Task(db.Model):
             "actual_start_datetime": self._format_datetime(self.actual_start_time),
             "actual_end_datetime": self._format_datetime(self.actual_end_datetime),
             "project_id": self.project_id,
+            "milestone_id": self.milestone_id,
             "assigned_to_id": self.assigned_to_id,
             "estimated_duration": self.estimated_duration,
             "is_high_importance": self.importance == self.IMPORTANCE_HIGH
@@ -91,7 +101,7 @@ class Task(db.Model):
 
     def update(self, **kwargs):
         for field in ['title', 'description', 'importance', 'status', 'due_date', 
-                      'assigned_to_id', 'estimated_duration', 'start_date', 
+                      'milestone_id', 'assigned_to_id', 'estimated_duration', 'start_date', 
                       'actual_start_time', 'actual_end_datetime']:
             if field in kwargs and kwargs[field] is not None:
                 setattr(self, field, kwargs[field])
@@ -123,6 +133,7 @@ class Task(db.Model):
             importance=importance,
             status=status,
             due_date=kwargs.get("due_date"),
+            milestone_id=kwargs.get("milestone_id"),
             assigned_to_id=kwargs.get("assigned_to_id"),
             created_by_id=kwargs.get("created_by_id"),
             estimated_duration=kwargs.get("estimated_duration"),
@@ -138,6 +149,316 @@ class Task(db.Model):
     def get_project_tasks(cls, project_id):
         return cls.query.filter_by(project_id=project_id).all()
 
+    # fields that can be changed on many tasks at once
+    BATCH_FIELDS = ['status', 'assigned_to_id', 'milestone_id', 'due_date']
+
+    @classmethod
+    def bulk_update(cls, task_ids, changes, project_id=None, notify=True):
+        """
+        apply the same changes to many tasks with one UPDATE statement.
+
+        changes may hold status, assigned_to_id, milestone_id and due_date
+        (None clears assignee / milestone / due date). when the assignee
+        changes, every new assignee gets ONE notification listing their
+        tasks instead of one per task. everything is one transaction.
+
+        returns:
+            number of tasks updated
+        """
+        from models.Communication.notification import Notification
+        from models.ProjectManagement.milestone import Milestone
+        from models.UserManagement.user import User
+
+        task_ids = {int(task_id) for task_id in task_ids}
+        unknown = set(changes) - set(cls.BATCH_FIELDS)
+        if unknown:
+            raise ValueError(f"can not batch update: {', '.join(sorted(unknown))}")
+        if not task_ids or not changes:
+            return 0
+
+        if 'status' in changes and changes['status'] not in cls.STATUS_OPTIONS:
+            raise ValueError(f"Invalid status. Choose from: {', '.join(cls.STATUS_OPTIONS)}")
+
+        assignee_id = changes.get('assigned_to_id')
+        if assignee_id is not None and not db.session.query(User.id).filter(User.id == assignee_id).first():
+            raise ValueError(f"user {assignee_id} does not exist")
+
+        query = cls.query.filter(cls.id.in_(task_ids))
+        if project_id is not None:
+            query = query.filter(cls.project_id == project_id)
+
+        milestone_id = changes.get('milestone_id')
+        if milestone_id is not None:
+            milestone = Milestone.query.get(milestone_id)
+            if not milestone:
+                raise ValueError(f"milestone {milestone_id} does not exist")
+            # a milestone only makes sense for tasks of its own project
+            if query.filter(cls.project_id != milestone.project_id).first() is not None:
+                raise ValueError("milestone belongs to a different project")
+
+        try:
+            # who is newly assigned, read before the update overwrites it
+            newly_assigned = []
+            if assignee_id is not None and notify:
+                newly_assigned = (
+                    query.with_entities(cls.id, cls.title, cls.project_id)
+                    .filter(or_(cls.assigned_to_id.is_(None), cls.assigned_to_id != assignee_id))
+                    .order_by(cls.id)
+                    .all()
+                )
+
+            values = {getattr(cls, field): value for field, value in changes.items()}
+            # query.update() skips before_update, so move the row versions here
+            values.update(version_bump_values(cls))
+            updated = query.update(values, synchronize_session=False)
+
+            if newly_assigned:
+                project_ids = {row.project_id for row in newly_assigned}
+                titles = [row.title for row in newly_assigned[:10]]
+                content = ', '.join(titles)
+                if len(newly_assigned) > len(titles):
+                    content += f" and {len(newly_assigned) - len(titles)} more"
+                single = newly_assigned[0] if len(newly_assigned) == 1 else None
+
+                db.session.add(Notification(
+                    user_id=assignee_id,
+                    title=(f"Task assigned: {single.title}" if single
+                           else f"{len(newly_assigned)} tasks assigned to you"),
+                    notification_type=Notification.TYPE_TASK_ASSIGNED,
+                    content=content,
+                    project_id=project_ids.pop() if len(project_ids) == 1 else None,
+                    task_id=single.id if single else None,
+                ))
+
+            db.session.commit()
+            return updated
+
+        except Exception as e:
+            print(f"error batch updating tasks: {e}")
+            db.session.rollback()
+            raise
+
+    # bulk import / export
+    IMPORT_FIELDS = ['title', 'description', 'importance', 'status', 'due_date', 'start_date',
+                     'estimated_duration', 'milestone_id', 'assigned_to_id']
+    EXPORT_FIELDS = ['id', 'title', 'description', 'importance', 'status', 'due_date', 'start_date',
+                     'estimated_duration', 'milestone_id', 'assigned_to_id', 'created_by_id', 'created_at']
+    IMPORT_BATCH_SIZE = 500
+    MAX_IMPORT_ERRORS = 200  # stop collecting errors after this many
+
+    @classmethod
+    def validate_import_row(cls, row, milestone_ids=None, user_ids=None):
+        """
+        check one imported row and turn it into column values.
+        milestone_ids / user_ids are the ids that exist, checked if given.
+
+        raises ValueError with all the problems of the row.
+        """
+        def text(name):
+            value = row.get(name)
+            if value is None:
+                return None
+            value = str(value).strip()
+            return value or None
+
+        def parse_date(name):
+            value = text(name)
+            if value is None:
+                return None
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                problems.append(f"{name} must be YYYY-MM-DD")
+                return None
+
+        def parse_int(name):
+            value = text(name)
+            if value is None:
+                return None
+            try:
+                number = int(value)
+            except ValueError:
+                problems.append(f"{name} must be a whole number")
+                return None
+            if number < 0:
+                problems.append(f"{name} can not be negative")
+                return None
+            return number
+
+        problems = []
+
+        title = text('title')
+        if not title:
+            problems.append("title is required")
+        elif len(title) > 100:
+            problems.append("title is longer than 100 characters")
+
+        importance = (text('importance') or cls.IMPORTANCE_NORMAL).lower()
+        if importance not in cls.IMPORTANCE_OPTIONS:
+            problems.append(f"importance must be one of: {', '.join(cls.IMPORTANCE_OPTIONS)}")
+
+        status = (text('status') or cls.STATUS_NOT_BEGUN).lower()
+        if status not in cls.STATUS_OPTIONS:
+            problems.append(f"status must be one of: {', '.join(cls.STATUS_OPTIONS)}")
+
+        values = {
+            'title': title,
+            'description': text('description'),
+            'importance': importance,
+            'status': status,
+            'due_date': parse_date('due_date'),
+            'start_date': parse_date('start_date'),
+            'estimated_duration': parse_int('estimated_duration'),
+            'milestone_id': parse_int('milestone_id'),
+            'assigned_to_id': parse_int('assigned_to_id'),
+        }
+
+        if values['milestone_id'] is not None and milestone_ids is not None \
+                and values['milestone_id'] not in milestone_ids:
+            problems.append(f"milestone {values['milestone_id']} is not in this project")
+
+        if values['assigned_to_id'] is not None and user_ids is not None \
+                and values['assigned_to_id'] not in user_ids:
+            problems.append(f"user {values['assigned_to_id']} does not exist")
+
+        if problems:
+            raise ValueError('; '.join(problems))
+        return values
+
+    @classmethod
+    def bulk_import(cls, project_id, rows, created_by_id=None, skip_invalid=False):
+        """
+        import many tasks into a project in one transaction.
+
+        rows is an iterable of (line number, dict) like utils.task_transfer
+        gives back. inserts are batched with bulk_insert_mappings, there is
+        one commit at the end.
+
+        by default nothing is saved when any row is invalid, with
+        skip_invalid=True the good rows are saved and the bad ones reported.
+
+        returns:
+            (number of imported tasks, list of {'line': n, 'error': msg})
+        """
+        from models.ProjectManagement.milestone import Milestone
+        from models.UserManagement.user import User
+        from sqlalchemy import func
+
+        # two small queries up front instead of one per row
+        milestone_ids = {row[0] for row in db.session.query(Milestone.id).filter(Milestone.project_id == project_id)}
+        user_ids = {row[0] for row in db.session.query(User.id)}
+
+        errors = []
+        batch = []
+        imported = 0
+        highest_id_before = db.session.query(func.max(cls.id)).scalar() or 0
+
+        try:
+            for line_number, row in rows:
+                try:
+                    if isinstance(row, str):
+                        raise ValueError(row)  # the line could not even be parsed
+                    values = cls.validate_import_row(row, milestone_ids, user_ids)
+                except ValueError as e:
+                    if len(errors) < cls.MAX_IMPORT_ERRORS:
+                        errors.append({'line': line_number, 'error': str(e)})
+                    continue
+
+                if errors and not skip_invalid:
+                    continue  # keep validating so we report every bad row, but do not insert
+
+                values['project_id'] = project_id
+                values['created_by_id'] = created_by_id
+                batch.append(values)
+
+                if len(batch) >= cls.IMPORT_BATCH_SIZE:
+                    db.session.bulk_insert_mappings(cls, batch)
+                    imported += len(batch)
+                    batch = []
+
+            if errors and not skip_invalid:
+                db.session.rollback()
+                return 0, errors
+
+            if batch:
+                db.session.bulk_insert_mappings(cls, batch)
+                imported += len(batch)
+
+            # bulk inserts skip the mapper events, so index the new rows here
+            if imported:
+                from models.Search.search_service import SearchService
+                SearchService.index_rows(
+                    cls.query.filter(cls.project_id == project_id, cls.id > highest_id_before).yield_per(500)
+                )
+
+            db.session.commit()
+            return imported, errors
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def iter_export_rows(cls, project_id):
+        """
+        all tasks of a project as plain tuples (in EXPORT_FIELDS order),
+        fetched in chunks so big projects stream instead of loading at once.
+        """
+        columns = [getattr(cls, field) for field in cls.EXPORT_FIELDS]
+        query = db.session.query(*columns).filter(cls.project_id == project_id).order_by(cls.id)
+        for row in query.yield_per(1000):
+            yield tuple(row)
+
+    @classmethod
+    def iter_due_batches(cls, start, end, batch_size=500):
+        """
+        assigned, unfinished tasks due between start and end (inclusive),
+        as lists of light rows (id, title, project_id, assigned_to_id,
+        due_date). walks the due_date index with a keyset, so the cost
+        follows the number of due tasks, not the size of the table.
+        """
+        columns = (cls.id, cls.title, cls.project_id, cls.assigned_to_id, cls.due_date)
+        last = None
+        while True:
+            query = (db.session.query(*columns)
+                     .filter(cls.due_date >= start, cls.due_date <= end,
+                             cls.status != cls.STATUS_FINISHED,
+                             cls.assigned_to_id.isnot(None)))
+            if last is not None:
+                query = query.filter(or_(cls.due_date > last.due_date,
+                                         (cls.due_date == last.due_date) & (cls.id > last.id)))
+            rows = query.order_by(cls.due_date, cls.id).limit(batch_size).all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+
+    @classmethod
+    def ensure_milestone_column(cls):
+        """add milestone_id to a tasks table made before it existed."""
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(cls.__tablename__)}
+            if 'milestone_id' in columns:
+                return False
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f"ALTER TABLE {cls.__tablename__} ADD COLUMN milestone_id INTEGER REFERENCES milestones (id)"))
+            return True
+        except Exception as e:
+            print(f"error adding tasks.milestone_id: {str(e)}")
+            return False
+
+    @classmethod
+    def create_missing_indexes(cls):
+        """add the indexes to a tasks table made before they were declared."""
+        try:
+            for index in cls.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"error creating task indexes: {str(e)}")
+
     @staticmethod
     def _format_date(date_obj):
         return date_obj.strftime('%Y-%m-%d') if date_obj else None
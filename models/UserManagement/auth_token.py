@@ -15,6 +15,12 @@ class AuthToken(db.Model):
     
     """
     __tablename__ = 'auth_tokens'  #this  DB table name
+    __table_args__ = (
+        # validate_token looks tokens up by value and type
+        db.Index('ix_auth_tokens_value_type', 'token_value', 'token_type'),
+        # lets the sweeper find expired rows without a full scan
+        db.Index('ix_auth_tokens_expiry', 'expiry_timestamp'),
+    )
     
     # token type constants
     TOKEN_TYPE_VERIFY  = 'verify'
@@ -86,8 +92,12 @@ class AuthToken(db.Model):
             
         """
         try:
+            expiry = self.expiry_timestamp
+            # sqlite gives back naive datetimes, they are stored as utc
+            if expiry.tzinfo is None:
+                expiry = expiry.replace(tzinfo=timezone.utc)
             # check if token has expired
-            return datetime.now(timezone.utc) < self.expiry_timestamp
+            return datetime.now(timezone.utc) < expiry
         except Exception as e:
             print(f"error checking token validity: {str(e)}")
             return False
@@ -147,3 +157,59 @@ class AuthToken(db.Model):
         except Exception as e:
             print(f"error validating token: {str(e)}")
             return None
+
+    @classmethod
+    def create_missing_indexes(cls):
+        """
+        create_all skips tables that already exist, so add the indexes to
+        databases made before they were declared.
+        """
+        try:
+            for index in cls.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"error creating auth token indexes: {str(e)}")
+
+    @classmethod
+    def sweep_expired(cls, batch_size=1000, max_batches=None, grace_minutes=0):
+        """
+        delete expired and invalidated tokens (invalidate() backdates the
+        expiry, so both look the same) in small batches, committing after
+        each one so the table is never locked for long.
+
+        returns:
+            dict with deleted rows, batches and time taken
+        """
+        started = datetime.now(timezone.utc)
+        cutoff = started - timedelta(minutes=grace_minutes)
+        deleted = 0
+        batches = 0
+
+        try:
+            while max_batches is None or batches < max_batches:
+                ids = [row[0] for row in
+                       db.session.query(cls.id)
+                       .filter(cls.expiry_timestamp < cutoff)
+                       .order_by(cls.expiry_timestamp)
+                       .limit(batch_size)
+                       .all()]
+                if not ids:
+                    break
+
+                deleted += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                batches += 1
+
+                if len(ids) < batch_size:
+                    break
+        except Exception as e:
+            print(f"error sweeping auth tokens: {str(e)}")
+            db.session.rollback()
+
+        seconds = (datetime.now(timezone.utc) - started).total_seconds()
+        return {
+            'deleted': deleted,
+            'batches': batches,
+            'seconds': round(seconds, 3),
+            'remaining': cls.query.count(),
+        }
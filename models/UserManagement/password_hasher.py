@@ -0,0 +1,221 @@
+"""
+password hashing with scrypt, run in a small bounded thread pool.
+
+scrypt is slow and memory hungry on purpose. if every login hashed inline a
+burst of logins could tie up every web worker, so hashing goes through a pool
+with a fixed number of threads (hashlib.scrypt releases the GIL) and a limit
+on how many requests may wait for it. when the queue is full we refuse
+straight away with PasswordHasherBusy instead of letting requests pile up.
+
+stored format:
+    scrypt$<n>$<r>$<p>$<salt>$<hash>   (salt and hash are urlsafe base64)
+
+old accounts still have the sha256 hex digest from before, those are
+checked the old way and should be rehashed after a successful login.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+LEGACY_SALT = "CMT_salt_value"  # the fixed salt the old sha256 hashes used
+PREFIX = "scrypt"
+
+
+class PasswordHasherBusy(Exception):
+    """raised when too many hashes are already queued."""
+
+
+class PasswordHasher:
+    """
+    hashes and checks passwords with scrypt in a bounded pool.
+    """
+
+    def __init__(self, n=2 ** 14, r=8, p=1, dklen=32, salt_bytes=16,
+                 max_workers=2, max_queue=16, admission_timeout=0.5, metrics_window=1000):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of two")
+        self.n = n
+        self.r = r
+        self.p = p
+        self.dklen = dklen
+        self.salt_bytes = salt_bytes
+        self.max_workers = max_workers
+        self.admission_timeout = admission_timeout
+
+        # running + waiting jobs, anything above this is turned away
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor = _native_thread_pool(max_workers)
+
+        self._lock = threading.Lock()
+        self._queue_times = deque(maxlen=metrics_window)
+        self._hash_times = deque(maxlen=metrics_window)
+        self._completed = 0
+        self._rejected = 0
+        self._waiting = 0
+
+    # hashing
+
+    def _derive(self, password, salt, n, r, p, dklen):
+        # scrypt needs 128 * n * r bytes, give it a bit of head room
+        maxmem = 128 * n * r * (p + 1) + 1024 * 1024
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=maxmem, dklen=dklen)
+
+    def _run(self, func, *args):
+        """
+        run func in the pool and wait for the result.
+
+        raises:
+            PasswordHasherBusy: if the pool and its queue are full
+        """
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy("too many password checks at once, try again")
+
+        submitted = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                self._queue_times.append(started - submitted)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._hash_times.append(time.perf_counter() - started)
+                    self._completed += 1
+
+        try:
+            return self._executor.submit(job).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """
+        hash a password with the current cost settings.
+        returns:
+            str: the encoded hash to store
+        """
+        salt = os.urandom(self.salt_bytes)
+        key = self._run(self._derive, password, salt, self.n, self.r, self.p, self.dklen)
+        return "$".join([PREFIX, str(self.n), str(self.r), str(self.p), _b64(salt), _b64(key)])
+
+    def verify(self, password, stored_hash):
+        """
+        check a password against a stored hash (scrypt or legacy sha256).
+
+        returns:
+            (matches, needs_rehash) - needs_rehash is True for legacy hashes
+            and for scrypt hashes made with older cost settings
+        """
+        if not password or not stored_hash:
+            return False, False
+
+        if not stored_hash.startswith(PREFIX + "$"):
+            legacy = hashlib.sha256((password + LEGACY_SALT).encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored_hash), True
+
+        try:
+            _, n, r, p, salt, key = stored_hash.split("$")
+            n, r, p = int(n), int(r), int(p)
+            salt, key = _unb64(salt), _unb64(key)
+        except ValueError:
+            print("error checking password: unreadable password hash")
+            return False, False
+
+        derived = self._run(self._derive, password, salt, n, r, p, len(key))
+        if not hmac.compare_digest(derived, key):
+            return False, False
+        return True, (n, r, p, len(key)) != (self.n, self.r, self.p, self.dklen)
+
+    # metrics
+
+    def stats(self):
+        """
+        numbers for monitoring the pool.
+        returns:
+            dict with counts and queue / hash time percentiles in ms
+        """
+        with self._lock:
+            queue_times = sorted(self._queue_times)
+            hash_times = sorted(self._hash_times)
+            return {
+                "workers": self.max_workers,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_ms_p50": _percentile(queue_times, 50),
+                "queue_ms_p99": _percentile(queue_times, 99),
+                "hash_ms_p50": _percentile(hash_times, 50),
+                "hash_ms_p99": _percentile(hash_times, 99),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 2)
+
+
+def _native_thread_pool(max_workers):
+    """
+    scrypt needs real threads. once gevent has monkey patched threading
+    (serve.py) the standard pool runs its jobs as greenlets on the event
+    loop, where a hash would stall every other request, so use gevent's
+    pool of native threads then.
+    """
+    try:
+        from gevent import monkey  # optional, only there when serving with gevent
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kdf")
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """the shared hasher, made with default settings on first use."""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
+
+
+def configure_password_hasher(**settings):
+    """
+    replace the shared hasher, e.g. with cost settings from the app config.
+    """
+    global _hasher
+    with _hasher_lock:
+        old = _hasher
+        _hasher = PasswordHasher(**settings)
+    if old is not None:
+        old.shutdown()
+    return _hasher
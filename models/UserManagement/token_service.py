@@ -0,0 +1,123 @@
+"""
+email verification / password reset tokens, in one of two modes.
+
+table  - the original AuthToken rows: one insert per token, one lookup per use.
+signed - nothing is stored. the token is the user id plus a fingerprint,
+         signed with the app SECRET_KEY and time stamped (itsdangerous).
+         checking it is pure CPU. the fingerprint covers the password hash
+         and the verified flag, so once the password is reset (or the email
+         verified) the same token stops working - that is what makes it
+         one time use without a table.
+
+pick the mode with the AUTH_TOKEN_MODE config value.
+"""
+import hashlib
+import hmac
+import threading
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+MODE_TABLE = 'table'
+MODE_SIGNED = 'signed'
+MODES = [MODE_TABLE, MODE_SIGNED]
+
+PURPOSE_VERIFY = 'verify'
+PURPOSE_RESET = 'reset'
+
+# how long each kind of token lasts, same as the AuthToken defaults
+EXPIRY_HOURS = {
+    PURPOSE_VERIFY: 24,
+    PURPOSE_RESET: 1,
+}
+
+
+class TableTokenStore:
+    """tokens kept in the auth_tokens table."""
+
+    mode = MODE_TABLE
+
+    def issue(self, user, purpose):
+        from models.UserManagement.auth_token import AuthToken
+        return AuthToken.generate_token(user_id=user.id, token_type=purpose,
+                                        expiry_hours=EXPIRY_HOURS[purpose])
+
+    def peek_user_id(self, token_value, purpose):
+        """user id of a valid token, or None."""
+        from models.UserManagement.auth_token import AuthToken
+        token = AuthToken.validate_token(token_value, purpose)
+        return token.user_id if token else None
+
+    def consume(self, user, token_value, purpose):
+        """check the token belongs to user and use it up, the caller commits."""
+        from models.database import db
+        from models.UserManagement.auth_token import AuthToken
+        token = AuthToken.validate_token(token_value, purpose)
+        if not token or token.user_id != user.id:
+            return False
+        token.invalidate()
+        db.session.add(token)
+        return True
+
+
+class SignedTokenStore:
+    """stateless HMAC signed tokens."""
+
+    mode = MODE_SIGNED
+
+    def __init__(self, secret_key):
+        if not secret_key:
+            raise ValueError("signed tokens need a SECRET_KEY")
+        self._secret_key = secret_key
+
+    def _serializer(self, purpose):
+        # the purpose is the salt, so a reset token can never pass as a verify token
+        return URLSafeTimedSerializer(self._secret_key, salt=f"cmt-auth-{purpose}")
+
+    @staticmethod
+    def fingerprint(user, purpose):
+        """short digest of the user state a token must still match."""
+        state = f"{purpose}:{user.id}:{user.password_hash}:{int(bool(user.is_verified))}"
+        return hashlib.sha256(state.encode()).hexdigest()[:16]
+
+    def issue(self, user, purpose):
+        return self._serializer(purpose).dumps({'uid': user.id, 'fp': self.fingerprint(user, purpose)})
+
+    def _load(self, token_value, purpose):
+        try:
+            return self._serializer(purpose).loads(token_value, max_age=EXPIRY_HOURS[purpose] * 3600)
+        except SignatureExpired:
+            return None
+        except BadSignature:
+            return None
+
+    def peek_user_id(self, token_value, purpose):
+        data = self._load(token_value, purpose)
+        return data.get('uid') if isinstance(data, dict) else None
+
+    def consume(self, user, token_value, purpose):
+        data = self._load(token_value, purpose)
+        if not isinstance(data, dict) or data.get('uid') != user.id:
+            return False
+        return hmac.compare_digest(str(data.get('fp', '')), self.fingerprint(user, purpose))
+
+
+_store = TableTokenStore()
+_store_lock = threading.Lock()
+
+
+def get_token_store():
+    return _store
+
+
+def configure_token_store(mode=MODE_TABLE, secret_key=None):
+    """
+    choose how tokens are made and checked.
+    raises:
+        ValueError: for an unknown mode
+    """
+    global _store
+    if mode not in MODES:
+        raise ValueError(f"AUTH_TOKEN_MODE must be one of: {', '.join(MODES)}")
+    with _store_lock:
+        _store = SignedTokenStore(secret_key) if mode == MODE_SIGNED else TableTokenStore()
+    return _store
@@ -2,7 +2,6 @@ from datetime import datetime, timezone
 import traceback  # this for error tracking help me a lot beffor it I like machine spend a lot time debug
 import re  # this are for regex  validation
 import secrets  # for generat  tokens
-import hashlib  # for simple password hashing 
 from models.database import db
 
 # TODO : replace simple hashing with  bcrypt library
@@ -25,6 +24,10 @@ class User(db.Model) :
 
     def get_id(self):
         return str(self.id)
+
+    def get_user(self):
+        # same as UserPrincipal.get_user, so current_user.get_user() always works
+        return self
     """
     user class for managing team members,
      project managers,
@@ -229,8 +232,8 @@ class User(db.Model) :
             if not self._is_valid_password(password):
                 raise ValueError("password must be at least 8 char and at lesat like  one number + upper case letter")
 
-            salt = "CMT_salt_value"  
-            self.password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
+            from models.UserManagement.password_hasher import get_password_hasher
+            self.password_hash = get_password_hasher().hash(password)
         except Exception as e:
             print(f"error setting password: {str(e)}")
             raise
@@ -238,13 +241,23 @@ class User(db.Model) :
     def check_password(self, password):
         """
         check if the provided password is correct.
+        old sha256 hashes (or scrypt with old costs) are replaced with a
+        fresh hash when the password matches, the caller commits.
         Returns:
             bool: True if correct, False other
+        Raises:
+            PasswordHasherBusy: if the hashing pool is full
         """
+        from models.UserManagement.password_hasher import get_password_hasher, PasswordHasherBusy
         try:
-            salt = "CMT_salt_value"  # must match the salt used in set_password method
-            hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-            return hashed ==  self.password_hash
+            hasher = get_password_hasher()
+            matches, needs_rehash = hasher.verify(password, self.password_hash)
+            if matches and needs_rehash:
+                # no _is_valid_password here, old passwords may be weaker
+                self.password_hash = hasher.hash(password)
+            return matches
+        except PasswordHasherBusy:
+            raise
         except Exception  as e:
             print(f"error checking   password: {str(e)}")
             return False
@@ -257,13 +270,10 @@ class User(db.Model) :
             str: The generated token
         """
         try:
-            from models.UserManagement.auth_token import AuthToken
+            from models.UserManagement.token_service import get_token_store, PURPOSE_VERIFY
 
-            token_value = AuthToken.generate_token(
-                user_id=self.id,
-                token_type=AuthToken.TOKEN_TYPE_VERIFY,
-                expiry_hours=24
-            )
+            # table mode inserts an AuthToken, signed mode writes nothing
+            token_value = get_token_store().issue(self, PURPOSE_VERIFY)
 
             return  token_value
         except Exception as e:
@@ -279,16 +289,11 @@ class User(db.Model) :
             bool: True if  successful, False other
         """
         try:
-            from models.UserManagement.auth_token import AuthToken
+            from models.UserManagement.token_service import get_token_store, PURPOSE_VERIFY
 
-            token = AuthToken.validate_token(token_value, AuthToken.TOKEN_TYPE_VERIFY)
-
-            if token and token.user_id == self.id:
+            # check (and use up) the token before changing the user
+            if get_token_store().consume(self, token_value, PURPOSE_VERIFY):
                 self.is_verified = True
-
-                token.invalidate()
-                db.session.add(token)
-
                 return True
             return False
         except Exception as e:
@@ -304,15 +309,9 @@ class User(db.Model) :
             str: The generated token
         """
         try:
-            from models.UserManagement.auth_token import AuthToken
+            from models.UserManagement.token_service import get_token_store, PURPOSE_RESET
 
-            
-            token_value =  AuthToken.generate_token(
-
-                user_id= self.id,
-                token_type = AuthToken.TOKEN_TYPE_RESET,
-                expiry_hours=1  
-            )
+            token_value =  get_token_store().issue(self, PURPOSE_RESET)
 
             return  token_value
         except Exception  as e:
@@ -327,20 +326,11 @@ class User(db.Model) :
             bool: True if reset are successful, False other
         """
         try:
-            from models.UserManagement.auth_token import AuthToken
+            from models.UserManagement.token_service import get_token_store, PURPOSE_RESET
 
-    
-            token = AuthToken.validate_token(token_value,
-                                              AuthToken.TOKEN_TYPE_RESET)
-
-            if token and token.user_id == self.id:
-                
+            # the signed token is tied to the old password hash, so check it first
+            if get_token_store().consume(self, token_value, PURPOSE_RESET):
                 self.set_password(new_password)
-
-                
-                token.invalidate()
-                db.session.add(token)
-
                 return  True
             return  False
         except  Exception as e:
@@ -410,21 +400,28 @@ class User(db.Model) :
         check if the user has the right
           permission for a role  restricted action.
 
+        """
+        return self.role_has_permission(self.role, required_role)
+
+    @classmethod
+    def role_has_permission(cls, role, required_role):
+        """
+        the role check behind has_permission, also used by UserPrincipal.
         """
         try:
             # admin has all the permissions
-            if self.role  == self.ROLE_ADMIN:
+            if role  == cls.ROLE_ADMIN:
                 return  True
 
             # Role like : admin > supervisor > project_manager > team_member
-            if required_role ==  self.ROLE_ADMIN:
-                return self.role == self.ROLE_ADMIN
+            if required_role ==  cls.ROLE_ADMIN:
+                return role == cls.ROLE_ADMIN
 
-            if required_role ==  self.ROLE_SUPERVISOR:
-                return self.role in [self.ROLE_ADMIN, self.ROLE_SUPERVISOR]
+            if required_role ==  cls.ROLE_SUPERVISOR:
+                return role in [cls.ROLE_ADMIN, cls.ROLE_SUPERVISOR]
 
-            if required_role ==  self.ROLE_PROJECT_MANAGER:
-                return self.role in [self.ROLE_ADMIN, self.ROLE_SUPERVISOR, self.ROLE_PROJECT_MANAGER]
+            if required_role ==  cls.ROLE_PROJECT_MANAGER:
+                return role in [cls.ROLE_ADMIN, cls.ROLE_SUPERVISOR, cls.ROLE_PROJECT_MANAGER]
 
             # Team member role - everyone has at least this 
             return  True
@@ -459,6 +456,105 @@ class User(db.Model) :
             print(f"error checking role   assignment  permission: {str(e)}")
             return  False
 
+    @classmethod
+    def bulk_set_role(cls, user_ids, role):
+        """
+        give many users the same role with one UPDATE.
+
+        the last admin rule is checked with one COUNT: when the new role is
+        not admin there must still be an admin outside the selection.
+
+        returns:
+            int: number of users updated
+        raises:
+            ValueError: bad role, or the change would leave no admin
+        """
+        from models.UserManagement.user_principal import principal_cache
+
+        if role not in cls.VALID_ROLES:
+            raise ValueError(f"invalid role, choose from: {', '.join(cls.VALID_ROLES)}")
+
+        user_ids = {int(user_id) for user_id in user_ids}
+        if not user_ids:
+            return 0
+
+        try:
+            if role != cls.ROLE_ADMIN:
+                admins_left = cls.query.filter(cls.role == cls.ROLE_ADMIN,
+                                               ~cls.id.in_(user_ids)).count()
+                if admins_left == 0:
+                    raise ValueError("this would remove all administrators")
+
+            updated = cls.query.filter(cls.id.in_(user_ids)).update({cls.role: role},
+                                                                    synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        principal_cache.invalidate(*user_ids)
+        return updated
+
+    # ?sort= names we allow and the column they sort on
+    SORT_FIELDS = {
+        'id': 'id',
+        'username': 'username',
+        'email': 'email',
+    }
+
+    @classmethod
+    def get_users_page(cls, cursor=None, limit=25, sort='username', role=None):
+        """
+        get one page of users with keyset pagination.
+
+        Returns:
+            (list of users, next cursor or None on the last page)
+        """
+        from utils.pagination import keyset_paginate, parse_sort
+
+        field, descending = parse_sort(sort, cls.SORT_FIELDS, 'username')
+
+        query = cls.query
+        if role:
+            query = query.filter(cls.role == role)
+
+        column = getattr(cls, cls.SORT_FIELDS[field])
+        columns = [cls.id] if field == 'id' else [column, cls.id]
+
+        return keyset_paginate(query, columns, cursor, limit, descending)
+
+    def get_accessible_project_ids(self):
+        """
+        get the ids of the projects this user can see.
+        admins and supervisors can see every project.
+
+        returns:
+            None if the user can see all projects, else a set of project ids
+        """
+        return self.accessible_project_ids_for(self.id, self.role)
+
+    @classmethod
+    def accessible_project_ids_for(cls, user_id, role):
+        """
+        get_accessible_project_ids without needing the User row.
+        """
+        try:
+            if cls.role_has_permission(role, cls.ROLE_SUPERVISOR):
+                return None
+
+            from models.ProjectManagement.project import Project
+            from models.TaskManagement.task import Task
+
+            created = db.session.query(Project.id).filter(Project.created_by_id == user_id)
+            working_on = db.session.query(Task.project_id).filter(
+                (Task.assigned_to_id == user_id) | (Task.created_by_id == user_id)
+            )
+
+            return {row[0] for row in created.union(working_on).all()}
+        except Exception as e:
+            print(f"error getting accessible projects: {str(e)}")
+            return set()
+
     def to_dict(self):
         """
         convert user object to dictionary for API/JSON responses.
@@ -0,0 +1,139 @@
+"""
+slim read only stand in for the logged in user.
+
+Flask-Login calls the user loader on every request. instead of loading the
+whole User row each time we keep a small UserPrincipal (id, role, verified,
+display name) in a process wide cache for a short time. routes that change
+users call invalidate() so role changes show up straight away in this
+process, the TTL bounds how stale another worker process can be.
+
+anything that needs to change the user loads the real row with get_user().
+"""
+import threading
+import time
+
+from models.database import db
+
+
+class UserPrincipal:
+    """
+    immutable snapshot of the fields the app checks on every request.
+    """
+
+    __slots__ = ('id', 'username', 'role', 'is_verified', 'display_name')
+
+    def __init__(self, id, username, role, is_verified, display_name):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'role', role)
+        object.__setattr__(self, 'is_verified', is_verified)
+        object.__setattr__(self, 'display_name', display_name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserPrincipal is read only, change the User and invalidate the cache")
+
+    def __repr__(self):
+        return f"<UserPrincipal {self.id} {self.username} ({self.role})>"
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role, bool(user.is_verified), user.get_full_name())
+
+    # Flask-Login interface
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_active(self):
+        return self.is_verified
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    # same permission checks as User
+    def get_full_name(self):
+        return self.display_name
+
+    def has_permission(self, required_role):
+        from models.UserManagement.user import User
+        return User.role_has_permission(self.role, required_role)
+
+    def can_manage_users(self):
+        from models.UserManagement.user import User
+        return self.role in [User.ROLE_ADMIN, User.ROLE_SUPERVISOR]
+
+    def can_assign_roles(self):
+        from models.UserManagement.user import User
+        return self.role == User.ROLE_ADMIN
+
+    def get_accessible_project_ids(self):
+        from models.UserManagement.user import User
+        return User.accessible_project_ids_for(self.id, self.role)
+
+    def get_user(self):
+        """load the full User row, for changing it."""
+        from models.UserManagement.user import User
+        return db.session.get(User, self.id)
+
+
+class PrincipalCache:
+    """
+    small thread safe TTL cache of UserPrincipal by user id.
+    """
+
+    def __init__(self, ttl=30.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """
+        get the principal for a user, loading it when missing or expired.
+        returns:
+            UserPrincipal or None if the user does not exist
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        principal = self._load(user_id)
+        if principal is None:
+            return None
+
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # drop the expired ones, and if that is not enough start over
+                self._entries = {key: value for key, value in self._entries.items() if value[1] > now}
+                if len(self._entries) >= self.max_size:
+                    self._entries.clear()
+            self._entries[user_id] = (principal, now + self.ttl)
+        return principal
+
+    def _load(self, user_id):
+        from models.UserManagement.user import User
+        user = db.session.get(User, user_id)
+        return UserPrincipal.from_user(user) if user else None
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
@@ -8,5 +8,11 @@ from models.DocumentFileManagement.file_version import FileVersion
 from models.TaskManagement.task import Task
 from models.AnalysisandReporting.report import Report
 from models.Communication.message import Message
+from models.Communication.notification import Notification
+from models.Communication.notification_archive import NotificationArchive
+from models.Communication.email_outbox import OutboxEmail
+from models.Communication.conversation_read_state import ConversationReadState
+from models.Communication.inbox_entry import InboxEntry
+from models.Communication.message_attachment import MessageAttachment
 
-__all__ = ['db', 'init_db', 'User', 'AuthToken', 'Project', 'Milestone', 'File', 'FileVersion', 'Task', 'Report', 'Message']
+__all__ = ['db', 'init_db', 'User', 'AuthToken', 'Project', 'Milestone', 'File', 'FileVersion', 'Task', 'Report', 'Message', 'Notification', 'NotificationArchive', 'OutboxEmail', 'ConversationReadState', 'InboxEntry', 'MessageAttachment']
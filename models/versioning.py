@@ -0,0 +1,123 @@
+"""
+row versions for cache validation.
+
+models that use VersionedMixin get two columns:
+
+updated_at  - when the row last changed
+row_version - bumped by one on every UPDATE
+
+both are kept up to date by a before_update listener, so normal ORM code
+does not have to think about them. bulk query.update() calls skip mapper
+events and must bump them themselves, see version_bump_values().
+
+project_version_stamp() folds the versions of a project and everything
+in it into one short string. pages built only from that data can use it
+as an ETag and answer If-None-Match with 304 without rendering.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from sqlalchemy import event, func, select, true
+
+from models.database import db
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class VersionedMixin:
+    """adds updated_at / row_version to a model."""
+
+    updated_at = db.Column(db.DateTime, default=_utcnow)
+    row_version = db.Column(db.Integer, nullable=False, default=1)
+
+    def version_tag(self):
+        """short tag of this one row, changes whenever the row does."""
+        return f"{self.__tablename__}:{self.id}:{self.row_version or 0}"
+
+
+@event.listens_for(VersionedMixin, 'before_update', propagate=True)
+def _bump_row_version(mapper, connection, target):
+    # before_update also fires for rows that are dirty with no real change,
+    # e.g. a column set to the value it already had
+    if not db.session.is_modified(target, include_collections=False):
+        return
+    target.updated_at = _utcnow()
+    target.row_version = (target.row_version or 0) + 1
+
+
+def version_bump_values(model):
+    """
+    extra values for query.update() so bulk updates move the versions too.
+    """
+    return {model.updated_at: _utcnow(), model.row_version: model.row_version + 1}
+
+
+def ensure_version_columns(*models):
+    """
+    add updated_at / row_version to tables made before they existed.
+    returns:
+        names of the tables that were changed
+    """
+    changed = []
+    for model in models:
+        table = model.__tablename__
+        try:
+            columns = {column['name'] for column in db.inspect(db.engine).get_columns(table)}
+            with db.engine.begin() as connection:
+                if 'updated_at' not in columns:
+                    connection.execute(db.text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP"))
+                if 'row_version' not in columns:
+                    connection.execute(db.text(
+                        f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1"))
+            if 'updated_at' not in columns or 'row_version' not in columns:
+                changed.append(table)
+        except Exception as e:
+            print(f"error adding version columns to {table}: {e}")
+    return changed
+
+
+def _aggregate(model, project_column, project_id):
+    """count, max id, sum of versions and last change of one project's rows."""
+    return (
+        select(func.count(model.id),
+               func.max(model.id),
+               func.coalesce(func.sum(model.row_version), 0),
+               func.max(model.updated_at))
+        .where(project_column == project_id)
+        .subquery()
+    )
+
+
+def project_version_stamp(project_id):
+    """
+    one string that changes whenever the project, or any of its tasks,
+    milestones, files or reports is added, changed or deleted.
+
+    the count and max id catch inserts and deletes, the version sum and
+    last updated_at catch updates. it is all one SELECT.
+    returns:
+        hex digest, or None when the project does not exist
+    """
+    from models.AnalysisandReporting.report import Report
+    from models.DocumentFileManagement.file import File
+    from models.ProjectManagement.milestone import Milestone
+    from models.ProjectManagement.project import Project
+    from models.TaskManagement.task import Task
+
+    parts = [
+        _aggregate(Project, Project.id, project_id),
+        _aggregate(Task, Task.project_id, project_id),
+        _aggregate(Milestone, Milestone.project_id, project_id),
+        _aggregate(File, File.projectId, project_id),
+        _aggregate(Report, Report.project_id, project_id),
+    ]
+    # every part is a single row, join them side by side
+    joined = parts[0]
+    for part in parts[1:]:
+        joined = joined.join(part, true())
+    row = db.session.execute(select(*parts).select_from(joined)).one()
+    if not row[0]:
+        return None
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:20]
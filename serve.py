@@ -0,0 +1,36 @@
+"""
+serve CMT with gevent.
+
+`python app.py` is werkzeug's development server, one OS thread per
+request, so every open long poll (/messages/<id>/poll and
+/project/<id>/channel/poll) holds a thread for up to LONGPOLL_TIMEOUT
+seconds. here the standard library is monkey patched first, so requests
+are greenlets and a poll waiting in utils/message_waiters costs a greenlet
+instead. LONGPOLL_MAX_WAITERS can be raised a lot when serving this way.
+
+gevent is optional, install it to use this:
+
+    pip install gevent
+    python serve.py        # HOST / PORT, default 127.0.0.1:5000
+"""
+from gevent import monkey
+
+monkey.patch_all()  # before anything imports socket or threading
+
+import os  # noqa: E402
+
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+from app import CMTApp  # noqa: E402
+
+
+def main():
+    cmt = CMTApp()
+    host = os.environ.get('HOST', '127.0.0.1')
+    port = int(os.environ.get('PORT', 5000))
+    print(f"serving CMT with gevent on http://{host}:{port}")
+    WSGIServer((host, port), cmt.app).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
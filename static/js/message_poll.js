@@ -0,0 +1,75 @@
+// long poll an open conversation (or project channel) and add the messages
+// that arrive, see CMTApp.poll_conversation / poll_project_channel.
+// the list needs data-poll-url and data-last-id (newest messageID shown).
+
+document.addEventListener('DOMContentLoaded', () => {
+  const list = document.getElementById('message-list');
+  if (!list || !list.dataset.pollUrl) {
+    return;
+  }
+
+  let lastId = parseInt(list.dataset.lastId || '0', 10);
+  let failures = 0;
+  // Retry-After of a refused poll, in ms
+  let retryAfter = 0;
+
+  const paragraph = (...children) => {
+    const p = document.createElement('p');
+    children.forEach(child => p.append(child));
+    return p;
+  };
+
+  const render = (message) => {
+    const item = document.createElement('div');
+    const sender = document.createElement('strong');
+    sender.textContent = message.sender_name || '';
+    const time = document.createElement('small');
+    time.textContent = ' ' + (message.timestamp || '');
+    item.append(paragraph(sender, time));
+    item.append(paragraph(message.content));
+
+    message.attachments.forEach(file => {
+      const link = document.createElement('a');
+      link.href = file.url;
+      link.textContent = file.name;
+      item.append(paragraph(link));
+    });
+    return item;
+  };
+
+  const poll = () => {
+    const url = new URL(list.dataset.pollUrl, window.location.origin);
+    url.searchParams.set('after', lastId);
+
+    fetch(url, { credentials: 'same-origin' })
+      .then(response => {
+        if (!response.ok) {
+          retryAfter = 1000 * (parseInt(response.headers.get('Retry-After') || '0', 10) || 0);
+          throw new Error(response.status);
+        }
+        return response.json();
+      })
+      .then(data => {
+        if (data.messages.length) {
+          const empty = list.querySelector('.no-messages');
+          if (empty) {
+            empty.remove();
+          }
+        }
+        data.messages.forEach(message => list.append(render(message)));
+        lastId = data.last_id;
+        failures = 0;
+        // messages: ask again at once. empty: the server timed out the
+        // wait, give it a moment before the next one
+        setTimeout(poll, data.messages.length ? 0 : 1000);
+      })
+      .catch(() => {
+        // server busy, restarting or offline, back off up to 30 seconds
+        failures += 1;
+        setTimeout(poll, Math.max(retryAfter, Math.min(30000, 1000 * 2 ** failures)));
+        retryAfter = 0;
+      });
+  };
+
+  poll();
+});
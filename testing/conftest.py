@@ -73,4 +73,38 @@ def other_user(test_app):
         db.session.commit()
         # Refresh the user to avoid detached instance errors
         db.session.refresh(user)
-        return user
\ No newline at end of file
+        return user
+
+
+@pytest.fixture
+def project(test_app, fresh_user):
+    """create a project owned by fresh_user."""
+    with test_app.app_context():
+        from datetime import date
+        from models.ProjectManagement.project import Project
+        project = Project(
+            project_name="Test project",
+            description="",
+            start_date=date.today(),
+            created_by_id=fresh_user.id
+        )
+        db.session.add(project)
+        db.session.commit()
+        db.session.refresh(project)
+        return project
+
+
+@pytest.fixture
+def send_message(test_app):
+    """return a helper that commits a direct message from sender to receiver."""
+    from models.Communication.message import Message
+
+    def send(sender, receiver, content, project_id=None, read=False):
+        message = Message(sender_id=sender.id, receiver_id=receiver.id, message_content=content,
+                          project_id=project_id)
+        message.isRead = read
+        db.session.add(message)
+        db.session.commit()
+        return message
+
+    return send
@@ -0,0 +1,69 @@
+"""
+covers the /api/v1 helpers:
+
+     utils.api_serializer  parse_fields / parse_include / serialize
+     utils.compression     choose_encoding / compress_response
+"""
+from __future__ import annotations
+
+import gzip
+from datetime import date
+from types import SimpleNamespace
+
+from flask import Response
+from werkzeug.datastructures import MultiDict
+
+from utils.api_serializer import parse_fields, parse_include, serialize
+from utils.compression import choose_encoding, compress_response
+
+
+def test_fields_default_to_everything():
+    fields = parse_fields(MultiDict(), "milestones")
+    assert fields[0] == "id"
+    assert "completion_percentage" in fields
+
+
+def test_sparse_fieldset_keeps_id_and_drops_unknown():
+    args = MultiDict({"fields": "title,password_hash,status"})
+    assert parse_fields(args, "tasks") == ["id", "title", "status"]
+
+
+def test_included_resource_only_reads_its_own_fieldset():
+    args = MultiDict({"fields": "project_name", "fields[tasks]": "status"})
+    assert parse_fields(args, "projects") == ["id", "project_name"]
+    assert parse_fields(args, "tasks", primary=False) == ["id", "status"]
+    assert "title" in parse_fields(MultiDict({"fields": "project_name"}), "tasks", primary=False)
+
+
+def test_parse_include_ignores_unknown_relationships():
+    args = MultiDict({"include": "tasks, users,milestones"})
+    assert parse_include(args, "projects") == ["tasks", "milestones"]
+    assert parse_include(args, "tasks") == []
+
+
+def test_serialize_formats_dates():
+    row = SimpleNamespace(id=3, title="Ship it", due_date=date(2025, 1, 31))
+    assert serialize(row, "tasks", ["id", "title", "due_date"]) == {
+        "id": 3, "title": "Ship it", "due_date": "2025-01-31"
+    }
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("") is None
+
+
+def test_compress_response_gzip_round_trip():
+    body = '{"data": "' + "x" * 2000 + '"}'
+    response = compress_response(Response(body, mimetype="application/json"), "gzip", min_size=100)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()).decode() == body
+
+
+def test_small_or_binary_responses_are_left_alone():
+    small = compress_response(Response("{}", mimetype="application/json"), "gzip", min_size=100)
+    assert "Content-Encoding" not in small.headers
+
+    binary = compress_response(Response(b"\x00" * 5000, mimetype="application/pdf"), "gzip", min_size=100)
+    assert "Content-Encoding" not in binary.headers
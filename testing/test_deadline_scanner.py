@@ -0,0 +1,47 @@
+"""
+covers Notification.create_deadline_notifications:
+
+     only unfinished, assigned tasks inside the window are notified
+     a second run does not notify the same task again
+     batches smaller than the number of due tasks still see every task
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+# long before the real date: tasks other tests leave due soon are out of the
+# window, and reminders sent today still count as already sent
+TODAY = date(2001, 3, 10)
+
+from models.Communication.notification import Notification
+from models.database import db
+from models.TaskManagement.task import Task
+
+
+def _task(project, user, title, due_in, status=Task.STATUS_NOT_BEGUN, assigned=True):
+    task = Task(title=title, project_id=project.id, status=status,
+                due_date=TODAY + timedelta(days=due_in),
+                assigned_to_id=user.id if assigned else None)
+    db.session.add(task)
+    return task
+
+
+def test_deadline_scan_notifies_once(test_app, fresh_user, project):
+    with test_app.app_context():
+        due = [_task(project, fresh_user, f"due {n}", n % 3) for n in range(5)]
+        _task(project, fresh_user, "later", 30)
+        _task(project, fresh_user, "done", 0, status=Task.STATUS_FINISHED)
+        _task(project, fresh_user, "nobody", 0, assigned=False)
+        db.session.commit()
+
+        def project_notifications():
+            return Notification.query.filter_by(
+                project_id=project.id, notification_type=Notification.TYPE_DEADLINE_APPROACHING).all()
+
+        Notification.create_deadline_notifications(window_days=2, batch_size=2, today=TODAY)
+        notified = project_notifications()
+        assert sorted(n.task_id for n in notified) == sorted(task.id for task in due)
+        assert {n.user_id for n in notified} == {fresh_user.id}
+
+        Notification.create_deadline_notifications(window_days=2, batch_size=2, today=TODAY)
+        assert len(project_notifications()) == len(due)
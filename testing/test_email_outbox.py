@@ -0,0 +1,157 @@
+"""
+covers the email outbox and its SMTP sender:
+
+     one SMTP connection per batch, sent bodies are cleared
+     a refused email is retried with backoff, then given up
+     an unreachable server stops the batch without using attempts
+     emails queued in a rolled back transaction are never sent
+     end to end against a local aiosmtpd sink (skipped without aiosmtpd)
+"""
+from __future__ import annotations
+
+import smtplib
+import socket
+from datetime import datetime, timezone
+
+import pytest
+
+from models.Communication.email_outbox import OutboxEmail
+from models.Communication.email_service import EmailService
+from models.database import db
+
+
+class FakeSMTP:
+    """records what would have gone over the wire."""
+
+    opened = 0
+    delivered = []
+    refused = set()
+    down = False
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.opened += 1
+        if FakeSMTP.down:
+            raise ConnectionRefusedError("connection refused")
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, message):
+        if message['To'] in FakeSMTP.refused:
+            raise smtplib.SMTPRecipientsRefused({message['To']: (550, b'no such user')})
+        FakeSMTP.delivered.append(message['To'])
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fake_smtp():
+    FakeSMTP.opened = 0
+    FakeSMTP.delivered = []
+    FakeSMTP.refused = set()
+    FakeSMTP.down = False
+    return FakeSMTP
+
+
+def _service(smtp_factory, **settings):
+    return EmailService(server='localhost', port=25, use_tls=False, smtp_factory=smtp_factory, **settings)
+
+
+def test_one_connection_per_batch(test_app, fake_smtp):
+    with test_app.app_context():
+        service = _service(fake_smtp, batch_size=10)
+        for n in range(25):
+            service.queue_email(f"user{n}@example.com", "hello", "body")
+        db.session.commit()
+
+        assert service.deliver_all() == {'sent': 25, 'failed': 0, 'deferred': 0}
+        assert fake_smtp.opened == 3
+        assert len(fake_smtp.delivered) == 25
+        assert OutboxEmail.query.filter_by(status=OutboxEmail.STATUS_PENDING).count() == 0
+        assert OutboxEmail.query.filter(OutboxEmail.status == OutboxEmail.STATUS_SENT,
+                                        OutboxEmail.body != '').count() == 0
+
+
+def test_refused_email_backs_off_then_fails(test_app, fake_smtp):
+    with test_app.app_context():
+        fake_smtp.refused = {"bounce@example.com"}
+        service = _service(fake_smtp, max_attempts=2)
+        email = service.queue_email("bounce@example.com", "hello", "body")
+        db.session.commit()
+
+        assert service.deliver_pending() == {'sent': 0, 'failed': 1, 'deferred': 0}
+        db.session.refresh(email)
+        assert email.status == OutboxEmail.STATUS_PENDING
+        assert email.attempts == 1
+        assert service.deliver_pending() == {'sent': 0, 'failed': 0, 'deferred': 0}  # not due yet
+
+        email.next_attempt_at = datetime.now(timezone.utc)
+        db.session.commit()
+        service.deliver_pending()
+        db.session.refresh(email)
+        assert email.status == OutboxEmail.STATUS_FAILED
+
+
+def test_unreachable_server_keeps_attempts(test_app, fake_smtp):
+    with test_app.app_context():
+        fake_smtp.down = True
+        service = _service(fake_smtp, batch_size=10)
+        emails = [service.queue_email(f"wait{n}@example.com", "hello", "body") for n in range(25)]
+        db.session.commit()
+
+        assert service.deliver_all() == {'sent': 0, 'failed': 0, 'deferred': 10}
+        assert fake_smtp.opened == 1
+        for email in emails:
+            db.session.refresh(email)
+        assert {(email.status, email.attempts) for email in emails} == {(OutboxEmail.STATUS_PENDING, 0)}
+
+        fake_smtp.down = False
+        OutboxEmail.query.filter(OutboxEmail.id.in_([email.id for email in emails])).update(
+            {OutboxEmail.next_attempt_at: datetime.now(timezone.utc)}, synchronize_session=False)
+        db.session.commit()
+        assert service.deliver_all()['sent'] == 25
+
+
+def test_rolled_back_email_is_not_sent(test_app, fake_smtp):
+    with test_app.app_context():
+        service = _service(fake_smtp)
+        service.queue_email("ghost@example.com", "hello", "body")
+        db.session.rollback()
+
+        service.deliver_pending()
+        assert "ghost@example.com" not in fake_smtp.delivered
+
+
+def test_delivery_to_local_smtp_sink(test_app):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    received = []
+
+    class Sink:
+        async def handle_DATA(self, server, session, envelope):
+            received.append(envelope.rcpt_tos[0])
+            return '250 OK'
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    controller = controller_module.Controller(Sink(), hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        with test_app.app_context():
+            service = EmailService(server='127.0.0.1', port=port, use_tls=False)
+            for n in range(3):
+                service.queue_email(f"sink{n}@example.com", "hello", "body")
+            db.session.commit()
+
+            assert service.deliver_all()['sent'] == 3
+            assert service.connections == 1
+    finally:
+        controller.stop()
+
+    assert sorted(received) == [f"sink{n}@example.com" for n in range(3)]
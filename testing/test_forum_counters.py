@@ -0,0 +1,80 @@
+"""
+covers the denormalised forum counters and paging:
+
+     ForumReply insert / delete keeps reply_count and last_reply_at right
+     ForumPost.recount_replies repairs the counters
+     ForumPost.get_forum_posts_page pages newest first
+     ForumPost.get_replies_page pages a thread oldest first
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from models.database import db
+from models.Forum import ForumPost, ForumReply
+
+
+def test_reply_events_keep_counters(test_app, fresh_user, project):
+    with test_app.app_context():
+        post = ForumPost(user_id=fresh_user.id, title="Q", content="?", project_id=project.id)
+        db.session.add(post)
+        db.session.commit()
+
+        replies = [ForumReply(post.postID, fresh_user.id, f"answer {n}") for n in range(3)]
+        for n, reply in enumerate(replies):
+            reply.replyTime = datetime(2024, 1, 1) + timedelta(minutes=n)
+        db.session.add_all(replies)
+        db.session.commit()
+
+        post = db.session.get(ForumPost, post.postID)
+        assert post.get_reply_count() == 3
+        assert post.last_reply_at == datetime(2024, 1, 1, 0, 2)
+
+        db.session.delete(replies[2])
+        db.session.commit()
+        post = db.session.get(ForumPost, post.postID)
+        assert post.reply_count == 2
+        assert post.last_reply_at == datetime(2024, 1, 1, 0, 1)
+
+        post.reply_count = 99
+        db.session.commit()
+        ForumPost.recount_replies()
+        assert db.session.get(ForumPost, post.postID).reply_count == 2
+
+
+def test_forum_posts_page_is_newest_first(test_app, fresh_user, project):
+    with test_app.app_context():
+        for n in range(5):
+            post = ForumPost(user_id=fresh_user.id, title=f"post {n}", content="x", project_id=project.id)
+            post.postTime = datetime(2024, 1, 1) + timedelta(hours=n)
+            db.session.add(post)
+        db.session.commit()
+
+        first, cursor = ForumPost.get_forum_posts_page(project.id, limit=3)
+        second, last_cursor = ForumPost.get_forum_posts_page(project.id, cursor, limit=3)
+
+        assert [p.title for p in first] == ["post 4", "post 3", "post 2"]
+        assert [p.title for p in second] == ["post 1", "post 0"]
+        assert last_cursor is None
+
+
+def test_replies_page_and_cache_version(test_app, fresh_user):
+    with test_app.app_context():
+        post = ForumPost(user_id=fresh_user.id, title="thread", content="x")
+        db.session.add(post)
+        db.session.commit()
+        before = post.cache_version()
+
+        for n in range(5):
+            reply = ForumReply(post.postID, fresh_user.id, f"reply {n}")
+            reply.replyTime = datetime(2024, 1, 1) + timedelta(minutes=n)
+            db.session.add(reply)
+        db.session.commit()
+
+        post = db.session.get(ForumPost, post.postID)
+        first, cursor = post.get_replies_page(limit=3)
+        rest, _ = post.get_replies_page(cursor, limit=3)
+
+        assert [r.content for r in first] == ["reply 0", "reply 1", "reply 2"]
+        assert [r.content for r in rest] == ["reply 3", "reply 4"]
+        assert post.cache_version() != before
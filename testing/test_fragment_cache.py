@@ -0,0 +1,86 @@
+"""
+covers utils.fragment_cache:
+
+     {% cache %} serves the stored html until its namespace is bumped
+     key parts give separate entries
+     a fragment keyed on the project version stamp sees bulk updates
+     the tag still renders with no cache attached
+"""
+from __future__ import annotations
+
+from jinja2 import Environment
+
+from models.database import db
+from models.TaskManagement.task import Task
+from models.versioning import project_version_stamp
+from utils.fragment_cache import FragmentCache, FragmentCacheExtension, MemoryBackend
+
+TEMPLATE = "{% cache 'rows', 'projects', page %}{{ rows() }}{% endcache %}"
+
+
+def _env(cache):
+    env = Environment(extensions=[FragmentCacheExtension])
+    env.fragment_cache = cache
+    return env
+
+
+def _counter():
+    calls = []
+
+    def rows():
+        calls.append(1)
+        return f"render {len(calls)}"
+
+    return rows, calls
+
+
+def test_cached_until_namespace_bumped():
+    cache = FragmentCache(MemoryBackend())
+    template = _env(cache).from_string(TEMPLATE)
+    rows, calls = _counter()
+
+    assert template.render(rows=rows, page=1) == "render 1"
+    assert template.render(rows=rows, page=1) == "render 1"
+    assert len(calls) == 1
+
+    cache.invalidate("projects")
+    assert template.render(rows=rows, page=1) == "render 2"
+
+    cache.invalidate("files")  # unrelated namespace
+    assert template.render(rows=rows, page=1) == "render 2"
+
+
+def test_key_parts_are_separate_entries():
+    template = _env(FragmentCache(MemoryBackend())).from_string(TEMPLATE)
+    rows, calls = _counter()
+
+    template.render(rows=rows, page=1)
+    template.render(rows=rows, page=2)
+
+    assert len(calls) == 2
+
+
+def test_disabled_or_missing_cache_always_renders():
+    rows, calls = _counter()
+    _env(FragmentCache(enabled=False)).from_string(TEMPLATE).render(rows=rows, page=1)
+    _env(FragmentCache(enabled=False)).from_string(TEMPLATE).render(rows=rows, page=1)
+    Environment(extensions=[FragmentCacheExtension]).from_string(TEMPLATE).render(rows=rows, page=1)
+
+    assert len(calls) == 3
+
+
+def test_version_stamp_key_sees_bulk_update(test_app, project):
+    with test_app.app_context():
+        task = Task(title="bulk", project_id=project.id)
+        db.session.add(task)
+        db.session.commit()
+        template = _env(FragmentCache(MemoryBackend())).from_string(
+            "{% cache 'dashboard', 'project:' ~ project_id, version %}{{ rows() }}{% endcache %}")
+        rows, calls = _counter()
+
+        template.render(rows=rows, project_id=project.id, version=project_version_stamp(project.id))
+        # query.update() fires no ORM events, nothing bumps project:<id>
+        Task.bulk_update([task.id], {'status': Task.STATUS_FINISHED}, notify=False)
+        template.render(rows=rows, project_id=project.id, version=project_version_stamp(project.id))
+
+        assert len(calls) == 2
@@ -0,0 +1,62 @@
+"""
+covers the materialised messages inbox:
+
+     sending updates both sides, unread only for the receiver
+     reading the conversation clears its unread count
+     the sidebar pages newest first
+     rebuild gives the same rows as the live updates
+"""
+from __future__ import annotations
+
+from models import InboxEntry
+from models.Communication.communication_facade import CommunicationFacade
+
+
+def _rows(user_id):
+    return [(e.peer_id, e.project_id, e.preview, e.unread_count)
+            for e in InboxEntry.query.filter_by(user_id=user_id).order_by(InboxEntry.id)]
+
+
+def test_send_updates_both_sides(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        InboxEntry.register_listeners()
+        send_message(fresh_user, other_user, "first")
+        send_message(fresh_user, other_user, "second")
+
+        assert _rows(fresh_user.id) == [(other_user.id, 0, "second", 0)]
+        assert _rows(other_user.id) == [(fresh_user.id, 0, "second", 2)]
+
+
+def test_reading_clears_unread(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        InboxEntry.register_listeners()
+        message = send_message(fresh_user, other_user, "read me")
+
+        CommunicationFacade().mark_conversation_as_read(other_user.id, fresh_user.id, message.messageID)
+        assert _rows(other_user.id) == [(fresh_user.id, 0, "read me", 0)]
+
+
+def test_sidebar_pages_newest_first(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        InboxEntry.register_listeners()
+        for project_id in (None, 1, 2):
+            send_message(other_user, fresh_user, f"project {project_id}", project_id=project_id)
+
+        facade = CommunicationFacade()
+        first, cursor = facade.get_inbox_page(fresh_user.id, limit=2)
+        assert [e.preview for e in first] == ["project 2", "project 1"]
+        rest, cursor = facade.get_inbox_page(fresh_user.id, cursor=cursor, limit=2)
+        assert [e.preview for e in rest] == ["project None"]
+        assert cursor is None
+
+
+def test_rebuild_matches_live_rows(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        InboxEntry.register_listeners()
+        send_message(fresh_user, other_user, "hello")
+        send_message(other_user, fresh_user, "hi back")
+        live = (_rows(fresh_user.id), _rows(other_user.id))
+
+        # rebuild writes every user's rows, only compare this test's two users
+        InboxEntry.rebuild()
+        assert (_rows(fresh_user.id), _rows(other_user.id)) == live
@@ -0,0 +1,78 @@
+"""
+covers long polling for new messages:
+
+     a notify from another thread wakes the waiter
+     nothing new returns empty after the timeout
+     past max_waiters a request is refused without a check
+     a committed message notifies its conversation, a rollback does not
+     only messages after the given id come back
+"""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from models import Message
+from models.Communication.communication_facade import CommunicationFacade
+from models.database import db
+from utils.message_waiters import MessageWaiters, WaitersFull, _Waiter, message_keys
+
+
+def test_notify_wakes_waiter():
+    waiters = MessageWaiters()
+    arrived = []
+    threading.Timer(0.05, lambda: (arrived.append("new"), waiters.notify("user:1"))).start()
+
+    result = waiters.wait_for(["user:1"], lambda: list(arrived), timeout=5, recheck_seconds=5)
+    assert result == ["new"]
+    assert waiters.stats()["waiting"] == 0
+
+
+def test_timeout_returns_empty():
+    waiters = MessageWaiters()
+    assert waiters.wait_for(["user:1"], lambda: [], timeout=0.05) == []
+
+
+def test_full_waiters_refused():
+    waiters = MessageWaiters(max_waiters=0)
+    calls = []
+    with pytest.raises(WaitersFull):
+        waiters.wait_for(["user:1"], lambda: calls.append(1), timeout=5)
+    assert calls == []
+    assert waiters.stats()["refused"] == 1
+
+
+def test_commit_notifies_conversation(test_app, fresh_user, other_user):
+    with test_app.app_context():
+        waiters = MessageWaiters()
+        waiters.register_listeners()
+        waiter = _Waiter([f"user:{other_user.id}"])
+        assert waiters._add(waiter)
+
+        message = Message(sender_id=fresh_user.id, receiver_id=other_user.id, message_content="dropped")
+        db.session.add(message)
+        db.session.flush()
+        db.session.rollback()
+        assert not waiter.event.is_set()
+
+        message = Message(sender_id=fresh_user.id, receiver_id=other_user.id, message_content="kept")
+        assert message_keys(message) == {f"user:{other_user.id}", f"user:{fresh_user.id}"}
+        db.session.add(message)
+        db.session.commit()
+        assert waiter.event.is_set()
+        waiters._discard(waiter)
+
+
+def test_messages_since_only_newer(test_app, fresh_user, other_user):
+    with test_app.app_context():
+        sent = []
+        for content in ("one", "two", "three"):
+            message = Message(sender_id=fresh_user.id, receiver_id=other_user.id, message_content=content)
+            db.session.add(message)
+            db.session.commit()
+            sent.append(message.messageID)
+
+        newer = CommunicationFacade().get_messages_since(other_user.id, sent[0], peer_id=fresh_user.id)
+        assert [m.content for m in newer] == ["two", "three"]
+        assert CommunicationFacade().get_messages_since(other_user.id, sent[-1], peer_id=fresh_user.id) == []
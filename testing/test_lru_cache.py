@@ -0,0 +1,30 @@
+"""
+covers utils.lru_cache.LRUCache.
+"""
+from __future__ import annotations
+
+from utils.lru_cache import LRUCache
+
+
+def test_least_recently_used_is_dropped():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now the most recent
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_delete_where():
+    cache = LRUCache()
+    for post_id in (1, 1, 2):
+        cache.set((post_id, len(cache)), "html")
+
+    cache.delete_where(lambda key: key[0] == 1)
+
+    assert len(cache) == 1
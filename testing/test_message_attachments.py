@@ -0,0 +1,136 @@
+"""
+covers message attachments:
+
+     uploads are read in chunks and the same bytes are stored once
+     a project reuses one File for every message attaching it
+     form uploads are parsed straight into the attachment store
+     direct message files stay out of the project's file list
+     only people in the conversation can open it
+     too large uploads and failed sends leave no files behind
+"""
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from models import File, Message, MessageAttachment
+from models.Communication.communication_facade import CommunicationFacade
+from models.Communication.message_attachment import CHUNK_SIZE, AttachmentError, AttachmentSpool
+from utils.uploads import UploadRequest
+
+
+class ChunkCheckingStream(io.BytesIO):
+    """fails the test if anyone reads the whole upload at once."""
+
+    def read(self, size=-1):
+        assert 0 < size <= CHUNK_SIZE
+        return super().read(size)
+
+
+def _upload(name, data):
+    return FileStorage(stream=ChunkCheckingStream(data), filename=name)
+
+
+@pytest.fixture
+def upload_folder(test_app, tmp_path):
+    test_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return tmp_path
+
+
+def _stored_files(folder):
+    return [name for _, _, names in os.walk(folder) for name in names]
+
+
+def test_same_bytes_stored_once(test_app, upload_folder, fresh_user, other_user, project):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+        body = b"meeting notes\n" * 10000
+
+        first = facade.send_channel_message(fresh_user.id, project.id, "notes",
+                                            attachments=[_upload("notes.txt", body)])
+        second = facade.send_channel_message(other_user.id, project.id, "same notes",
+                                             attachments=[_upload("copy.txt", body)])
+
+        assert [f.fileName for f in first.attachments] == ["notes.txt"]
+        assert [f.id for f in second.attachments] == [f.id for f in first.attachments]
+        assert File.query.filter_by(projectId=project.id).count() == 1
+        assert MessageAttachment.query.filter(
+            MessageAttachment.message_id.in_([first.messageID, second.messageID])).count() == 2
+        assert len(_stored_files(upload_folder / "attachments")) == 1
+
+
+def test_form_upload_parsed_into_the_store(test_app, upload_folder):
+    with test_app.app_context():
+        request = UploadRequest.from_values(method="POST", data={
+            "content": "hi", "attachments": (io.BytesIO(b"parsed once"), "plan.txt")})
+        request.upload_stream_factory = MessageAttachment.spool_factory()
+
+        upload = request.files["attachments"]
+        assert isinstance(upload.stream, AttachmentSpool)
+        assert os.path.dirname(upload.stream.path) == str(upload_folder / "attachments")
+
+        stored = MessageAttachment.store_upload(upload)
+        request.close()
+        with open(stored["path"], "rb") as handle:
+            assert handle.read() == b"parsed once"
+        assert _stored_files(upload_folder) == [os.path.basename(stored["path"])]
+
+
+def test_direct_message_files_are_not_listed(test_app, upload_folder, fresh_user, other_user, project):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+        direct = facade.send_direct_message(fresh_user.id, other_user.id, "private", project_id=project.id,
+                                            attachments=[_upload("secret.txt", b"just for you")])
+        channel = facade.send_channel_message(fresh_user.id, project.id, "for everyone",
+                                              attachments=[_upload("secret.txt", b"just for you")])
+
+        assert direct.attachments[0].message_only
+        listed, _ = File.get_files_page(project_id=project.id)
+        assert [f.id for f in listed] == [channel.attachments[0].id]
+
+
+def test_only_the_conversation_can_open(test_app, upload_folder, fresh_user, other_user, project):
+    with test_app.app_context():
+        message = CommunicationFacade().send_direct_message(
+            fresh_user.id, other_user.id, "private", project_id=project.id,
+            attachments=[_upload("secret.txt", b"just for you")])
+        file_id = message.attachments[0].id
+
+        assert MessageAttachment.user_can_access(fresh_user, file_id)
+        assert MessageAttachment.user_can_access(other_user, file_id)
+
+        path, mimetype = MessageAttachment.preview_path(message.attachments[0])
+        assert mimetype == "text/plain"
+        with open(path, "rb") as handle:
+            assert handle.read() == b"just for you"
+
+
+def test_too_large_upload_is_refused(test_app, upload_folder):
+    with test_app.app_context():
+        with pytest.raises(AttachmentError):
+            MessageAttachment.store_upload(_upload("big.txt", b"x" * (CHUNK_SIZE * 3)), max_bytes=CHUNK_SIZE)
+        assert _stored_files(upload_folder) == []
+
+
+def test_attachments_need_a_project(test_app, upload_folder, fresh_user, other_user):
+    with test_app.app_context():
+        message = CommunicationFacade().send_direct_message(
+            fresh_user.id, other_user.id, "no project", attachments=[_upload("a.txt", b"a")])
+        assert message is None
+        assert Message.query.filter_by(senderID=fresh_user.id, content="no project").first() is None
+        assert _stored_files(upload_folder) == []
+
+
+def test_failed_send_removes_stored_files(test_app, upload_folder, fresh_user, monkeypatch, project):
+    with test_app.app_context():
+        def broken_attach(*args, **kwargs):
+            raise RuntimeError("database went away")
+
+        monkeypatch.setattr(MessageAttachment, "attach", broken_attach)
+        message = CommunicationFacade().send_channel_message(
+            fresh_user.id, project.id, "lost", attachments=[_upload("b.txt", b"b")])
+        assert message is None
+        assert _stored_files(upload_folder) == []
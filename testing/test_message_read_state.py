@@ -0,0 +1,80 @@
+"""
+covers the read position of direct message conversations:
+
+     opening a conversation is one upsert, unread counts follow it
+     mark_as_read on a single message moves the position too
+     each project's conversation with a person has its own position
+     the migration keeps unread messages unread
+"""
+from __future__ import annotations
+
+from models import ConversationReadState
+from models.Communication.communication_facade import CommunicationFacade
+from models.database import db
+
+
+def test_unread_counts_follow_read_position(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+        messages = [send_message(fresh_user, other_user, f"msg {n}") for n in range(3)]
+
+        assert facade.count_unread_messages(other_user.id) == 3
+        assert facade.get_unread_counts_by_sender(other_user.id) == {fresh_user.id: 3}
+
+        assert facade.mark_conversation_as_read(other_user.id, fresh_user.id, messages[1].messageID)
+        assert facade.count_unread_messages(other_user.id) == 1
+        assert [m.messageID for m in facade.get_unread_messages(other_user.id)] == [messages[2].messageID]
+
+        assert ConversationReadState.query.filter_by(user_id=other_user.id).count() == 1
+
+
+def test_mark_as_read_moves_read_position(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        message = send_message(fresh_user, other_user, "msg")
+        message.mark_as_read()
+        db.session.commit()
+
+        key = ConversationReadState.direct_key(fresh_user.id)
+        assert ConversationReadState.watermark(other_user.id, key) == message.messageID
+        assert CommunicationFacade().count_unread_messages(other_user.id) == 0
+
+
+def test_read_position_per_project(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+        older = send_message(fresh_user, other_user, "older", project_id=1)
+        newer = send_message(fresh_user, other_user, "newer", project_id=2)
+
+        # opening project 2's thread leaves the older message about project 1 unread
+        assert facade.mark_conversation_as_read(other_user.id, fresh_user.id, newer.messageID, project_id=2)
+        assert [m.messageID for m in facade.get_unread_messages(other_user.id)] == [older.messageID]
+        assert ConversationReadState.watermark(
+            other_user.id, ConversationReadState.direct_key(fresh_user.id, 2)) == newer.messageID
+        assert ConversationReadState.watermark(
+            other_user.id, ConversationReadState.direct_key(fresh_user.id, 1)) == 0
+
+
+def test_migration_from_is_read(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        read = [send_message(fresh_user, other_user, f"read {n}", read=True) for n in range(2)]
+        for n in range(2):
+            send_message(fresh_user, other_user, f"unread {n}")
+        send_message(other_user, fresh_user, "reply", read=True)
+
+        def pair_rows():
+            rows = ConversationReadState.query.filter(
+                ConversationReadState.user_id.in_([fresh_user.id, other_user.id]),
+                ConversationReadState.peer_id.in_([fresh_user.id, other_user.id]))
+            return sorted((r.user_id, r.conversation_key, r.last_read_message_id) for r in rows)
+
+        ConversationReadState.migrate_from_is_read()
+        migrated = pair_rows()
+        assert len(migrated) == 2
+        ConversationReadState.migrate_from_is_read()
+        assert pair_rows() == migrated
+
+        key = ConversationReadState.direct_key(fresh_user.id)
+        assert ConversationReadState.watermark(other_user.id, key) == read[-1].messageID
+        facade = CommunicationFacade()
+        assert facade.count_unread_messages(other_user.id) == 2
+        assert facade.count_unread_messages(fresh_user.id) == 0
@@ -0,0 +1,80 @@
+"""
+covers notification coalescing and digests:
+
+     repeated task updates merge into one row with a counter
+     a different task gets its own row
+     roll_up_digests replaces old unread piles with one digest row
+     deadline reminders are not rolled up, so they are not sent again
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+from models import Notification, Task
+from models.database import db
+from utils.notification_facade import NotificationFacade
+
+
+def _task(project, owner, assignee, title):
+    task = Task(title=title, project_id=project.id, assigned_to_id=assignee.id, created_by_id=owner.id)
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+def test_task_updates_coalesce(test_app, fresh_user, other_user, project):
+    with test_app.app_context():
+        task = _task(project, fresh_user, other_user, "busy task")
+        facade = NotificationFacade(coalesce_seconds=900)
+
+        for _ in range(4):
+            facade.notify_task_updated(task, actor_id=fresh_user.id)
+
+        rows = Notification.query.filter_by(user_id=other_user.id).all()
+        assert len(rows) == 1
+        assert rows[0].event_count == 4
+        assert facade.count_unread_notifications(other_user.id) == 1
+
+        other = _task(project, fresh_user, other_user, "quiet task")
+        facade.notify_task_updated(other, actor_id=fresh_user.id)
+        assert facade.count_unread_notifications(other_user.id) == 2
+
+
+def test_digest_rollup(test_app, fresh_user):
+    with test_app.app_context():
+        old = datetime.now(timezone.utc) - timedelta(hours=3)
+        for n in range(4):
+            note = Notification(user_id=fresh_user.id, title=f"update {n}",
+                                notification_type=Notification.TYPE_PROJECT_UPDATED)
+            note.timestamp = old
+            db.session.add(note)
+        db.session.commit()
+
+        result = Notification.roll_up_digests(older_than_minutes=60, min_rows=3)
+        assert result == {'digests': 1, 'replaced': 4}
+
+        rows = Notification.query.filter_by(user_id=fresh_user.id).all()
+        assert len(rows) == 1
+        assert rows[0].event_count == 4
+        assert not rows[0].is_read
+
+
+def test_digest_leaves_deadline_reminders(test_app, fresh_user, project):
+    with test_app.app_context():
+        today = date(2001, 3, 10)
+        for n in range(3):
+            db.session.add(Task(title=f"due {n}", project_id=project.id, assigned_to_id=fresh_user.id,
+                                created_by_id=fresh_user.id, due_date=today))
+        db.session.commit()
+        Notification.create_deadline_notifications(window_days=2, today=today)
+
+        reminders = Notification.query.filter_by(user_id=fresh_user.id,
+                                                 notification_type=Notification.TYPE_DEADLINE_APPROACHING)
+        for note in reminders:
+            note.timestamp = datetime.now(timezone.utc) - timedelta(hours=3)
+        db.session.commit()
+
+        Notification.roll_up_digests(older_than_minutes=60, min_rows=3)
+        assert reminders.count() == 3
+        Notification.create_deadline_notifications(window_days=2, today=today)
+        assert reminders.count() == 3
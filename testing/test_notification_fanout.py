@@ -0,0 +1,35 @@
+"""
+covers NotificationFacade.fan_out / notify_project_members:
+
+     one notification per member, the sender left out
+     nobody left to notify creates nothing
+"""
+from __future__ import annotations
+
+from models import Notification, Task
+from models.database import db
+from utils.notification_facade import NotificationFacade
+
+
+def test_fan_out_to_project_members(test_app, fresh_user, other_user, project):
+    with test_app.app_context():
+        db.session.add(Task(title="work", project_id=project.id, assigned_to_id=other_user.id,
+                            created_by_id=fresh_user.id))
+        db.session.commit()
+
+        assert project.get_member_ids() == {fresh_user.id, other_user.id}
+
+        created = NotificationFacade().notify_project_members(project, "Milestone completed: M1",
+                                                              Notification.TYPE_MILESTONE_COMPLETED,
+                                                              exclude_user_id=fresh_user.id)
+        assert created == 1
+
+        rows = Notification.query.filter_by(project_id=project.id).all()
+        assert [(n.user_id, n.is_read) for n in rows] == [(other_user.id, False)]
+
+
+def test_fan_out_with_nobody_left_does_nothing(test_app, fresh_user):
+    with test_app.app_context():
+        facade = NotificationFacade()
+        assert facade.fan_out([fresh_user.id, None], "hi", Notification.TYPE_CUSTOM,
+                              exclude_user_id=fresh_user.id) == 0
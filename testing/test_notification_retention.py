@@ -0,0 +1,76 @@
+"""
+covers notification retention:
+
+     archive_read moves old read notifications, unread ones stay
+     enforce_user_cap keeps the newest rows in the hot table
+     enforce_user_cap archives read rows before unread ones
+     get_notifications_page walks the hot rows and then the archive
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from models import Notification, NotificationArchive
+from models.database import db
+from utils.notification_facade import NotificationFacade
+
+
+def _notes(user, count, days_old, read):
+    now = datetime.now(timezone.utc)
+    for n in range(count):
+        note = Notification(user_id=user.id, title=f"note {days_old} {n}",
+                            notification_type=Notification.TYPE_CUSTOM)
+        note.timestamp = now - timedelta(days=days_old, minutes=n)
+        note.is_read = read
+        db.session.add(note)
+    db.session.commit()
+
+
+def test_archive_read_keeps_unread(test_app, fresh_user):
+    with test_app.app_context():
+        _notes(fresh_user, 5, 200, read=True)
+        _notes(fresh_user, 2, 200, read=False)
+        _notes(fresh_user, 3, 1, read=True)
+
+        NotificationArchive.archive_read(older_than_days=90, batch_size=2)
+        assert Notification.query.filter_by(user_id=fresh_user.id).count() == 5
+        assert NotificationArchive.query.filter_by(user_id=fresh_user.id).count() == 5
+
+
+def test_user_cap_archives_read_first(test_app, fresh_user):
+    with test_app.app_context():
+        _notes(fresh_user, 3, 5, read=False)
+        _notes(fresh_user, 4, 1, read=True)
+
+        # the read rows are newer, they still go before any unread one
+        NotificationArchive.enforce_user_cap(max_per_user=4, batch_size=2)
+        hot = Notification.query.filter_by(user_id=fresh_user.id)
+        assert hot.count() == 4
+        assert hot.filter_by(is_read=False).count() == 3
+
+        # still over the cap with no read rows left: the oldest unread go
+        NotificationArchive.enforce_user_cap(max_per_user=2, batch_size=2)
+        assert [note.title for note in hot.order_by(Notification.timestamp)] == ["note 5 1", "note 5 0"]
+        assert NotificationArchive.query.filter_by(user_id=fresh_user.id, is_read=False).count() == 1
+
+
+def test_user_cap_and_paging_into_archive(test_app, other_user):
+    with test_app.app_context():
+        _notes(other_user, 10, 1, read=False)
+
+        # the cap runs over every user, so only look at other_user's rows
+        NotificationArchive.enforce_user_cap(max_per_user=4, batch_size=3)
+        assert Notification.query.filter_by(user_id=other_user.id).count() == 4
+        assert NotificationArchive.query.filter_by(user_id=other_user.id).count() == 6
+
+        facade = NotificationFacade()
+        seen, cursor = [], None
+        while True:
+            rows, cursor = facade.get_notifications_page(other_user.id, cursor, limit=3)
+            seen.extend(rows)
+            if not cursor:
+                break
+
+        assert len(seen) == 10
+        assert [getattr(row, 'archived', False) for row in seen] == [False] * 4 + [True] * 6
+        assert [row.timestamp for row in seen] == sorted((row.timestamp for row in seen), reverse=True)
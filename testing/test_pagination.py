@@ -0,0 +1,58 @@
+"""
+covers utils.pagination and the keyset paged listings:
+
+     encode_cursor / decode_cursor
+     parse_sort / parse_limit
+     User.get_users_page
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+
+from models.database import db
+from models.UserManagement.user import User
+from utils.pagination import decode_cursor, encode_cursor, parse_limit, parse_sort
+
+
+def test_cursor_round_trip_keeps_types():
+    values = [datetime(2024, 5, 1, 12, 30), date(2024, 5, 1), "abc", 42]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize("bad", [None, "", "not-a-cursor", "%%%"])
+def test_bad_cursor_is_ignored(bad):
+    assert decode_cursor(bad) is None
+
+
+def test_parse_sort_and_limit():
+    allowed = {"id": "id", "name": "project_name"}
+    assert parse_sort("-name", allowed, "-id") == ("name", True)
+    assert parse_sort("name", allowed, "-id") == ("name", False)
+    assert parse_sort("drop table", allowed, "-id") == ("id", True)
+
+    assert parse_limit("10") == 10
+    assert parse_limit("5000") == 100
+    assert parse_limit("-3") == 25
+    assert parse_limit(None) == 25
+
+
+def test_users_page_walks_every_row_once(test_app):
+    with test_app.app_context():
+        for i in range(7):
+            db.session.add(User(username=f"pageuser{i}",
+                                email=f"pageuser{i}@example.com",
+                                password="TestPass123",
+                                role=User.ROLE_TEAM_MEMBER))
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            users, cursor = User.get_users_page(cursor=cursor, limit=3, sort="username")
+            seen.extend(u.username for u in users)
+            if not cursor:
+                break
+
+        expected = [u.username for u in User.query.order_by(User.username, User.id).all()]
+        assert seen == expected
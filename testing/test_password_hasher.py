@@ -0,0 +1,70 @@
+"""
+covers the scrypt PasswordHasher:
+
+     hash / verify round trip
+     legacy sha256 hashes still work and ask for a rehash
+     admission control turns work away when the pool is full
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+
+import pytest
+
+from models.UserManagement.password_hasher import (
+    LEGACY_SALT,
+    PasswordHasher,
+    PasswordHasherBusy,
+)
+
+
+@pytest.fixture
+def hasher():
+    # cheap settings so the tests stay fast
+    h = PasswordHasher(n=2 ** 8, r=8, p=1, max_workers=1, max_queue=0, admission_timeout=0.05)
+    yield h
+    h.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    stored = hasher.hash("Secret123")
+    assert stored.startswith("scrypt$256$8$1$")
+    assert hasher.verify("Secret123", stored) == (True, False)
+    assert hasher.verify("wrong", stored) == (False, False)
+    assert hasher.hash("Secret123") != stored  # new salt every time
+
+
+def test_legacy_and_weaker_hashes_need_rehash(hasher):
+    legacy = hashlib.sha256(("Secret123" + LEGACY_SALT).encode()).hexdigest()
+    assert hasher.verify("Secret123", legacy) == (True, True)
+    assert hasher.verify("nope", legacy) == (False, True)
+
+    stronger = PasswordHasher(n=2 ** 9, max_workers=1)
+    try:
+        assert stronger.verify("Secret123", hasher.hash("Secret123")) == (True, True)
+    finally:
+        stronger.shutdown()
+
+
+def test_full_pool_rejects_and_counts(hasher):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+
+    worker = threading.Thread(target=hasher._run, args=(slow,))
+    worker.start()
+    started.wait(2)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("Secret123")
+    finally:
+        release.set()
+        worker.join()
+
+    stats = hasher.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 1
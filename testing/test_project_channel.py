@@ -0,0 +1,94 @@
+"""
+covers project channel messages:
+
+     a channel message is one row, whatever the project size
+     unread counts come from each member's read position
+     pages go back in time with a before_id cursor
+"""
+from __future__ import annotations
+
+from models import ConversationReadState, Message
+from models.Communication.communication_facade import CommunicationFacade
+from models.database import db
+
+
+def test_channel_message_stored_once(test_app, fresh_user, other_user, project):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+
+        message = facade.send_channel_message(fresh_user.id, project.id, "hello team")
+        assert message.is_channel_message
+        assert Message.query.filter_by(projectID=project.id).count() == 1
+
+        # the sender has read their own message, the other member has not
+        assert facade.count_channel_unread(fresh_user.id, project.id) == 0
+        assert facade.count_channel_unread(other_user.id, project.id) == 1
+
+
+def test_opening_channel_marks_it_read(test_app, fresh_user, other_user, project):
+    with test_app.app_context():
+        facade = CommunicationFacade()
+        for n in range(3):
+            facade.send_channel_message(fresh_user.id, project.id, f"update {n}")
+
+        messages, older = facade.get_channel_page(other_user.id, project.id)
+        assert [m.content for m in messages] == ["update 0", "update 1", "update 2"]
+        assert older is None
+        assert facade.count_channel_unread(other_user.id, project.id) == 0
+
+        key = ConversationReadState.channel_key(project.id)
+        assert ConversationReadState.watermark(other_user.id, key) == messages[-1].messageID
+        assert ConversationReadState.query.filter_by(user_id=other_user.id).count() == 1
+
+
+def test_read_position_never_moves_back(test_app, fresh_user):
+    with test_app.app_context():
+        key = ConversationReadState.channel_key(1)
+        ConversationReadState.mark_read(fresh_user.id, key, 10)
+        ConversationReadState.mark_read(fresh_user.id, key, 4)
+        db.session.commit()
+        assert ConversationReadState.watermark(fresh_user.id, key) == 10
+
+
+def test_channel_pages(test_app, fresh_user, project):
+    with test_app.app_context():
+        for n in range(5):
+            Message.post_to_channel(fresh_user.id, project.id, f"m{n}")
+
+        newest, older = Message.get_channel_page(project.id, limit=2)
+        assert [m.content for m in newest] == ["m3", "m4"]
+        middle, older = Message.get_channel_page(project.id, before_id=older, limit=2)
+        assert [m.content for m in middle] == ["m1", "m2"]
+        oldest, older = Message.get_channel_page(project.id, before_id=older, limit=2)
+        assert [m.content for m in oldest] == ["m0"]
+        assert older is None
+
+
+def test_old_schema_rebuilt_in_place(tmp_path):
+    """receiverID was NOT NULL before channels, other tables must still point at messages."""
+    from flask import Flask
+
+    app = Flask("cmt_old_schema")
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'old.db'}",
+                      SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE messages ("messageID" INTEGER PRIMARY KEY, "senderID" INTEGER NOT NULL, '
+                '"receiverID" INTEGER NOT NULL, "projectID" INTEGER, content TEXT NOT NULL, '
+                'timestamp DATETIME NOT NULL, "isRead" BOOLEAN NOT NULL)')
+            connection.exec_driver_sql("INSERT INTO messages VALUES (1, 1, 2, NULL, 'kept', '2024-01-01', 0)")
+        db.create_all()
+
+        assert Message.ensure_channel_support()
+        assert not Message.ensure_channel_support()
+
+        inspector = db.inspect(db.engine)
+        receiver = next(c for c in inspector.get_columns('messages') if c['name'] == 'receiverID')
+        assert receiver['nullable']
+        assert {fk['referred_table'] for fk in inspector.get_foreign_keys('message_attachments')} >= {'messages'}
+        assert 'messages_new' not in inspector.get_table_names()
+        assert {i['name'] for i in inspector.get_indexes('messages')} >= {'ix_messages_channel'}
+        assert db.session.get(Message, 1).content == 'kept'
+        db.session.remove()
@@ -7,6 +7,7 @@
 #           can_manage_users
 #           can_assign_roles         
 #          get_full_name
+#           bulk_set_role
 
 #      AuthToken
 #           generate_token /  validate_token
@@ -231,8 +232,25 @@ def test_invalid_role_defaults_to_team_member(test_app):
         assert u.role == User.ROLE_TEAM_MEMBER
 
 
+#  bulk role changes
+def test_bulk_set_role_updates_everyone(test_app, admin_user):
+    with test_app.app_context():
+        users = [_make_user(User.ROLE_TEAM_MEMBER) for _ in range(3)]
+
+        updated = User.bulk_set_role([u.id for u in users], User.ROLE_PROJECT_MANAGER)
 
+        assert updated == 3
+        roles = {role for (role,) in db.session.query(User.role).filter(User.id.in_([u.id for u in users]))}
+        assert roles == {User.ROLE_PROJECT_MANAGER}
 
 
+def test_bulk_set_role_keeps_an_admin(test_app, admin_user):
+    with test_app.app_context():
+        admin_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == User.ROLE_ADMIN)]
 
+        with pytest.raises(ValueError):
+            User.bulk_set_role(admin_ids, User.ROLE_TEAM_MEMBER)
+        with pytest.raises(ValueError):
+            User.bulk_set_role(admin_ids, "space_cadet")
 
+        assert db.session.get(User, admin_user.id).role == User.ROLE_ADMIN
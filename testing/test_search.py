@@ -0,0 +1,75 @@
+"""
+covers models.Search.search_service.SearchService:
+
+     tokenize
+     incremental indexing through the model events
+     BM25 ranking
+     permission filtering of direct messages
+"""
+from __future__ import annotations
+
+import pytest
+
+from models.database import db
+from models.Search import SearchDocument, SearchService
+
+
+@pytest.fixture(autouse=True)
+def search_listeners(test_app):
+    SearchService.register_listeners()
+    yield
+
+
+def test_tokenize_drops_stop_words_and_short_tokens():
+    assert SearchService.tokenize("The Flask app is a CMT, v2!") == ["flask", "app", "cmt", "v2"]
+    assert SearchService.tokenize("") == []
+    assert SearchService.tokenize(None) == []
+
+
+def test_new_message_is_indexed(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        msg = send_message(fresh_user, other_user, "deploy the staging server")
+
+        doc = SearchDocument.query.filter_by(entity_type=SearchDocument.TYPE_MESSAGE,
+                                             entity_id=msg.messageID).first()
+        assert doc is not None
+        assert doc.user_id == fresh_user.id
+        assert doc.peer_id == other_user.id
+
+
+def test_update_and_delete_keep_index_in_sync(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        msg = send_message(fresh_user, other_user, "zebra crossing")
+        assert SearchService.search("zebra", fresh_user)
+
+        msg.content = "giraffe crossing"
+        db.session.commit()
+        assert not SearchService.search("zebra", fresh_user)
+        assert SearchService.search("giraffe", fresh_user)
+
+        db.session.delete(msg)
+        db.session.commit()
+        assert not SearchService.search("giraffe", fresh_user)
+
+
+def test_bm25_ranks_more_relevant_first(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        weak = send_message(fresh_user, other_user, "quokka mentioned once in a long message about other things")
+        strong = send_message(fresh_user, other_user, "quokka quokka quokka")
+
+        results = SearchService.search("quokka", fresh_user)
+        assert [r["entity_id"] for r in results] == [strong.messageID, weak.messageID]
+
+
+def test_direct_messages_only_visible_to_participants(test_app, fresh_user, other_user, send_message):
+    with test_app.app_context():
+        send_message(fresh_user, other_user, "secret pangolin plan")
+
+        outsider = type(fresh_user)(username="outsider_search",
+                                    email="outsider_search@example.com",
+                                    password="TestPass123")
+        db.session.add(outsider)
+        db.session.commit()
+
+        assert SearchService.search("pangolin", other_user)
+        assert SearchService.search("pangolin", outsider) == []
@@ -0,0 +1,57 @@
+"""
+covers Task.bulk_update:
+
+     one UPDATE for many tasks
+     one aggregated notification per new assignee
+     validation of the changes
+"""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from models.Communication.notification import Notification
+from models.TaskManagement.task import Task
+
+
+def _tasks(project, count):
+    return [Task.create_task(title=f"task {n}", project_id=project.id) for n in range(count)]
+
+
+def test_bulk_update_changes_every_task(test_app, project):
+    with test_app.app_context():
+        tasks = _tasks(project, 4)
+        ids = [task.id for task in tasks[:3]]
+
+        updated = Task.bulk_update(ids, {"status": Task.STATUS_FINISHED, "due_date": date(2030, 1, 1)},
+                                   project_id=project.id)
+
+        assert updated == 3
+        statuses = {task.id: task.status for task in Task.query.filter_by(project_id=project.id)}
+        assert [statuses[i] for i in ids] == [Task.STATUS_FINISHED] * 3
+        assert statuses[tasks[3].id] == Task.STATUS_NOT_BEGUN
+
+
+def test_bulk_assign_sends_one_notification(test_app, other_user, project):
+    with test_app.app_context():
+        tasks = _tasks(project, 5)
+
+        Task.bulk_update([task.id for task in tasks], {"assigned_to_id": other_user.id},
+                         project_id=project.id)
+
+        notes = Notification.query.filter_by(user_id=other_user.id,
+                                             notification_type=Notification.TYPE_TASK_ASSIGNED).all()
+        assert len(notes) == 1
+        assert notes[0].title == "5 tasks assigned to you"
+        assert notes[0].project_id == project.id
+
+
+def test_bulk_update_rejects_bad_changes(test_app, project):
+    with test_app.app_context():
+        tasks = _tasks(project, 1)
+
+        with pytest.raises(ValueError):
+            Task.bulk_update([tasks[0].id], {"status": "nope"})
+        with pytest.raises(ValueError):
+            Task.bulk_update([tasks[0].id], {"title": "renamed"})
@@ -0,0 +1,72 @@
+"""
+covers bulk task import / export:
+
+     utils.task_transfer reading and writing
+     Task.validate_import_row
+     Task.bulk_import (all or nothing, skip bad rows)
+"""
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from models.TaskManagement.task import Task
+from utils import task_transfer
+
+
+def test_read_csv_and_jsonl_rows():
+    csv_data = b"title,status\nfirst,done\nsecond,not begun\n"
+    rows = list(task_transfer.read_task_rows(io.BytesIO(csv_data), "csv"))
+    assert rows == [(2, {"title": "first", "status": "done"}),
+                    (3, {"title": "second", "status": "not begun"})]
+
+    jsonl_data = b'{"title": "a"}\n\nnot json\n[1]\n'
+    rows = list(task_transfer.read_task_rows(io.BytesIO(jsonl_data), "jsonl"))
+    assert rows[0] == (1, {"title": "a"})
+    assert rows[1][0] == 3 and isinstance(rows[1][1], str)
+    assert rows[2] == (4, "each line must be a JSON object")
+
+
+def test_write_rows_csv():
+    out = "".join(task_transfer.write_rows([(1, "x", None)], ["id", "title", "due_date"], "csv"))
+    assert out.splitlines() == ["id,title,due_date", "1,x,"]
+
+
+def test_validate_import_row_reports_every_problem():
+    with pytest.raises(ValueError) as err:
+        Task.validate_import_row({"title": "", "status": "nope", "due_date": "tomorrow"})
+    message = str(err.value)
+    assert "title is required" in message
+    assert "status" in message
+    assert "due_date" in message
+
+    values = Task.validate_import_row({"title": " Write report ", "importance": "HIGH"})
+    assert values["title"] == "Write report"
+    assert values["importance"] == Task.IMPORTANCE_HIGH
+    assert values["status"] == Task.STATUS_NOT_BEGUN
+
+
+def test_bulk_import_is_all_or_nothing(test_app, fresh_user, project):
+    with test_app.app_context():
+        rows = [(2, {"title": "good"}), (3, {"title": "bad", "status": "nope"})]
+
+        imported, errors = Task.bulk_import(project.id, rows, created_by_id=fresh_user.id)
+
+        assert imported == 0
+        assert errors == [{"line": 3, "error": errors[0]["error"]}]
+        assert Task.query.filter_by(project_id=project.id).count() == 0
+
+
+def test_bulk_import_skip_invalid(test_app, fresh_user, project):
+    with test_app.app_context():
+        rows = [(n, {"title": f"task {n}"}) for n in range(2, 7)]
+        rows.append((7, "invalid JSON"))
+
+        imported, errors = Task.bulk_import(project.id, rows, created_by_id=fresh_user.id,
+                                            skip_invalid=True)
+
+        assert imported == 5
+        assert [err["line"] for err in errors] == [7]
+        exported = list(Task.iter_export_rows(project.id))
+        assert [row[1] for row in exported] == [f"task {n}" for n in range(2, 7)]
@@ -0,0 +1,66 @@
+"""
+covers the stateless signed token mode:
+
+     tokens carry the user id and are tied to one purpose
+     a reset token stops working once the password changed
+     tampered tokens are rejected
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from models.UserManagement.token_service import (
+    PURPOSE_RESET,
+    PURPOSE_VERIFY,
+    SignedTokenStore,
+    configure_token_store,
+)
+
+
+def _user(**overrides):
+    values = {"id": 7, "password_hash": "scrypt$abc", "is_verified": False}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture
+def store():
+    return SignedTokenStore("test-secret")
+
+
+def test_round_trip_and_purpose(store):
+    user = _user()
+    token = store.issue(user, PURPOSE_RESET)
+
+    assert store.peek_user_id(token, PURPOSE_RESET) == 7
+    assert store.peek_user_id(token, PURPOSE_VERIFY) is None
+    assert store.consume(user, token, PURPOSE_RESET)
+    assert not store.consume(_user(id=8), token, PURPOSE_RESET)
+
+
+def test_token_is_one_time_use(store):
+    user = _user()
+    reset = store.issue(user, PURPOSE_RESET)
+    verify = store.issue(user, PURPOSE_VERIFY)
+
+    user.password_hash = "scrypt$new"
+    user.is_verified = True
+
+    assert not store.consume(user, reset, PURPOSE_RESET)
+    assert not store.consume(user, verify, PURPOSE_VERIFY)
+
+
+def test_tampered_or_foreign_tokens_fail(store):
+    user = _user()
+    token = store.issue(user, PURPOSE_RESET)
+
+    assert store.peek_user_id(token[:-2] + "xx", PURPOSE_RESET) is None
+    assert SignedTokenStore("other-secret").peek_user_id(token, PURPOSE_RESET) is None
+    assert store.peek_user_id("garbage", PURPOSE_RESET) is None
+
+
+def test_configure_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        configure_token_store("cookies")
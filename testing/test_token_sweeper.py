@@ -0,0 +1,61 @@
+"""
+covers the expired token sweeper and the background scheduler:
+
+     AuthToken.sweep_expired deletes expired / invalidated tokens in batches
+     BackgroundScheduler runs jobs and records metrics
+"""
+from __future__ import annotations
+
+import threading
+
+from models.database import db
+from models.UserManagement.auth_token import AuthToken
+from utils.scheduler import BackgroundScheduler
+
+
+def test_sweep_removes_only_dead_tokens(test_app, fresh_user):
+    with test_app.app_context():
+        AuthToken.query.delete()
+        live = AuthToken.generate_token(fresh_user.id, AuthToken.TOKEN_TYPE_RESET, expiry_hours=1)
+        for _ in range(5):
+            AuthToken.generate_token(fresh_user.id, AuthToken.TOKEN_TYPE_VERIFY, expiry_hours=-1)
+        used = AuthToken.query.filter_by(token_type=AuthToken.TOKEN_TYPE_VERIFY).first()
+        used.invalidate()
+        db.session.commit()
+
+        result = AuthToken.sweep_expired(batch_size=2)
+
+        assert result["deleted"] == 5
+        assert result["batches"] == 3
+        assert result["remaining"] == 1
+        assert AuthToken.query.filter_by(token_value=live).count() == 1
+
+
+def test_sweep_respects_max_batches(test_app, fresh_user):
+    with test_app.app_context():
+        AuthToken.query.delete()
+        for _ in range(4):
+            AuthToken.generate_token(fresh_user.id, AuthToken.TOKEN_TYPE_VERIFY, expiry_hours=-1)
+
+        assert AuthToken.sweep_expired(batch_size=1, max_batches=2)["deleted"] == 2
+        assert AuthToken.query.count() == 2
+
+
+def test_scheduler_runs_jobs_and_keeps_metrics(test_app):
+    ran = threading.Event()
+    scheduler = BackgroundScheduler(test_app)
+    scheduler.add_job("ok", lambda: ran.set() or 7, interval=60, initial_delay=0)
+    scheduler.add_job("broken", lambda: 1 / 0, interval=60, initial_delay=60)
+
+    scheduler.start()
+    try:
+        assert ran.wait(2)
+    finally:
+        scheduler.stop()
+
+    assert scheduler.run_job("broken") is None
+    stats = scheduler.stats()
+    assert stats["ok"]["runs"] == 1
+    assert stats["ok"]["last_result"] == 7
+    assert stats["broken"]["failures"] == 1
+    assert "division" in stats["broken"]["last_error"]
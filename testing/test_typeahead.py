@@ -0,0 +1,51 @@
+"""
+covers utils.typeahead.PrefixIndex:
+
+     prefixes match any word of a name, each entry once
+     committed user changes update the index, rolled back ones do not
+"""
+from __future__ import annotations
+
+from models import User
+from models.database import db
+from utils.typeahead import PrefixIndex
+
+
+def _ids(results):
+    return [result['id'] for result in results]
+
+
+def test_prefix_matches_words():
+    index = PrefixIndex()
+    index._built = True  # nothing registered to load
+    index.put('user', 1, 'Alice Smith', 'alice', ['alice', 'Alice', 'Smith', 'Alice Smith'])
+    index.put('user', 2, 'Bob Alison', 'bob', ['bob', 'Bob', 'Alison', 'Bob Alison'])
+    index.put('project', 7, 'Alpha', 'active', ['Alpha'])
+
+    assert _ids(index.search('al')) == [1, 2, 7]
+    assert _ids(index.search('AL', kinds=('user',))) == [1, 2]
+    assert _ids(index.search('alice sm')) == [1]
+    assert _ids(index.search('al', accept=lambda kind, id: id != 1)) == [2, 7]
+    assert index.search('') == []
+
+    index.put('user', 2, 'Bob Brown', 'bob', ['bob', 'Bob', 'Brown', 'Bob Brown'])
+    index.remove('project', 7)
+    assert _ids(index.search('al')) == [1]
+
+
+def test_index_follows_commits(test_app, fresh_user):
+    with test_app.app_context():
+        index = PrefixIndex()
+        index.register_model(User, 'user', lambda user: (user.get_full_name(), user.username,
+                                                         [user.username, user.get_full_name()]))
+        user = db.session.get(User, fresh_user.id)
+        assert _ids(index.search(user.username)) == [user.id]
+
+        user.username = "zed_renamed"
+        db.session.commit()
+        assert _ids(index.search("zed_")) == [user.id]
+
+        user.username = "never_saved"
+        db.session.flush()
+        db.session.rollback()
+        assert index.search("never_") == []
@@ -0,0 +1,43 @@
+"""
+covers the cached UserPrincipal used by the Flask-Login user loader:
+
+     principal mirrors the user and is read only
+     cache hits skip the database, invalidate reloads
+"""
+from __future__ import annotations
+
+import pytest
+
+from models.database import db
+from models.UserManagement.user import User
+from models.UserManagement.user_principal import PrincipalCache, UserPrincipal
+
+
+def test_principal_mirrors_user(test_app, fresh_user):
+    with test_app.app_context():
+        user = db.session.get(User, fresh_user.id)
+        principal = UserPrincipal.from_user(user)
+
+        assert principal.get_id() == str(user.id)
+        assert principal.get_full_name() == user.get_full_name()
+        assert principal.can_manage_users() == user.can_manage_users()
+        assert principal.get_user().id == user.id
+        with pytest.raises(AttributeError):
+            principal.role = User.ROLE_ADMIN
+
+
+def test_cache_hits_and_invalidate(test_app, fresh_user):
+    with test_app.app_context():
+        cache = PrincipalCache(ttl=60)
+        first = cache.get(fresh_user.id)
+        assert cache.get(fresh_user.id) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        user = db.session.get(User, fresh_user.id)
+        user.role = User.ROLE_ADMIN
+        db.session.commit()
+        assert cache.get(fresh_user.id).role != User.ROLE_ADMIN  # still cached
+
+        cache.invalidate(fresh_user.id)
+        assert cache.get(fresh_user.id).role == User.ROLE_ADMIN
+        assert cache.get(999999) is None
@@ -0,0 +1,66 @@
+"""
+covers the row versions used for HTTP caching:
+
+     before_update bumps row_version / updated_at, but only on real changes
+     Task.bulk_update bumps the versions of every row it touches
+     project_version_stamp changes on insert, update and delete
+"""
+from __future__ import annotations
+
+from models.database import db
+from models.TaskManagement.task import Task
+from models.versioning import project_version_stamp
+
+
+def _task(project, user, title):
+    task = Task(title=title, project_id=project.id, created_by_id=user.id)
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+def test_row_version_moves_on_real_changes_only(test_app, fresh_user, project):
+    with test_app.app_context():
+        task = _task(project, fresh_user, "first")
+        assert task.row_version == 1
+        first_update = task.updated_at
+
+        task.title = task.title  # same value, nothing to write
+        db.session.commit()
+        assert task.row_version == 1
+
+        task.title = "renamed"
+        db.session.commit()
+        assert task.row_version == 2
+        assert task.updated_at >= first_update
+
+
+def test_bulk_update_bumps_versions(test_app, fresh_user, project):
+    with test_app.app_context():
+        tasks = [_task(project, fresh_user, f"t{n}") for n in range(3)]
+
+        Task.bulk_update([t.id for t in tasks], {'status': Task.STATUS_FINISHED}, notify=False)
+        db.session.expire_all()
+        assert {db.session.get(Task, t.id).row_version for t in tasks} == {2}
+
+
+def test_project_stamp_tracks_changes(test_app, fresh_user, project):
+    with test_app.app_context():
+        empty = project_version_stamp(project.id)
+        assert empty is not None
+        assert project_version_stamp(project.id) == empty
+
+        task = _task(project, fresh_user, "new")
+        added = project_version_stamp(project.id)
+        assert added != empty
+
+        task.status = Task.STATUS_FINISHED
+        db.session.commit()
+        changed = project_version_stamp(project.id)
+        assert changed != added
+
+        db.session.delete(task)
+        db.session.commit()
+        assert project_version_stamp(project.id) not in (added, changed)
+
+        assert project_version_stamp(10 ** 9) is None
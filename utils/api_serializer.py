@@ -0,0 +1,114 @@
+"""
+helpers for the /api/v1 JSON API.
+
+sparse fieldsets (?fields=a,b), opt in relationships (?include=tasks)
+and turning model rows into plain dicts without calling to_dict,
+so we only read the columns the caller asked for.
+"""
+from datetime import date, datetime
+
+# the public field names of every API resource, mapped to the model attribute
+RESOURCE_FIELDS = {
+    'projects': {
+        'id': 'id',
+        'project_name': 'project_name',
+        'description': 'description',
+        'status': 'status',
+        'start_date': 'start_date',
+        'expected_end_date': 'expected_end_date',
+        'created_at': 'created_at',
+        'created_by_id': 'created_by_id',
+    },
+    'tasks': {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'status': 'status',
+        'importance': 'importance',
+        'due_date': 'due_date',
+        'start_date': 'start_date',
+        'estimated_duration': 'estimated_duration',
+        'project_id': 'project_id',
+        'milestone_id': 'milestone_id',
+        'assigned_to_id': 'assigned_to_id',
+        'created_by_id': 'created_by_id',
+        'created_at': 'created_at',
+    },
+    'milestones': {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'status': 'status',
+        'due_date': 'due_date',
+        'completion_percentage': 'completion_percentage',
+        'project_id': 'project_id',
+        'created_at': 'created_at',
+    },
+}
+
+# relationships each resource can pull in with ?include=
+RESOURCE_INCLUDES = {
+    'projects': ['tasks', 'milestones'],
+    'tasks': [],
+    'milestones': ['tasks'],
+}
+
+
+def parse_fields(args, resource, primary=True):
+    """
+    read the sparse fieldset for a resource.
+    ?fields=a,b is for the main resource, ?fields[tasks]=a,b works for
+    any resource (main or included).
+
+    returns:
+        list of public field names, always with 'id' first
+    """
+    allowed = RESOURCE_FIELDS[resource]
+    raw = args.get(f'fields[{resource}]')
+    if raw is None and primary:
+        raw = args.get('fields')
+
+    if not raw:
+        return list(allowed.keys())
+
+    fields = ['id']
+    for name in raw.split(','):
+        name = name.strip()
+        if name in allowed and name not in fields:
+            fields.append(name)
+    return fields
+
+
+def parse_include(args, resource):
+    """
+    read ?include=tasks,milestones, unknown names are ignored.
+    """
+    raw = args.get('include') or ''
+    allowed = RESOURCE_INCLUDES.get(resource, [])
+    return [name.strip() for name in raw.split(',') if name.strip() in allowed]
+
+
+def load_only_columns(model, resource, fields, extra=()):
+    """
+    model columns for load_only(), so SQL only selects what we send back.
+    extra is for columns we need ourselves (like foreign keys for includes).
+    """
+    mapping = RESOURCE_FIELDS[resource]
+    names = [mapping[field] for field in fields] + [name for name in extra if name not in fields]
+    return [getattr(model, name) for name in dict.fromkeys(names)]
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def serialize(obj, resource, fields):
+    """
+    turn one model row into a dict with only the requested fields.
+    """
+    mapping = RESOURCE_FIELDS[resource]
+    return {field: _format_value(getattr(obj, mapping[field])) for field in fields}
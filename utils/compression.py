@@ -0,0 +1,98 @@
+"""
+gzip / brotli compression for responses.
+
+brotli is optional, if the package is not installed we only do gzip.
+"""
+import gzip
+
+try:
+    import brotli  # optional
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'application/javascript',
+}
+
+DEFAULT_MIN_SIZE = 500  # bytes, smaller bodies are not worth it
+
+
+def _accepted_encodings(accept_encoding):
+    """
+    parse an Accept-Encoding header into a set of encodings with q > 0.
+    """
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """
+    pick brotli when we can, else gzip, else None.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encoding, min_size=DEFAULT_MIN_SIZE):
+    """
+    compress a Flask response in place when it makes sense.
+
+    streamed responses, files sent with send_file and bodies that are
+    already encoded are left alone.
+    """
+    try:
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        if response.status_code < 200 or response.status_code >= 300:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(body)
+        else:
+            compressed = gzip.compress(body, compresslevel=6)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(compressed))
+        return response
+    except Exception as e:
+        print(f"error compressing response: {e}")
+        return response
@@ -0,0 +1,221 @@
+"""
+fragment cache for expensive parts of templates.
+
+in a template:
+
+    {% cache 'project_rows', 'projects', filters, request.args.get('cursor') %}
+        ... big table ...
+    {% endcache %}
+
+the first argument names the fragment, the second is the namespace (or a
+list of namespaces) it depends on, the rest are extra key parts. the key
+also holds the current generation of each namespace. models bump the
+generation when a row changes (see register_model), so the next render
+misses and builds fresh html. nothing has to be deleted by hand.
+
+the backend is an in-process LRU by default, or Redis when
+FRAGMENT_CACHE_URL is set and the redis package is installed, so every
+worker process shares the cache and the generations.
+"""
+import hashlib
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from utils.lru_cache import LRUCache
+
+try:
+    import redis  # optional
+except ImportError:
+    redis = None
+
+# session.info key for namespaces to bump once the transaction commits
+_PENDING = 'fragment_cache_pending'
+
+
+class MemoryBackend:
+    """per process backend on top of LRUCache."""
+
+    def __init__(self, max_entries=1024):
+        self._cache = LRUCache(max_entries)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, timeout=None):
+        # the LRU bound is what limits memory, timeouts are not needed here
+        self._cache.set(key, value)
+
+    def get_generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def stats(self):
+        return {'backend': 'memory', **self._cache.stats()}
+
+
+class RedisBackend:
+    """shared backend, generations are redis counters."""
+
+    def __init__(self, url, prefix='cmt:frag:', default_timeout=3600):
+        if redis is None:
+            raise RuntimeError("the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._default_timeout = default_timeout
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        self._client.set(self._prefix + key, value.encode('utf-8'), ex=timeout or self._default_timeout)
+
+    def get_generation(self, namespace):
+        value = self._client.get(self._prefix + 'gen:' + namespace)
+        return int(value) if value is not None else 0
+
+    def bump(self, namespace):
+        self._client.incr(self._prefix + 'gen:' + namespace)
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+class FragmentCache:
+    """
+    builds keys out of fragment name, namespace generations and key parts.
+    """
+
+    def __init__(self, backend=None, enabled=True):
+        self.backend = backend or MemoryBackend()
+        self.enabled = enabled
+        self._session_hooks = False
+
+    def make_key(self, name, namespaces, parts):
+        if isinstance(namespaces, str):
+            namespaces = [namespaces]
+        generations = [f"{ns}={self.backend.get_generation(ns)}" for ns in namespaces]
+        raw = repr((name, generations, parts))
+        return f"{name}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def get_or_render(self, name, namespaces, parts, render, timeout=None):
+        """the cached html, or render() it and keep the result."""
+        if not self.enabled:
+            return render()
+        try:
+            key = self.make_key(name, namespaces, parts)
+            cached = self.backend.get(key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            # a broken cache must never break the page
+            print(f"error reading fragment cache: {e}")
+            return render()
+
+        html = render()
+        try:
+            self.backend.set(key, str(html), timeout)
+        except Exception as e:
+            print(f"error writing fragment cache: {e}")
+        return html
+
+    def generation(self, namespace):
+        """current generation of a namespace, also handy for ETags."""
+        try:
+            return self.backend.get_generation(namespace)
+        except Exception as e:
+            print(f"error reading fragment cache generation {namespace}: {e}")
+            return None
+
+    def invalidate(self, *namespaces):
+        """make every fragment depending on these namespaces stale."""
+        for namespace in namespaces:
+            try:
+                self.backend.bump(namespace)
+            except Exception as e:
+                print(f"error invalidating fragment cache {namespace}: {e}")
+
+    def register_model(self, model, namespaces):
+        """
+        bump namespaces whenever a row of model is inserted, updated or
+        deleted. namespaces may be a function of the row, e.g.
+        lambda task: ['tasks', f'project:{task.project_id}'].
+
+        the bump waits for the commit, otherwise another request could
+        cache the old rows under the new generation before we commit.
+        """
+        def remember(mapper, connection, target):
+            session = object_session(target)
+            names = namespaces(target) if callable(namespaces) else namespaces
+            if session is None:
+                self.invalidate(*names)
+                return
+            session.info.setdefault(_PENDING, set()).update(names)
+
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, remember)
+
+        if not self._session_hooks:
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._session_hooks = True
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING, None)
+        if pending:
+            self.invalidate(*pending)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING, None)
+
+    def stats(self):
+        return {'enabled': self.enabled, **self.backend.stats()}
+
+
+def make_backend(url=None, max_entries=1024):
+    """redis when a url is given and the package is there, else memory."""
+    if url and redis is not None:
+        return RedisBackend(url)
+    if url:
+        print("FRAGMENT_CACHE_URL is set but redis is not installed, using the memory cache")
+    return MemoryBackend(max_entries)
+
+
+class FragmentCacheExtension(Extension):
+    """
+    the {% cache name, namespaces, *parts %} ... {% endcache %} tag.
+    needs app.jinja_env.fragment_cache set to a FragmentCache.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        if len(args) < 2:
+            parser.fail("cache needs a name and the namespaces it depends on", lineno)
+
+        name, namespaces, parts = args[0], args[1], nodes.List(args[2:])
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        return nodes.CallBlock(self.call_method('_render', [name, namespaces, parts]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, name, namespaces, parts, caller):
+        cache = getattr(self.environment, 'fragment_cache', None)
+        if cache is None:
+            return caller()
+        return Markup(cache.get_or_render(name, namespaces, parts, caller))
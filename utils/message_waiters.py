@@ -0,0 +1,155 @@
+"""
+long poll support for messages.
+
+a request waiting for new messages registers a waiter under the keys it
+cares about ('user:<id>' for direct messages, 'project:<id>' for a
+project channel). when a transaction that inserted messages commits, the
+keys of those messages are notified and their waiters wake up and look
+in the database for what is new.
+
+waiting is a threading.Event. under `python app.py` (werkzeug's threaded
+development server) each waiting poll holds an OS thread, max_waiters
+bounds how many. serve.py runs the app on gevent with the standard library
+monkey patched, there the Event is a greenlet switch and a waiting poll
+costs a greenlet, not a thread. notifications only reach this process:
+every waiter also wakes up every recheck_seconds and looks for itself,
+which covers messages written by other worker processes. past max_waiters
+a poll is refused with WaitersFull and the client is told to come back
+later, rather than answering at once and being polled again straight away.
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# session.info key for the message keys to notify once the transaction commits
+_PENDING = 'message_waiters_pending'
+
+
+def message_keys(message):
+    """the keys a new message wakes up."""
+    if message.receiverID is None:
+        return {f"project:{message.projectID}"}
+    return {f"user:{message.receiverID}", f"user:{message.senderID}"}
+
+
+class WaitersFull(Exception):
+    """max_waiters requests are already waiting."""
+
+
+class _Waiter:
+    __slots__ = ('keys', 'event')
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self.event = threading.Event()
+
+    def notify(self):
+        self.event.set()
+
+
+class MessageWaiters:
+    """the requests of this process waiting for new messages, by key."""
+
+    def __init__(self, max_waiters=200):
+        self.max_waiters = max_waiters
+        self._waiters = {}  # key -> set of _Waiter
+        self._count = 0
+        self._lock = threading.Lock()
+        self._listeners_registered = False
+        self.notified = 0
+        self.refused = 0
+
+    def _add(self, waiter):
+        with self._lock:
+            if self._count >= self.max_waiters:
+                self.refused += 1
+                return False
+            for key in waiter.keys:
+                self._waiters.setdefault(key, set()).add(waiter)
+            self._count += 1
+            return True
+
+    def _discard(self, waiter):
+        with self._lock:
+            for key in waiter.keys:
+                waiters = self._waiters.get(key)
+                if waiters:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[key]
+            self._count -= 1
+
+    def notify(self, *keys):
+        """wake every waiter on any of keys."""
+        with self._lock:
+            waiters = set()
+            for key in keys:
+                waiters.update(self._waiters.get(key, ()))
+        for waiter in waiters:
+            waiter.notify()
+        self.notified += len(waiters)
+
+    def wait_for(self, keys, check, timeout, recheck_seconds=5.0):
+        """
+        call check() until it returns something truthy or timeout seconds
+        pass, sleeping in between until one of keys is notified. the waiter
+        is registered before the first check, so a message committed in
+        between is not missed.
+
+        returns:
+            the last result of check()
+        raises:
+            WaitersFull: max_waiters requests are waiting already, check()
+            is not called
+        """
+        waiter = _Waiter(keys)
+        if not self._add(waiter):
+            raise WaitersFull(f"{self.max_waiters} requests are already waiting")
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                result = check()
+                remaining = deadline - time.monotonic()
+                if result or remaining <= 0:
+                    return result
+                waiter.event.wait(min(remaining, recheck_seconds))
+                waiter.event.clear()
+        finally:
+            self._discard(waiter)
+
+    # SQLAlchemy events: remember inserted messages, notify once committed
+    def _after_insert(self, mapper, connection, target):
+        keys = message_keys(target)
+        session = object_session(target)
+        if session is None:
+            self.notify(*keys)
+            return
+        session.info.setdefault(_PENDING, set()).update(keys)
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING, None)
+        if pending:
+            self.notify(*pending)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING, None)
+
+    def register_listeners(self):
+        """notify waiters for every committed Message. safe to call more than once."""
+        if self._listeners_registered:
+            return
+        from models.Communication.message import Message
+
+        event.listen(Message, 'after_insert', self._after_insert)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._listeners_registered = True
+
+    def stats(self):
+        return {'waiting': self._count, 'max_waiters': self.max_waiters,
+                'notified': self.notified, 'refused': self.refused}
+
+
+message_waiters = MessageWaiters()
@@ -1,4 +1,3 @@
-from .email_utils import send_verification_email, send_password_reset_email
 from  .notification_utils import (
 
     create_task_assigned_notification,
@@ -6,33 +5,100 @@ from  .notification_utils import (
     create_deadline_approaching_notification,
     create_notification  # For general/custom in -app notifications
 )
-from models import Notification, db
+from models import Notification, NotificationArchive, db
+from models.Communication.email_service import get_email_service
+from utils.pagination import keyset_paginate
+
+# cursors of the notifications page say which table they point into
+HOT_CURSOR = 'h'
+ARCHIVE_CURSOR = 'a'
 
 class NotificationFacade:
     """
     provides a simplified interface for sending various types of notifications
     """
 
+    def __init__(self, coalesce_seconds=900):
+        # repeated task / project updates inside this window merge into one row
+        self.coalesce_seconds = coalesce_seconds
+
+    def fan_out(self, user_ids, title, notification_type, content=None,
+                project_id=None, task_id=None, milestone_id=None, exclude_user_id=None):
+        """
+        send one event to many users in one transaction with multi-row
+        INSERTs, instead of a commit per user.
+        returns:
+            int: number of notifications created (0 on failure).
+        """
+        recipients = {user_id for user_id in user_ids if user_id is not None and user_id != exclude_user_id}
+        if not recipients:
+            return 0
+
+        try:
+            created = Notification.bulk_create(recipients, title,
+                                               notification_type=notification_type,
+                                               content=content,
+                                               project_id=project_id,
+                                               task_id=task_id,
+                                               milestone_id=milestone_id,
+                                               coalesce_seconds=self.coalesce_seconds)
+            db.session.commit()
+        except Exception as e:
+            print(f"error fanning out notifications: {e}")
+            db.session.rollback()
+            return 0
+        return created
+
+    def notify_project_members(self, project, title, notification_type, content=None,
+                               task_id=None, milestone_id=None, exclude_user_id=None):
+        """
+        fan_out to everyone working on a project.
+        returns:
+            int: number of notifications created.
+        """
+        return self.fan_out(project.get_member_ids(), title, notification_type,
+                            content=content, project_id=project.id, task_id=task_id,
+                            milestone_id=milestone_id, exclude_user_id=exclude_user_id)
+
     def send_email_verification(self,
                                  user,
                                    verification_url):
         """
-        sends an email verification link to the user.
+        queues an email verification link for the user in the outbox.
+        it goes out once the caller commits.
         returns:
-            bool: True if email was sent successfully, False otherwise.
+            bool: True if the email was queued, False otherwise.
         """
-        return send_verification_email(user, verification_url)
+        try:
+            get_email_service().queue_email(
+                user.email,
+                "Verify your CMT account",
+                f"Hi {user.username},\n\nplease verify your email address:\n{verification_url}\n")
+            return True
+        except Exception as e:
+            print(f"error queueing verification email: {e}")
+            return False
 
     def send_password_reset(self, user, reset_url):
         """
-        Sends a password reset link to the user via email.
+        Queues a password reset link for the user in the email outbox,
+        it goes out once the caller commits.
         Args:
             user: User object (must have .email attribute).
             reset_url (str): The password reset URL.
         Returns:
-            bool: True if email was sent successfully, False otherwise.
+            bool: True if the email was queued, False otherwise.
         """
-        return send_password_reset_email(user, reset_url)
+        try:
+            get_email_service().queue_email(
+                user.email,
+                "Reset your CMT password",
+                f"Hi {user.username},\n\nuse this link to reset your password:\n{reset_url}\n\n"
+                f"if you did not ask for this you can ignore this email.\n")
+            return True
+        except Exception as e:
+            print(f"error queueing password reset email: {e}")
+            return False
 
     def notify_task_assigned(self, task, assignee_user):
         """
@@ -52,6 +118,20 @@ class NotificationFacade:
 
         return in_app_notif_created is not None
 
+    def notify_task_updated(self, task, actor_id=None):
+        """
+        tell the assignee and creator of a task that it changed. quick
+        edits in a row end up as one notification with a counter.
+        returns:
+            int: number of notifications created or merged.
+        """
+        return self.fan_out([task.assigned_to_id, task.created_by_id],
+                            f"Task updated: {task.title}",
+                            Notification.TYPE_TASK_UPDATED,
+                            project_id=task.project_id,
+                            task_id=task.id,
+                            exclude_user_id=actor_id)
+
     def notify_deadline_approaching(self, task):
         """
         notifies the assignee of a task that its deadline is approaching.
@@ -98,6 +178,34 @@ class NotificationFacade:
             print(f"error {e}")
             return []
 
+    def get_notifications_page(self, user_id, cursor=None, limit=25):
+        """
+        one page of a user's notifications, newest first. the recent ones
+        come from the notifications table, once those run out the next
+        cursor moves on into the archive.
+        returns:
+            (list of notifications, next cursor or None on the last page)
+        """
+        table, _, position = (cursor or HOT_CURSOR).partition('.')
+        try:
+            if table != ARCHIVE_CURSOR:
+                query = Notification.query.filter(Notification.user_id == user_id)
+                rows, next_position = keyset_paginate(query, [Notification.timestamp, Notification.id],
+                                                      position or None, limit, descending=True)
+                if next_position:
+                    return rows, f"{HOT_CURSOR}.{next_position}"
+                has_archive = db.session.query(
+                    NotificationArchive.query.filter(NotificationArchive.user_id == user_id).exists()).scalar()
+                return rows, (f"{ARCHIVE_CURSOR}." if has_archive else None)
+
+            query = NotificationArchive.query.filter(NotificationArchive.user_id == user_id)
+            rows, next_position = keyset_paginate(query, [NotificationArchive.timestamp, NotificationArchive.id],
+                                                  position or None, limit, descending=True)
+            return rows, (f"{ARCHIVE_CURSOR}.{next_position}" if next_position else None)
+        except Exception as e:
+            print(f"error {e}")
+            return [], None
+
     def get_unread_notifications(self, user_id):
         """
         Get unread notifications for a user.
@@ -110,6 +218,30 @@ class NotificationFacade:
             print(f"error {e}")
             return []
 
+    def count_unread_notifications(self, user_id):
+        """
+        number of unread notifications, without loading them.
+        returns:
+            int: unread count.
+        """
+        try:
+            return Notification.count_unread(user_id)
+        except Exception as e:
+            print(f"error {e}")
+            return 0
+
+    def get_recent_unread_notifications(self, user_id, limit=5):
+        """
+        newest unread notifications.
+        returns:
+            list: at most limit notification objects.
+        """
+        try:
+            return Notification.get_recent_unread(user_id, limit)
+        except Exception as e:
+            print(f"error {e}")
+            return []
+
     def mark_notification_read(self, notification_id, user_id):
         """
         Mark a specific notification as read.
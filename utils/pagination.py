@@ -0,0 +1,115 @@
+"""
+keyset (cursor) pagination helpers.
+
+instead of OFFSET we remember the sort values of the last row we showed
+and ask for the rows after it, so every page costs the same no matter
+how deep into the list we are.
+"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    turn the ?limit= query arg into a safe page size.
+    """
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    if limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, date):
+        return ['d', value.isoformat()]
+    return ['v', value]
+
+
+def _decode_value(item):
+    kind, value = item
+    if kind == 'dt':
+        return datetime.fromisoformat(value)
+    if kind == 'd':
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    """
+    make an opaque url safe cursor out of the sort values of a row.
+    """
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    read a cursor made by encode_cursor.
+
+    returns:
+        list of sort values, or None if the cursor is missing or broken
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        return [_decode_value(item) for item in json.loads(raw)]
+    except Exception as e:
+        print(f"error decoding cursor: {e}")
+        return None
+
+
+def parse_sort(sort, allowed, default):
+    """
+    turn ?sort=name or ?sort=-name into (field, descending).
+    falls back to the default when the field is not allowed.
+    """
+    sort = sort or default
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in allowed:
+        return parse_sort(default, allowed, default)
+    return field, descending
+
+
+def keyset_paginate(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    run one page of a keyset paginated query.
+
+    columns are the ORDER BY columns, the last one must be unique
+    (normally the primary key) so the order is stable.
+
+    returns:
+        (list of rows, next cursor or None when this is the last page)
+    """
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(columns):
+        # (a, b) > (x, y)  ==  a > x OR (a == x AND b > y)
+        conditions = []
+        for index, column in enumerate(columns):
+            equal_before = [columns[i] == values[i] for i in range(index)]
+            step = column < values[index] if descending else column > values[index]
+            conditions.append(and_(*equal_before, step))
+        query = query.filter(or_(*conditions))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return rows, next_cursor
@@ -0,0 +1,142 @@
+"""
+tiny in-process scheduler for periodic maintenance jobs.
+
+one daemon thread wakes up when the next job is due and runs it inside the
+Flask app context. jobs run one after another, so a slow job delays the
+others but never runs twice at the same time. every job keeps simple
+metrics (runs, failures, last duration, last result) for /health.
+
+with several worker processes each one runs its own scheduler, so jobs
+must be safe to run more than once (deleting expired rows is).
+"""
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+
+class ScheduledJob:
+    """one periodic job and its metrics."""
+
+    def __init__(self, name, func, interval, initial_delay=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic() + (interval if initial_delay is None else initial_delay)
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            'interval_seconds': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_duration_ms': round(self.last_duration * 1000, 2) if self.last_duration is not None else None,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
+
+
+class BackgroundScheduler:
+    """
+    runs registered jobs every `interval` seconds in a background thread.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def add_job(self, name, func, interval, initial_delay=None):
+        """
+        register func to run every interval seconds.
+        func is called with no arguments inside the app context.
+        """
+        with self._lock:
+            self._jobs[name] = ScheduledJob(name, func, interval, initial_delay)
+        self._wakeup.set()  # the new job may be due before the current sleep ends
+        return self._jobs[name]
+
+    def run_job(self, name):
+        """
+        run one job right now (also used by the cli and tests).
+        returns:
+            whatever the job returned, or None if it failed
+        """
+        job = self._jobs[name]
+        started = time.perf_counter()
+        job.last_run_at = datetime.now(timezone.utc)
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = job.func()
+            else:
+                result = job.func()
+            job.last_result = result
+            job.last_error = None
+            return result
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            print(f"error running scheduled job {name}: {e}")
+            traceback.print_exc()
+            return None
+        finally:
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.next_run = time.monotonic() + job.interval
+
+    def wake(self, name):
+        """run a job as soon as the scheduler thread is free, e.g. new work arrived."""
+        job = self._jobs.get(name)
+        if job is None:
+            return
+        job.next_run = time.monotonic()
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopping:
+            with self._lock:
+                jobs = list(self._jobs.values())
+            now = time.monotonic()
+            for job in jobs:
+                if self._stopping:
+                    return
+                if job.next_run <= now:
+                    self.run_job(job.name)
+
+            with self._lock:
+                next_due = min((job.next_run for job in self._jobs.values()), default=None)
+            timeout = None if next_due is None else max(0.0, next_due - time.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name='cmt-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def stats(self):
+        with self._lock:
+            return {name: job.to_dict() for name, job in self._jobs.items()}
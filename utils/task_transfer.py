@@ -0,0 +1,91 @@
+"""
+reading and writing task files for bulk import / export.
+
+supports CSV (first line is the header) and JSON Lines (one object per line).
+rows are read one at a time from the uploaded stream, so big files are
+never loaded into memory in one piece.
+"""
+import csv
+import io
+import json
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMATS = [FORMAT_CSV, FORMAT_JSONL]
+
+MIMETYPES = {
+    FORMAT_CSV: 'text/csv',
+    FORMAT_JSONL: 'application/x-ndjson',
+}
+
+
+def guess_format(filename, default=FORMAT_CSV):
+    """
+    pick the format from the file extension (.csv, .jsonl, .ndjson).
+    """
+    name = (filename or '').lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return FORMAT_JSONL
+    if name.endswith('.csv'):
+        return FORMAT_CSV
+    return default
+
+
+def read_task_rows(stream, file_format):
+    """
+    read rows out of a binary stream.
+
+    yields:
+        (line number, dict of values) or (line number, error string)
+        when a line can not be parsed at all
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+
+    if file_format == FORMAT_JSONL:
+        for line_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"invalid JSON: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, "each line must be a JSON object"
+                continue
+            yield line_number, row
+        return
+
+    reader = csv.DictReader(text)
+    for row in reader:
+        # line_num is the physical line, the header is line 1
+        yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+
+
+def write_rows(rows, fields, file_format):
+    """
+    turn rows (tuples in the order of fields) into chunks of text to stream.
+    """
+    if file_format == FORMAT_JSONL:
+        for row in rows:
+            yield json.dumps({field: _plain(value) for field, value in zip(fields, row)}) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_plain(value) if value is not None else '' for value in row])
+        # flush every few hundred rows, not every row
+        if count % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _plain(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
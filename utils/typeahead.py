@@ -0,0 +1,195 @@
+"""
+in memory prefix index for the people / project typeahead.
+
+every searchable word (username, first and last name, full name, project
+name and its words) is kept lowercased in one sorted list of
+(term, kind, id) tuples, so a prefix lookup is a bisect to the first term
+and a walk while the terms still start with it. no query per keystroke.
+
+the index is built from the database the first time it is searched and
+after that kept up to date row by row: models registered with
+register_model queue their changes on the session and the index applies
+them once the transaction commits (a rollback drops them), same idea as
+FragmentCache.register_model. each worker process has its own index.
+"""
+import bisect
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# session.info key for index changes waiting for the commit
+_PENDING = 'typeahead_pending'
+
+# highest possible string for the end of a prefix range
+_HIGH = '\U0010ffff'
+
+
+class PrefixIndex:
+    """sorted array of search terms pointing at (kind, id) entries."""
+
+    def __init__(self):
+        self._terms = []     # sorted (term, kind, id)
+        self._entries = {}   # (kind, id) -> {'label', 'detail', 'terms'}
+        self._models = {}    # kind -> (model, describe)
+        self._lock = threading.RLock()
+        self._built = False
+        self._session_hooks = False
+        self.builds = 0
+        self.updates = 0
+
+    @staticmethod
+    def terms_for(texts):
+        """the lowercased full texts and each of their words."""
+        terms = set()
+        for text in texts:
+            text = ' '.join((text or '').lower().split())
+            if not text:
+                continue
+            terms.add(text)
+            terms.update(text.split(' '))
+        return terms
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        for term in entry['terms']:
+            item = (term, key[0], key[1])
+            position = bisect.bisect_left(self._terms, item)
+            if position < len(self._terms) and self._terms[position] == item:
+                del self._terms[position]
+
+    def put(self, kind, id, label, detail, texts):
+        """add or replace one entry."""
+        terms = self.terms_for(texts)
+        with self._lock:
+            self._remove((kind, id))
+            self._entries[(kind, id)] = {'label': label, 'detail': detail, 'terms': terms}
+            for term in terms:
+                bisect.insort(self._terms, (term, kind, id))
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove((kind, id))
+
+    def search(self, prefix, kinds=None, limit=10, accept=None):
+        """
+        entries with a term starting with prefix, in term order.
+        accept(kind, id) can leave entries out (e.g. projects the user can
+        not see) without ending the walk early.
+
+        returns:
+            list of dicts with kind, id, label and detail
+        """
+        prefix = ' '.join((prefix or '').lower().split())
+        if not prefix:
+            return []
+        self.ensure_built()
+
+        results = []
+        seen = set()
+        with self._lock:
+            start = bisect.bisect_left(self._terms, (prefix,))
+            end = bisect.bisect_right(self._terms, (prefix + _HIGH,))
+            for term, kind, id in self._terms[start:end]:
+                key = (kind, id)
+                if key in seen or (kinds and kind not in kinds):
+                    continue
+                seen.add(key)
+                if accept and not accept(kind, id):
+                    continue
+                entry = self._entries[key]
+                results.append({'kind': kind, 'id': id, 'label': entry['label'], 'detail': entry['detail']})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def register_model(self, model, kind, describe):
+        """
+        index rows of model under kind. describe(row) returns
+        (label, detail, texts) or None to leave the row out.
+        """
+        self._models[kind] = (model, describe)
+
+        def remember(mapper, connection, target):
+            change = (kind, target.id, describe(target))
+            session = object_session(target)
+            if session is None:
+                self._apply([change])
+                return
+            session.info.setdefault(_PENDING, []).append(change)
+
+        def forget(mapper, connection, target):
+            change = (kind, target.id, None)
+            session = object_session(target)
+            if session is None:
+                self._apply([change])
+                return
+            session.info.setdefault(_PENDING, []).append(change)
+
+        event.listen(model, 'after_insert', remember)
+        event.listen(model, 'after_update', remember)
+        event.listen(model, 'after_delete', forget)
+
+        if not self._session_hooks:
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._session_hooks = True
+
+    def _apply(self, changes):
+        if not self._built:
+            return  # the first search loads the rows from the database anyway
+        for kind, id, description in changes:
+            if description is None:
+                self.remove(kind, id)
+            else:
+                self.put(kind, id, *description)
+            self.updates += 1
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING, None)
+        if pending:
+            self._apply(pending)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING, None)
+
+    def build(self):
+        """load every registered model into a fresh index."""
+        with self._lock:
+            self._terms = []
+            self._entries = {}
+            for kind, (model, describe) in self._models.items():
+                for row in model.query.yield_per(500):
+                    description = describe(row)
+                    if description is not None:
+                        label, detail, texts = description
+                        self._entries[(kind, row.id)] = {'label': label, 'detail': detail,
+                                                         'terms': self.terms_for(texts)}
+            self._terms = sorted((term, kind, id)
+                                 for (kind, id), entry in self._entries.items()
+                                 for term in entry['terms'])
+            self._built = True
+            self.builds += 1
+
+    def ensure_built(self):
+        if not self._built:
+            try:
+                self.build()
+            except Exception as e:
+                print(f"error building the typeahead index: {e}")
+
+    def reset(self):
+        """forget everything, the next search builds again."""
+        with self._lock:
+            self._terms = []
+            self._entries = {}
+            self._built = False
+
+    def stats(self):
+        return {'built': self._built, 'entries': len(self._entries), 'terms': len(self._terms),
+                'builds': self.builds, 'updates': self.updates}
+
+
+typeahead_index = PrefixIndex()
@@ -0,0 +1,32 @@
+"""
+request class that lets a view choose where uploaded files go while the
+multipart body is parsed.
+
+by default werkzeug keeps an upload in memory up to 500 KB and in an
+anonymous temp file after that, and the view then copies it somewhere
+else. a view that sets request.upload_stream_factory before it first
+reads request.form / request.files gets every file written straight to
+the streams that factory returns instead. the streams are closed when
+the request ends, whatever the view did with them.
+"""
+from flask import Request
+
+
+class UploadRequest(Request):
+    """flask request with a per request stream factory for file uploads."""
+
+    # callable(filename) -> writable, seekable file object, or None for the default
+    upload_stream_factory = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_stream_factory is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = self.upload_stream_factory(filename)
+        self.__dict__.setdefault('_upload_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        super().close()
+        # streams of a form that failed to parse never made it into request.files
+        for stream in self.__dict__.pop('_upload_streams', ()):
+            stream.close()